@@ -0,0 +1,121 @@
+"""
+Account availability checks for the registration form.
+
+Usernames and emails are stored lowercased (``CustomUser.save``), so lookups
+normalise the input the same way and compare exactly, which lets SQLite use
+the unique/indexed columns instead of scanning with ``LOWER()``. A combined
+check answers username, email and phone in one query.
+
+Username suggestions come from a sorted in-process list searched with
+``bisect``. It is rebuilt lazily whenever a user is saved or deleted, using
+the same shared-cache version scheme as the zone index.
+"""
+import bisect
+import threading
+import time
+
+from django.core.cache import cache
+from django.db.models import Q
+
+USERNAME_VERSION_CACHE_KEY = "usernames:version"
+SUGGESTION_LIMIT = 5
+
+_lock = threading.Lock()
+_index = None
+
+
+def normalize_username(value):
+    return (value or "").strip().lower()
+
+
+def normalize_email(value):
+    return (value or "").strip().lower()
+
+
+def normalize_phone(value):
+    return (value or "").strip()
+
+
+NORMALIZERS = {
+    "username": normalize_username,
+    "email": normalize_email,
+    "phone": normalize_phone,
+}
+
+
+def taken(username=None, email=None, phone=None):
+    """
+    Return the set of field names among ``username``, ``email`` and ``phone``
+    that already belong to an account. Empty or omitted values are skipped;
+    everything else is checked in a single query.
+    """
+    from .models import CustomUser
+
+    wanted = {
+        field: NORMALIZERS[field](value)
+        for field, value in (("username", username), ("email", email), ("phone", phone))
+    }
+    wanted = {field: value for field, value in wanted.items() if value}
+    if not wanted:
+        return set()
+
+    condition = Q()
+    for field, value in wanted.items():
+        condition |= Q(**{field: value})
+    found = set()
+    for row in CustomUser.objects.filter(condition).values_list(*wanted):
+        for field, value in zip(wanted, row):
+            if value == wanted[field]:
+                found.add(field)
+    return found
+
+
+class UsernameIndex:
+    """Sorted usernames answering prefix queries with one bisection."""
+
+    def __init__(self, usernames, version=None):
+        self.version = version
+        self.names = sorted(usernames)
+
+    def suggest(self, prefix, limit=SUGGESTION_LIMIT):
+        """Return up to ``limit`` usernames starting with ``prefix``, in order."""
+        prefix = normalize_username(prefix)
+        if not prefix or limit < 1:
+            return []
+        start = bisect.bisect_left(self.names, prefix)
+        matches = self.names[start:start + limit]
+        return [name for name in matches if name.startswith(prefix)]
+
+
+def username_version():
+    # Clock-seeded for the same reason as zone_index.zone_version.
+    return cache.get_or_set(USERNAME_VERSION_CACHE_KEY, time.time_ns, None)
+
+
+def invalidate_usernames():
+    """Bump the username version so every worker rebuilds on its next lookup."""
+    try:
+        cache.incr(USERNAME_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(USERNAME_VERSION_CACHE_KEY, time.time_ns(), None)
+
+
+def get_username_index():
+    """Return the index for the current username version, rebuilding if stale."""
+    global _index
+    from .models import CustomUser
+
+    version = username_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _lock:
+        if _index is None or _index.version != version:
+            names = CustomUser.objects.values_list("username", flat=True)
+            _index = UsernameIndex(list(names), version)
+        return _index
+
+
+def suggest_usernames(prefix, limit=SUGGESTION_LIMIT):
+    return get_username_index().suggest(prefix, limit)
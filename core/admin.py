@@ -5,7 +5,7 @@ from datetime import timedelta
 from django.contrib.auth.admin import UserAdmin
 from .models import (
     CustomUser, Category, Product, DeliveryZone,
-    Order, ContactMessage
+    Order, ContactMessage, OutboundEmail
 )
 @admin.register(CustomUser)
 class CustomUserAdmin(UserAdmin):
@@ -83,11 +83,9 @@ class ProductAdmin(admin.ModelAdmin):
         }),
     )
 
-    @admin.display(description="Final Price")
+    @admin.display(description="Final Price", ordering="effective_price")
     def get_final_price(self, obj):
-        if obj.is_offer and obj.discount_percent > 0:
-            return f"₹{obj.discounted_price:.2f}"
-        return f"₹{obj.base_price:.2f}"
+        return f"₹{obj.effective_price:.2f}"
 
     @admin.display(description="Offer Status", ordering="offer_end")
     def offer_active_status(self, obj):
@@ -151,3 +149,11 @@ class ContactMessageAdmin(admin.ModelAdmin):
     list_display = ('name', 'email', 'phone', 'subject', 'created_at')
     search_fields = ('name', 'email', 'phone', 'subject')
     list_filter = ('created_at',)
+
+
+@admin.register(OutboundEmail)
+class OutboundEmailAdmin(admin.ModelAdmin):
+    list_display = ('to_email', 'subject', 'status', 'attempts', 'next_attempt_at', 'sent_at')
+    list_filter = ('status',)
+    search_fields = ('to_email', 'subject', 'dedupe_key')
+    readonly_fields = ('created_at', 'sent_at', 'last_error')
@@ -1,6 +1,12 @@
-from rest_framework import viewsets
-from .models import DeliveryZone, Order
-from .serializers import  DeliveryZoneSerializer, OrderSerializer
+from django.db.models import Prefetch
+from django.http import Http404
+from rest_framework import permissions, viewsets
+from rest_framework.decorators import action
+from .exports import EXPORT_FORMATS, export_response
+from .filters import OrderFilter
+from .models import DeliveryZone, Order, OrderItem
+from .pagination import OrderCursorPagination
+from .serializers import  DeliveryZoneSerializer, OrderListSerializer, OrderSerializer
 
 
 class DeliveryZoneViewSet(viewsets.ModelViewSet):
@@ -8,5 +14,28 @@ class DeliveryZoneViewSet(viewsets.ModelViewSet):
     serializer_class = DeliveryZoneSerializer
 
 class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all().order_by('-created_at')
+    queryset = Order.objects.select_related('user', 'delivery_zone').order_by('-created_at', '-id')
     serializer_class = OrderSerializer
+    pagination_class = OrderCursorPagination
+    filterset_class = OrderFilter
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            queryset = queryset.prefetch_related(
+                Prefetch('items', queryset=OrderItem.objects.select_related('product'))
+            )
+        return queryset
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return OrderListSerializer
+        return super().get_serializer_class()
+
+    @action(detail=False, permission_classes=[permissions.IsAdminUser])
+    def export(self, request):
+        """Stream every matching order as CSV (default) or ``?fmt=ndjson``."""
+        fmt = request.query_params.get('fmt', 'csv')
+        if fmt not in EXPORT_FORMATS:
+            raise Http404("Unknown export format.")
+        return export_response(self.filter_queryset(self.get_queryset()), fmt)
@@ -0,0 +1,140 @@
+"""
+Cart pricing and the guest cart.
+
+Signed-in carts are priced from one ``select_related`` query and guest carts
+from one ``in_bulk`` call; both take weight multipliers from core.units.
+
+Guest lines are stored in the session as compact ``[product_id, weight,
+quantity]`` lists; names, images and prices are read from the products at
+render time, so nothing stale is kept in the session and it is only
+rewritten when a line changes.
+"""
+from decimal import Decimal
+
+from . import units
+from .models import CartItem, Product
+
+SESSION_KEY = "cart"
+TAX_RATE = Decimal("0.05")
+
+
+def price_lines(lines):
+    """
+    Set ``unit_price``, ``converted_weight`` and ``final_price`` on each of
+    ``lines``: anything with ``product``, ``weight`` and ``quantity``.
+    """
+    lines = list(lines)
+    weights = units.multipliers((line.product.unit, line.weight) for line in lines)
+    for line, weight in zip(lines, weights):
+        line.unit_price = line.product.effective_price
+        line.converted_weight = weight
+        line.final_price = line.unit_price * weight * line.quantity
+    return lines
+
+
+def price_line(line):
+    return price_lines([line])[0]
+
+
+class PricedCart:
+
+    def __init__(self, items):
+        self.items = price_lines(items)
+        self.subtotal = sum((item.final_price for item in self.items), Decimal("0.00"))
+        self.tax = self.subtotal * TAX_RATE
+        self.total = self.subtotal + self.tax
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+
+def user_cart(user):
+    """Price ``user``'s saved cart, reading items and products in one query."""
+    return PricedCart(CartItem.objects.filter(user=user).select_related("product").order_by("id"))
+
+
+def buy_now_cart(user, item):
+    """Price a single ``buy_now_item`` session entry as an unsaved CartItem."""
+    product = Product.objects.get(id=item["product_id"])
+    return PricedCart([CartItem(
+        user=user, product=product, weight=item.get("weight") or product.default_weight,
+        quantity=int(item["quantity"]),
+    )])
+
+
+def normalize_weight(weight):
+    return (weight or "").strip().upper()
+
+
+class GuestCartLine:
+    """A guest cart line, shaped for the guest branch of cart.html."""
+
+    def __init__(self, product, weight, quantity):
+        self.product = product
+        self.product_id = product.id
+        self.weight = weight
+        self.quantity = quantity
+        self.title = product.title
+        self.unit = product.unit
+
+
+class GuestCart:
+
+    def __init__(self, session):
+        self.session = session
+        self.changed = False
+        self.lines = []
+        for raw in session.get(SESSION_KEY, []):
+            if isinstance(raw, dict):
+                # Lines written before the compact format.
+                raw = [raw.get("product_id"), raw.get("weight"), raw.get("quantity", 1)]
+                self.changed = True
+            product_id, weight, quantity = raw
+            self._merge(product_id, weight, quantity)
+
+    def _merge(self, product_id, weight, quantity):
+        weight = normalize_weight(weight)
+        quantity = int(quantity)
+        for line in self.lines:
+            if line[0] == product_id and line[1] == weight:
+                line[2] += quantity
+                self.changed = True
+                return
+        self.lines.append([product_id, weight, quantity])
+
+    def __len__(self):
+        return len(self.lines)
+
+    def add(self, product_id, weight, quantity=1):
+        self._merge(product_id, weight, quantity)
+        self.changed = True
+
+    def remove(self, index):
+        if 0 <= index < len(self.lines):
+            self.lines.pop(index)
+            self.changed = True
+
+    def set_quantity(self, index, quantity):
+        if 0 <= index < len(self.lines) and self.lines[index][2] != quantity:
+            self.lines[index][2] = quantity
+            self.changed = True
+
+    def priced(self):
+        """
+        Price every line, loading all products in one query. Lines whose
+        product no longer exists are dropped.
+        """
+        products = Product.objects.in_bulk({line[0] for line in self.lines})
+        kept = [line for line in self.lines if line[0] in products]
+        if len(kept) != len(self.lines):
+            self.lines = kept
+            self.changed = True
+        return PricedCart(GuestCartLine(products[pid], weight, qty) for pid, weight, qty in self.lines)
+
+    def save(self):
+        if self.changed:
+            self.session[SESSION_KEY] = self.lines
+            self.changed = False
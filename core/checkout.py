@@ -0,0 +1,56 @@
+"""
+Order placement.
+
+The order and all its lines are written in one transaction: a single order
+insert, one ``bulk_create`` for the items, and totals computed once from
+those items. A client-supplied idempotency key makes retries and double
+submits return the order the first request created.
+"""
+from django.db import IntegrityError, transaction
+
+from . import metrics
+from .models import Order, OrderItem
+
+
+def existing_order(user, idempotency_key):
+    if not idempotency_key:
+        return None
+    return Order.objects.filter(user=user, idempotency_key=idempotency_key).first()
+
+
+def place_order(user, order, cart, idempotency_key=None):
+    """
+    Save the unsaved ``order`` with the lines of the priced ``cart``.
+    Returns ``(order, created)``; when ``idempotency_key`` was already used
+    by ``user`` the earlier order is returned with ``created=False``.
+    """
+    previous = existing_order(user, idempotency_key)
+    if previous is not None:
+        return previous, False
+
+    order.user = user
+    order.idempotency_key = idempotency_key or None
+    items = [
+        OrderItem(
+            order=order,
+            product=line.product,
+            quantity=line.quantity,
+            price=round(line.unit_price * line.converted_weight, 2),
+        )
+        for line in cart
+    ]
+    order.set_totals(sum(item.price * item.quantity for item in items))
+    order.apply_delivery_estimate()
+    order.advance_status()
+
+    try:
+        with transaction.atomic():
+            order.save()
+            OrderItem.objects.bulk_create(items)
+            metrics.record_order_items(order, items)
+    except IntegrityError:
+        previous = existing_order(user, idempotency_key)
+        if previous is None:
+            raise
+        return previous, False
+    return order, True
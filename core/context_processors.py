@@ -1,7 +1,8 @@
-from core.models import Product
+from django.utils.functional import SimpleLazyObject
+
 
 def guest_wishlist(request):
-    wishlist = request.session.get("wishlist", [])
+    # Lazy, so pages that never show wishlist hearts don't load the session.
     return {
-        "guest_wishlist_ids": wishlist
+        "guest_wishlist_ids": SimpleLazyObject(lambda: set(request.session.get("wishlist", [])))
     }
@@ -0,0 +1,24 @@
+"""
+Cron entry points referenced by ``settings.CRON_CLASSES``.
+
+django-cron is optional; without it the job can still be run directly or
+through the run_order_lifecycle management command.
+"""
+try:
+    from django_cron import CronJobBase, Schedule
+except ImportError:
+    CronJobBase = object
+    Schedule = None
+
+from .lifecycle import advance_orders
+
+
+class UpdateOrderStatusCronJob(CronJobBase):
+    RUN_EVERY_MINS = 1
+
+    if Schedule is not None:
+        schedule = Schedule(run_every_mins=RUN_EVERY_MINS)
+    code = "core.update_order_status"
+
+    def do(self):
+        return advance_orders()
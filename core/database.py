@@ -0,0 +1,70 @@
+"""
+SQLite tuning for a threaded server.
+
+Every new SQLite connection switches to WAL, so readers no longer block
+the writer, with ``synchronous=NORMAL``, a memory-mapped read window and a
+busy timeout. Override any of these with ``settings.SQLITE_PRAGMAS``.
+
+Writers that can still lose the race for the lock after the busy timeout
+use ``retry_on_busy``, which re-runs the whole unit of work with jittered
+backoff.
+"""
+import functools
+import logging
+import random
+import time
+
+from django.conf import settings
+from django.db import OperationalError, connection
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": 5000,
+    "mmap_size": 128 * 1024 * 1024,
+    "temp_store": "MEMORY",
+}
+
+BUSY_ATTEMPTS = 5
+BUSY_BACKOFF_SECONDS = 0.05
+
+
+def pragmas():
+    return {**DEFAULT_PRAGMAS, **getattr(settings, "SQLITE_PRAGMAS", {})}
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    if connection.vendor != "sqlite":
+        return
+    with connection.cursor() as cursor:
+        for name, value in pragmas().items():
+            cursor.execute(f"PRAGMA {name} = {value}")
+
+
+def is_busy(error):
+    message = str(error).lower()
+    return "database is locked" in message or "database is busy" in message
+
+
+def retry_on_busy(func):
+    """
+    Re-run ``func`` when SQLite reports the database locked. Only retries
+    when called outside a transaction; inside one the caller's transaction
+    is already broken and has to be retried as a whole.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(1, BUSY_ATTEMPTS + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if not is_busy(e) or connection.in_atomic_block or attempt == BUSY_ATTEMPTS:
+                    raise
+                logger.warning("%s hit a locked database, retrying (%d)", func.__name__, attempt)
+                time.sleep(BUSY_BACKOFF_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+    return wrapper
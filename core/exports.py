@@ -0,0 +1,89 @@
+"""
+Streaming order exports.
+
+Orders are read with ``.iterator(chunk_size=...)`` and their items are
+prefetched one chunk at a time, so memory use stays flat however many
+orders match. CSV has one row per order line; NDJSON has one JSON object
+per order with its items nested.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import OrderItem
+
+EXPORT_CHUNK_SIZE = 2000
+
+ORDER_FIELDS = [
+    'id', 'created_at', 'status', 'user_id', 'full_name', 'email', 'phone',
+    'street_address', 'city', 'delivery_zone_id', 'delivery_slot',
+    'payment_method', 'payment_status', 'subtotal', 'tax', 'total_amount',
+    'expected_delivery_time', 'delivered_at',
+]
+ITEM_FIELDS = ['product_id', 'product_name', 'quantity', 'price']
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class _Echo:
+    """File-like object whose ``write`` hands back the value, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_orders(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    items = OrderItem.objects.select_related('product').only(
+        'id', 'order_id', 'product_id', 'quantity', 'price', 'product__title'
+    ).order_by('id')
+    return (
+        queryset.select_related(None)
+        .prefetch_related(None)
+        .prefetch_related(Prefetch('items', queryset=items))
+        .only(*ORDER_FIELDS)
+        .iterator(chunk_size=chunk_size)
+    )
+
+
+def order_values(order):
+    return [getattr(order, field) for field in ORDER_FIELDS]
+
+
+def item_values(item):
+    return [item.product_id, item.product.title, item.quantity, item.price]
+
+
+def csv_rows(orders):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ORDER_FIELDS + ITEM_FIELDS)
+    for order in orders:
+        values = order_values(order)
+        items = order.items.all()
+        if not items:
+            yield writer.writerow(values + [''] * len(ITEM_FIELDS))
+        for item in items:
+            yield writer.writerow(values + item_values(item))
+
+
+def ndjson_rows(orders):
+    for order in orders:
+        row = dict(zip(ORDER_FIELDS, order_values(order)))
+        row['items'] = [dict(zip(ITEM_FIELDS, item_values(item))) for item in order.items.all()]
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def export_response(queryset, fmt='csv', chunk_size=EXPORT_CHUNK_SIZE):
+    rows = csv_rows if fmt == 'csv' else ndjson_rows
+    response = StreamingHttpResponse(
+        rows(iter_orders(queryset, chunk_size)), content_type=EXPORT_FORMATS[fmt]
+    )
+    filename = f"orders-{timezone.localdate():%Y%m%d}.{fmt}"
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
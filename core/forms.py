@@ -8,6 +8,7 @@ from .models import ContactMessage,CustomUser
 from django.core.validators import RegexValidator
 from .models import Order, DeliveryZone
 from .choices import SLOT_CHOICES
+from . import accounts
 from django.contrib.auth import authenticate
 
 User = get_user_model()
@@ -78,6 +79,12 @@ class CustomUserCreationForm(UserCreationForm):
         model = CustomUser
         fields = ['username', 'email', 'phone', 'role', 'password1', 'password2']
 
+    TAKEN_MESSAGES = {
+        'username': "This username is already taken. Please choose another.",
+        'email': "This email address is already registered.",
+        'phone': "This phone number is already registered.",
+    }
+
     def clean_username(self):
         username = self.cleaned_data.get('username', '').strip()
         if not re.match(r'^[A-Za-z0-9](?:[A-Za-z0-9._]*[A-Za-z0-9])?$', username):
@@ -87,24 +94,16 @@ class CustomUserCreationForm(UserCreationForm):
             )
         if len(username) < 3 or len(username) > 30:
             raise ValidationError("Username must be between 3 and 30 characters long.")
-        # Normalize for uniqueness check (case-insensitive)
-        if CustomUser.objects.filter(username__iexact=username).exists():
-            raise ValidationError("This username is already taken. Please choose another.")
-        # Optionally store normalized:
-        return username.lower()  # NOTE: storing username lowercase prevents case issues
+        # Stored lowercase so uniqueness is an exact match; checked in clean()
+        return accounts.normalize_username(username)
 
     def clean_email(self):
-        email = self.cleaned_data.get('email', '').strip()
-        if CustomUser.objects.filter(email__iexact=email).exists():
-            raise ValidationError("This email address is already registered.")
-        return email.lower()
+        return accounts.normalize_email(self.cleaned_data.get('email'))
 
     def clean_phone(self):
         phone = self.cleaned_data.get('phone', '').strip()
         if not re.match(r'^[6-9]\d{9}$', phone):
             raise ValidationError("Enter a valid 10-digit Indian mobile number starting with 6–9.")
-        if CustomUser.objects.filter(phone=phone).exists():
-            raise ValidationError("This phone number is already registered.")
         return phone
 
     def clean_password1(self):
@@ -127,8 +126,30 @@ class CustomUserCreationForm(UserCreationForm):
         password2 = cleaned_data.get('password2')
         if password1 and password2 and password1 != password2:
             self.add_error('password2', "Passwords do not match.")
+
+        # One query for all three uniqueness checks
+        taken = accounts.taken(**{
+            field: cleaned_data[field]
+            for field in self.TAKEN_MESSAGES
+            if cleaned_data.get(field)
+        })
+        for field in taken:
+            self.add_error(field, self.TAKEN_MESSAGES[field])
         return cleaned_data
 
+    def validate_unique(self):
+        # clean() has already checked username, email and phone in one query;
+        # leave them, and every field the form doesn't edit, out of the
+        # per-field model checks.
+        exclude = {
+            field.name for field in self.instance._meta.get_fields()
+            if field.name not in self.fields or field.name in self.TAKEN_MESSAGES
+        }
+        try:
+            self.instance.validate_unique(exclude=exclude)
+        except ValidationError as e:
+            self.add_error(None, e)
+
     def save(self, commit=True):
         """
         Override save to ensure password is hashed and username/email normalized.
@@ -179,16 +200,15 @@ class UserLoginForm(forms.Form):
         if not identifier or not password:
             raise ValidationError("Please provide both identifier and password.")
 
-        # Try to find user by username (case-insensitive) or email (case-insensitive)
-        user_qs = CustomUser.objects.filter(username__iexact=identifier)
-        if not user_qs.exists():
-            user_qs = CustomUser.objects.filter(email__iexact=identifier)
-
-        if not user_qs.exists():
+        # Usernames and emails are stored lowercase, so match exactly
+        identifier = identifier.lower()
+        user_obj = (
+            CustomUser.objects.filter(username=identifier).first()
+            or CustomUser.objects.filter(email=identifier).first()
+        )
+        if user_obj is None:
             raise ValidationError("Invalid username/email or password.")
 
-        user_obj = user_qs.first()
-
         # authenticate using the actual username stored in DB
         user = authenticate(username=user_obj.username, password=password)
         if user is None:
@@ -0,0 +1,59 @@
+"""
+Great-circle distances.
+
+``haversine_km`` is the scalar path for one pair of points. ``distances_km``
+measures from one origin to many points in a single call, vectorized with
+NumPy when it is installed and falling back to the scalar path otherwise.
+"""
+import math
+
+from django.conf import settings
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - NumPy is optional
+    np = None
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """Distance in km between two points given in degrees."""
+    phi1 = math.radians(lat1)
+    phi2 = math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distances_km(lat, lon, points):
+    """
+    Distances in km from ``(lat, lon)`` to each ``(lat, lon)`` in ``points``,
+    returned as a list in the same order.
+    """
+    points = list(points)
+    if np is None or not points:
+        return [haversine_km(lat, lon, plat, plon) for plat, plon in points]
+
+    coords = np.radians(np.asarray(points, dtype=float))
+    phi1 = math.radians(lat)
+    phi2 = coords[:, 0]
+    a = (
+        np.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * np.cos(phi2) * np.sin((coords[:, 1] - math.radians(lon)) / 2) ** 2
+    )
+    return (2 * EARTH_RADIUS_KM * np.arcsin(np.minimum(1.0, np.sqrt(a)))).tolist()
+
+
+def store_location():
+    return float(settings.STORE_LATITUDE), float(settings.STORE_LONGITUDE)
+
+
+def from_store_km(lat, lon):
+    return haversine_km(*store_location(), float(lat), float(lon))
+
+
+def distances_from_store_km(points):
+    return distances_km(*store_location(), points)
@@ -0,0 +1,198 @@
+"""
+Reverse geocoding through Nominatim.
+
+Coordinates are rounded to ``PRECISION`` decimal places (about a metre), so
+small pin drags resolve to the same point. Results are cached in process
+(LRU) and in the GeocodeResult table, both for ``CACHE_TTL``. Concurrent
+lookups of the same point share one upstream request, and upstream requests
+go through a token bucket that keeps to Nominatim's one-request-per-second
+policy over a pooled session with timeouts.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .models import GeocodeResult
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_URL = getattr(settings, "NOMINATIM_URL", "https://nominatim.openstreetmap.org/reverse")
+USER_AGENT = getattr(settings, "GEOCODER_USER_AGENT", "VetriMartDeliveryTracker/1.0")
+TIMEOUT = (3.05, 5)
+PRECISION = Decimal("0.00001")
+CACHE_TTL = timedelta(days=30)
+LRU_SIZE = 2048
+RATE_PER_SECOND = 1
+MAX_WAIT_SECONDS = 5
+
+
+class GeocodingError(Exception):
+    """Nominatim could not be reached in time or returned an error."""
+
+
+def quantize(lat, lon):
+    """Round to ``PRECISION``; raises ValueError for missing or out-of-range input."""
+    try:
+        lat = Decimal(str(lat)).quantize(PRECISION)
+        lon = Decimal(str(lon)).quantize(PRECISION)
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise ValueError("Invalid coordinates")
+    except (InvalidOperation, TypeError):
+        # NaN survives quantize() but fails the range comparison
+        raise ValueError("Invalid coordinates")
+    return lat, lon
+
+
+class TokenBucket:
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, timeout):
+        """Take a token, waiting up to ``timeout`` seconds; False if none came free."""
+        deadline = time.monotonic() + timeout
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(wait, remaining))
+
+
+class _Lookup:
+    """An upstream lookup that other requests for the same point wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.payload = None
+        self.error = None
+
+
+class Geocoder:
+
+    def __init__(self, session=None, rate=RATE_PER_SECOND):
+        if session is None:
+            session = requests.Session()
+            session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=4))
+        session.headers["User-Agent"] = USER_AGENT
+        self.session = session
+        self.bucket = TokenBucket(rate)
+        self._lock = threading.Lock()
+        self._recent = OrderedDict()
+        self._inflight = {}
+
+    def reverse(self, lat, lon):
+        key = quantize(lat, lon)
+        payload = self._recall(key)
+        if payload is not None:
+            return payload
+
+        with self._lock:
+            lookup = self._inflight.get(key)
+            leader = lookup is None
+            if leader:
+                lookup = self._inflight[key] = _Lookup()
+
+        if not leader:
+            if not lookup.done.wait(MAX_WAIT_SECONDS + TIMEOUT[0] + TIMEOUT[1]):
+                raise GeocodingError("Timed out waiting for a geocode lookup.")
+            if lookup.error is not None:
+                raise lookup.error
+            return lookup.payload
+
+        try:
+            lookup.payload = self._stored(key)
+            if lookup.payload is None:
+                lookup.payload = self._fetch(*key)
+                self._store(key, lookup.payload)
+            self._remember(key, lookup.payload)
+            return lookup.payload
+        except Exception as e:
+            # Release waiting requests with the same failure, whatever it is
+            lookup.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            lookup.done.set()
+
+    def _recall(self, key):
+        with self._lock:
+            entry = self._recent.get(key)
+            if entry is None:
+                return None
+            payload, expires = entry
+            if expires < time.monotonic():
+                del self._recent[key]
+                return None
+            self._recent.move_to_end(key)
+            return payload
+
+    def _remember(self, key, payload):
+        with self._lock:
+            self._recent[key] = (payload, time.monotonic() + CACHE_TTL.total_seconds())
+            self._recent.move_to_end(key)
+            if len(self._recent) > LRU_SIZE:
+                self._recent.popitem(last=False)
+
+    def _stored(self, key):
+        lat, lon = key
+        return GeocodeResult.objects.filter(
+            lat=lat, lon=lon, fetched_at__gte=timezone.now() - CACHE_TTL
+        ).values_list("payload", flat=True).first()
+
+    def _store(self, key, payload):
+        lat, lon = key
+        GeocodeResult.objects.update_or_create(
+            lat=lat, lon=lon, defaults={"payload": payload, "fetched_at": timezone.now()}
+        )
+
+    def _fetch(self, lat, lon):
+        if not self.bucket.acquire(MAX_WAIT_SECONDS):
+            raise GeocodingError("Geocoding is busy, please try again.")
+        started = time.monotonic()
+        try:
+            response = self.session.get(
+                NOMINATIM_URL,
+                params={"lat": str(lat), "lon": str(lon), "format": "json", "addressdetails": 1},
+                timeout=TIMEOUT,
+            )
+            response.raise_for_status()
+            return response.json()
+        except (requests.RequestException, ValueError) as e:
+            logger.warning("Reverse geocode of %s, %s failed: %s", lat, lon, e)
+            raise GeocodingError(str(e)) from e
+        finally:
+            logger.info("reverse geocode %s, %s in %.1fms", lat, lon, (time.monotonic() - started) * 1000)
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                _geocoder = Geocoder()
+    return _geocoder
@@ -0,0 +1,125 @@
+"""
+Responsive derivatives of product and category photos.
+
+Each uploaded image is resized to ``WIDTHS`` in WebP and JPEG and written
+under ``media/derivatives/``. The widths and file names are stored on the
+owning row in ``image_variants`` together with the source name they were
+made from, so listing pages can build ``srcset`` (see the
+``responsive_image`` tag) without extra queries, and a replaced image is
+simply treated as having no variants until it is processed.
+
+Resizing runs in a process pool after the upload commits; the
+build_image_variants command backfills existing media the same way.
+"""
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.db import connection, transaction
+
+logger = logging.getLogger(__name__)
+
+WIDTHS = (160, 320, 640)
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 75, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 80, "optimize": True, "progressive": True},
+}
+DERIVATIVE_DIR = "derivatives"
+FALLBACK_WIDTH = 320
+
+_pool = None
+
+
+def variant_name(source_name, width, fmt):
+    # Keep the source extension so mango.jpg and mango.png never share files.
+    return f"{DERIVATIVE_DIR}/{source_name}-{width}.{'jpg' if fmt == 'jpeg' else fmt}"
+
+
+def render_variants(source_name, media_root):
+    """
+    Write every derivative of ``source_name`` and return its
+    ``image_variants`` metadata. Runs in worker processes, so it only
+    touches the filesystem.
+    """
+    from PIL import Image, ImageOps
+
+    variants = {"source": source_name}
+    with Image.open(os.path.join(media_root, source_name)) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ("RGB", "RGBA"):
+            original = original.convert("RGBA")
+        flat = original
+        if original.mode == "RGBA":
+            flat = Image.new("RGB", original.size, (255, 255, 255))
+            flat.paste(original, mask=original.getchannel("A"))
+
+        widths = sorted({min(width, original.width) for width in WIDTHS})
+        for fmt, options in FORMATS.items():
+            image = original if fmt == "webp" else flat
+            entries = []
+            for width in widths:
+                height = max(1, round(original.height * width / original.width))
+                name = variant_name(source_name, width, fmt)
+                path = os.path.join(media_root, name)
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                image.resize((width, height), Image.LANCZOS).save(path, **options)
+                entries.append([width, name])
+            variants[fmt] = entries
+    return variants
+
+
+def is_current(instance):
+    return bool(instance.image) and instance.image_variants.get("source") == instance.image.name
+
+
+def _record(model, pk, source_name, future):
+    try:
+        variants = future.result()
+    except Exception:
+        logger.exception("Could not build image variants for %s", source_name)
+        return
+    try:
+        # Only if the image was not replaced while this one was processing.
+        model.objects.filter(pk=pk, image=source_name).update(image_variants=variants)
+    finally:
+        # Normally runs on the pool's callback thread, which would otherwise
+        # keep the connection open.
+        connection.close()
+
+
+def worker_count():
+    """``settings.IMAGE_VARIANT_WORKERS``; 0 builds variants in-process."""
+    return getattr(settings, "IMAGE_VARIANT_WORKERS", 2)
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=worker_count())
+    return _pool
+
+
+def build_variants(instance):
+    """Build ``instance``'s variants now, in this process."""
+    variants = render_variants(instance.image.name, settings.MEDIA_ROOT)
+    type(instance).objects.filter(pk=instance.pk).update(image_variants=variants)
+    instance.image_variants = variants
+    return variants
+
+
+def schedule_variants(instance):
+    """Queue ``instance``'s image for processing once the transaction commits."""
+    model, pk, name = type(instance), instance.pk, instance.image.name
+
+    def submit():
+        future = get_pool().submit(render_variants, name, settings.MEDIA_ROOT)
+        future.add_done_callback(lambda f: _record(model, pk, name, f))
+
+    def build():
+        try:
+            build_variants(instance)
+        except Exception:
+            logger.exception("Could not build image variants for %s", name)
+
+    transaction.on_commit(submit if worker_count() else build)
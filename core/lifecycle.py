@@ -0,0 +1,104 @@
+"""
+Background order lifecycle.
+
+Every tick moves each in-flight order one step, the same step a page view
+used to trigger through Order.update_status / simulate_movement, and writes
+the results back with bulk_update.
+"""
+from django.conf import settings
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .database import retry_on_busy
+from .models import Order, OutboundEmail
+from .outbox import enqueue_many
+
+IN_FLIGHT_STATUSES = ["pending", "confirmed", "processing", "out_for_delivery", "delayed"]
+
+UPDATE_FIELDS = [
+    "status", "delivered_at", "current_latitude", "current_longitude", "last_notified_status",
+]
+
+BATCH_SIZE = 500
+
+
+def step_order(order, now):
+    """Advance one order in memory. Returns True if anything changed."""
+    moved = False
+
+    if order.status == "processing" and (
+        order.current_latitude is None or order.current_longitude is None
+    ):
+        order.current_latitude = settings.WAREHOUSE_LAT
+        order.current_longitude = settings.WAREHOUSE_LON
+        moved = True
+
+    moved = order.move_courier() or moved
+    return order.advance_status(now) or moved
+
+
+def status_email(order):
+    if not order.email or order.status not in Order.STATUS_EMAILS:
+        return None
+
+    subject, template_name = Order.STATUS_EMAILS[order.status]
+    html_message = render_to_string(template_name, order.status_email_context())
+    return OutboundEmail(
+        to_email=order.email,
+        subject=subject,
+        body=html_message,
+        html_body=html_message,
+        dedupe_key=f"order:{order.id}:{order.status}",
+    )
+
+
+def advance_orders(now=None, batch_size=BATCH_SIZE):
+    """
+    Run one lifecycle tick over all in-flight orders.
+    Returns a dict of how many orders entered each status.
+    """
+    now = now or timezone.now()
+    transitions = {}
+
+    orders = (
+        Order.objects.filter(status__in=IN_FLIGHT_STATUSES)
+        .select_related("user")
+        .order_by("id")
+    )
+
+    last_id = 0
+    while True:
+        batch = list(orders.filter(id__gt=last_id)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        changed, emails = [], []
+        for order in batch:
+            previous = order.status
+            if not step_order(order, now):
+                continue
+
+            if order.status != previous:
+                transitions[order.status] = transitions.get(order.status, 0) + 1
+                email = status_email(order)
+                if email:
+                    emails.append(email)
+                    order.last_notified_status = order.status
+            changed.append(order)
+
+        save_batch(changed, emails)
+
+    return transitions
+
+
+@retry_on_busy
+def save_batch(orders, emails):
+    # One transaction: an order must not keep last_notified_status for an
+    # email that never reached the outbox.
+    with transaction.atomic():
+        if orders:
+            Order.objects.bulk_update(orders, UPDATE_FIELDS)
+        if emails:
+            enqueue_many(emails)
@@ -0,0 +1,39 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+
+from core import geo
+
+
+class Command(BaseCommand):
+    help = "Compare per-row and batched store distance computation over random points."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--points", type=int, default=10_000)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["points"])
+        store_lat, store_lon = geo.store_location()
+        points = [
+            (store_lat + rng.uniform(-0.5, 0.5), store_lon + rng.uniform(-0.5, 0.5))
+            for _ in range(options["points"])
+        ]
+
+        per_row = self.time_call(options["repeat"], lambda: [
+            geo.haversine_km(store_lat, store_lon, lat, lon) for lat, lon in points
+        ])
+        batched = self.time_call(options["repeat"], lambda: geo.distances_from_store_km(points))
+
+        backend = "numpy" if geo.np is not None else "scalar fallback"
+        self.stdout.write(f"{len(points)} points")
+        self.stdout.write(f"  per-row  {per_row:8.2f} ms")
+        self.stdout.write(f"  batched  {batched:8.2f} ms   ({backend})")
+
+    def time_call(self, repeat, fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) * 1000 / repeat
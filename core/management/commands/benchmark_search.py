@@ -0,0 +1,87 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+
+from core import search
+from core.models import Category, Product
+
+WORDS = [
+    "fresh", "organic", "tomato", "onion", "mango", "banana", "paneer", "butter",
+    "cheese", "milk", "almond", "cashew", "chicken", "mutton", "fish", "juice",
+    "lemon", "spinach", "carrot", "broccoli", "cookies", "chips", "honey", "rice",
+]
+
+SYLLABLES = ["ka", "ri", "mo", "su", "ve", "la", "ni", "do", "pa", "te", "go", "mi"]
+
+QUERIES = ["tomato", "fresh mango", "chee", "organic spin", "nothingmatches"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare icontains and full-text product search latency on synthetic "
+        "catalogues. All generated rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000])
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        if not search.fts_available():
+            self.stderr.write("Full-text search requires the SQLite backend.")
+            return
+
+        for size in options["sizes"]:
+            with transaction.atomic():
+                self.populate(size)
+                self.stdout.write(f"\n{size} products")
+                for query in QUERIES:
+                    scan = self.time_query(options["repeat"], lambda: list(
+                        Product.objects.filter(
+                            Q(title__icontains=query) |
+                            Q(description__icontains=query) |
+                            Q(category__name__icontains=query)
+                        ).distinct().values_list("id", flat=True)
+                    ))
+                    fts = self.time_query(options["repeat"], lambda: [
+                        p.id for p in search.ranked_products(Product.objects.all(), query)
+                    ])
+                    self.stdout.write(
+                        f"  {query!r:18} icontains {scan:8.2f} ms   fts {fts:8.2f} ms"
+                    )
+                transaction.set_rollback(True)
+
+    def populate(self, size):
+        rng = random.Random(size)
+        brands = list({
+            "".join(rng.choices(SYLLABLES, k=4)) for _ in range(3000)
+        })
+        categories = [
+            Category.objects.create(name=f"bench-{size}-{i}", image="categories/bench.jpg")
+            for i in range(20)
+        ]
+        batch = []
+        for i in range(size):
+            batch.append(Product(
+                category=rng.choice(categories),
+                title=f"{rng.choice(brands)} {rng.choice(WORDS)} {i}",
+                description=" ".join(rng.choices(brands, k=20) + rng.choices(WORDS, k=2)),
+                base_price=rng.randint(10, 900),
+                effective_price=0,
+                image="products/bench.jpg",
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+        search.rebuild_index()
+
+    def time_query(self, repeat, fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(repeat):
+            fn()
+        return (time.perf_counter() - start) * 1000 / repeat
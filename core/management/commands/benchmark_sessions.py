@@ -0,0 +1,61 @@
+import time
+from importlib import import_module
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+ENGINES = [
+    "django.contrib.sessions.backends.db",
+    "django.contrib.sessions.backends.cached_db",
+    "django.contrib.sessions.backends.signed_cookies",
+]
+
+GUEST_STATE = {
+    "cart": [[pid, "500G", 2] for pid in range(1, 6)],
+    "wishlist": list(range(1, 11)),
+    "selected_zone": 3,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Time one guest session read and one write per request for each "
+        "session engine. Database rows are rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = options["requests"]
+        for engine in ENGINES:
+            store_class = import_module(engine).SessionStore
+            with transaction.atomic():
+                session = store_class()
+                session.update(GUEST_STATE)
+                session.save()
+                key = session.session_key
+
+                read = self.time_per_request(count, lambda: store_class(key).get("cart"))
+
+                def write():
+                    nonlocal key
+                    store = store_class(key)
+                    store["selected_zone"] = store.get("selected_zone", 0) + 1
+                    store.save()
+                    key = store.session_key
+
+                written = self.time_per_request(count, write)
+                store_class(key).delete()
+                transaction.set_rollback(True)
+
+            self.stdout.write(
+                f"{engine.rsplit('.', 1)[1]:15} read {read:8.1f} µs   write {written:8.1f} µs"
+            )
+
+    def time_per_request(self, count, fn):
+        fn()
+        start = time.perf_counter()
+        for _ in range(count):
+            fn()
+        return (time.perf_counter() - start) * 1e6 / count
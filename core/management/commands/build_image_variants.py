@@ -0,0 +1,45 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from core import images
+from core.models import Category, Product
+
+
+class Command(BaseCommand):
+    help = "Build WebP/JPEG size variants for product and category images that lack them."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count())
+        parser.add_argument("--force", action="store_true", help="Rebuild current variants too.")
+
+    def handle(self, *args, **options):
+        pending = [
+            (model, obj.pk, obj.image.name)
+            for model in (Category, Product)
+            for obj in model.objects.exclude(image="").only("id", "image", "image_variants")
+            if options["force"] or not images.is_current(obj)
+        ]
+        if not pending:
+            self.stdout.write("All image variants are current.")
+            return
+
+        built = failed = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            futures = [
+                pool.submit(images.render_variants, name, settings.MEDIA_ROOT)
+                for _, _, name in pending
+            ]
+            for (model, pk, name), future in zip(pending, futures):
+                try:
+                    variants = future.result()
+                except Exception as e:
+                    failed += 1
+                    self.stderr.write(f"{name}: {e}")
+                    continue
+                model.objects.filter(pk=pk, image=name).update(image_variants=variants)
+                built += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Built variants for {built} images, {failed} failed."))
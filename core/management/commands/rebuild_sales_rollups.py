@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from core.metrics import rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Recompute the dashboard sales rollups from the full order history."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            rebuild_rollups()
+        self.stdout.write(self.style.SUCCESS("Sales rollups rebuilt."))
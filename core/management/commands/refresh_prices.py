@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core.pricing import refresh_effective_prices
+
+
+class Command(BaseCommand):
+    help = "Recompute materialized product prices for opened or closed offer windows."
+
+    def handle(self, *args, **options):
+        updated = refresh_effective_prices()
+        self.stdout.write(self.style.SUCCESS(f"Updated {updated} product price(s)."))
@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.lifecycle import advance_orders
+
+
+class Command(BaseCommand):
+    help = "Advance all in-flight orders one lifecycle step per tick."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--loop", action="store_true",
+            help="Keep ticking instead of running a single pass.",
+        )
+        parser.add_argument("--interval", type=float, default=10.0,
+                            help="Seconds between ticks in --loop mode.")
+
+    def handle(self, *args, **options):
+        while True:
+            transitions = advance_orders()
+            if transitions:
+                summary = ", ".join(f"{n} -> {status}" for status, n in transitions.items())
+                self.stdout.write(f"Advanced orders: {summary}")
+
+            if not options["loop"]:
+                break
+            time.sleep(options["interval"])
@@ -0,0 +1,296 @@
+"""
+Admin and vendor dashboard metrics.
+
+Daily, category and product sales are kept in rollup tables that are
+adjusted by signal handlers whenever an Order or OrderItem is written, so
+the dashboards never have to group the full order history. The vendor
+ledger only counts orders that are not cancelled or failed.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum, Value
+from django.db.models.functions import Coalesce, TruncDate
+from django.utils import timezone
+
+from .models import (
+    Category, CategorySalesRollup, DailySalesRollup, Order, OrderItem,
+    Product, ProductSalesRollup, VendorOrderLedger, VendorSalesLedger,
+)
+
+DASHBOARD_DAYS = 30
+
+VOID_STATUSES = {"cancelled", "failed"}
+
+
+def _bump(model, lookup, create=True, **deltas):
+    """
+    Add ``deltas`` to the rollup row matching ``lookup``. Removals pass
+    ``create=False`` so a row already dropped by a cascade is not revived.
+    """
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    if create:
+        model.objects.get_or_create(**lookup)
+    model.objects.filter(**lookup).update(
+        **{field: F(field) + delta for field, delta in deltas.items()}
+    )
+
+
+def order_day(order):
+    return timezone.localdate(order.created_at)
+
+
+def record_order_change(order, previous_total=None, sign=1):
+    """
+    Apply an order write to the daily rollup. ``previous_total`` is the
+    stored total before an update, or None for a new order.
+    """
+    total = Decimal(order.total_amount or 0)
+    if previous_total is None:
+        _bump(DailySalesRollup, {"day": order_day(order)}, create=sign > 0,
+              order_count=sign, total_sales=sign * total)
+    else:
+        _bump(DailySalesRollup, {"day": order_day(order)},
+              total_sales=total - Decimal(previous_total or 0))
+
+
+def record_item_change(item, previous=None, sign=1):
+    """
+    Apply an order item write to the category and product rollups and the
+    vendor ledger. ``previous`` is the stored ``(price, quantity)`` before
+    an update.
+    """
+    price = Decimal(item.price or 0)
+    quantity = item.quantity or 0
+    category_id, vendor_id = Product.objects.filter(id=item.product_id).values_list(
+        "category_id", "vendor_id"
+    ).first() or (None, None)
+
+    if previous is None:
+        price_delta, quantity_delta, count_delta = sign * price, sign * quantity, sign
+    else:
+        price_delta = price - Decimal(previous[0] or 0)
+        quantity_delta = quantity - (previous[1] or 0)
+        count_delta = 0
+
+    create = sign > 0
+    if category_id is not None:
+        _bump(CategorySalesRollup, {"category_id": category_id}, create=create,
+              total_sales=price_delta)
+    _bump(ProductSalesRollup, {"product_id": item.product_id}, create=create,
+          order_count=count_delta, quantity=quantity_delta)
+
+    if vendor_id is not None:
+        order = item.order
+        if order.status not in VOID_STATUSES:
+            if previous is None:
+                revenue_delta = sign * price * quantity
+            else:
+                revenue_delta = price * quantity - Decimal(previous[0] or 0) * (previous[1] or 0)
+            _record_vendor_item(vendor_id, item, order, quantity_delta, revenue_delta,
+                                first_or_last=previous is None, sign=sign)
+
+
+def _record_vendor_item(vendor_id, item, order, quantity_delta, revenue_delta, first_or_last, sign):
+    day = order_day(order)
+    _bump(VendorSalesLedger, {"vendor_id": vendor_id, "product_id": item.product_id, "day": day},
+          create=sign > 0, quantity=quantity_delta, revenue=revenue_delta)
+    if not first_or_last:
+        return
+    if sign < 0:
+        # A cascade removes a whole batch of items before the first
+        # post_delete runs, so recount instead of guessing which is last.
+        _recount_vendor_orders(vendor_id, day)
+    elif not OrderItem.objects.filter(
+        order_id=item.order_id, product__vendor_id=vendor_id
+    ).exclude(pk=item.pk).exists():
+        # The order counts once per vendor, on its first item.
+        _bump(VendorOrderLedger, {"vendor_id": vendor_id, "day": day}, order_count=1)
+
+
+def _recount_vendor_orders(vendor_id, day):
+    count = (
+        OrderItem.objects.filter(product__vendor_id=vendor_id, order__created_at__date=day)
+        .exclude(order__status__in=VOID_STATUSES)
+        .values("order_id").distinct().count()
+    )
+    VendorOrderLedger.objects.filter(vendor_id=vendor_id, day=day).update(order_count=count)
+
+
+def record_order_vendor_sales(order, sign=1):
+    """Add (or with ``sign=-1`` remove) a whole order from the vendor ledger."""
+    day = order_day(order)
+    rows = (
+        OrderItem.objects.filter(order=order, product__vendor__isnull=False)
+        .values("product_id", "product__vendor_id")
+        .annotate(qty=Sum("quantity"), revenue=Sum(F("price") * F("quantity")))
+    )
+    vendors = set()
+    for row in rows:
+        vendors.add(row["product__vendor_id"])
+        _bump(VendorSalesLedger,
+              {"vendor_id": row["product__vendor_id"], "product_id": row["product_id"], "day": day},
+              create=sign > 0, quantity=sign * row["qty"], revenue=sign * row["revenue"])
+    for vendor_id in vendors:
+        _bump(VendorOrderLedger, {"vendor_id": vendor_id, "day": day},
+              create=sign > 0, order_count=sign)
+
+
+def record_order_items(order, items):
+    """
+    Apply ``items`` just inserted for a new ``order`` with ``bulk_create``,
+    which sends no signals. Each item's product must already be loaded.
+    """
+    categories = defaultdict(Decimal)
+    products = defaultdict(lambda: [0, 0])
+    vendor_lines = defaultdict(lambda: [0, Decimal(0)])
+    for item in items:
+        product = item.product
+        price = Decimal(item.price)
+        categories[product.category_id] += price
+        products[product.id][0] += 1
+        products[product.id][1] += item.quantity
+        if product.vendor_id is not None:
+            line = vendor_lines[(product.vendor_id, product.id)]
+            line[0] += item.quantity
+            line[1] += price * item.quantity
+
+    for category_id, total in categories.items():
+        _bump(CategorySalesRollup, {"category_id": category_id}, total_sales=total)
+    for product_id, (count, quantity) in products.items():
+        _bump(ProductSalesRollup, {"product_id": product_id}, order_count=count, quantity=quantity)
+
+    if order.status in VOID_STATUSES:
+        return
+    day = order_day(order)
+    for (vendor_id, product_id), (quantity, revenue) in vendor_lines.items():
+        _bump(VendorSalesLedger, {"vendor_id": vendor_id, "product_id": product_id, "day": day},
+              quantity=quantity, revenue=revenue)
+    for vendor_id in {vendor_id for vendor_id, _ in vendor_lines}:
+        _bump(VendorOrderLedger, {"vendor_id": vendor_id, "day": day}, order_count=1)
+
+
+def record_order_status_change(order, previous_status):
+    was_counted = previous_status not in VOID_STATUSES
+    is_counted = order.status not in VOID_STATUSES
+    if was_counted != is_counted:
+        record_order_vendor_sales(order, sign=1 if is_counted else -1)
+
+
+def rebuild_rollups():
+    """Recompute every rollup table from the full order history."""
+    DailySalesRollup.objects.all().delete()
+    CategorySalesRollup.objects.all().delete()
+    ProductSalesRollup.objects.all().delete()
+
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(day=row["day"], order_count=row["count"], total_sales=row["total"] or 0)
+        for row in Order.objects.annotate(day=TruncDate("created_at"))
+        .values("day").annotate(count=Count("id"), total=Sum("total_amount"))
+    ])
+    CategorySalesRollup.objects.bulk_create([
+        CategorySalesRollup(category_id=row["product__category_id"], total_sales=row["total"])
+        for row in OrderItem.objects.values("product__category_id").annotate(total=Sum("price"))
+    ])
+    ProductSalesRollup.objects.bulk_create([
+        ProductSalesRollup(product_id=row["product_id"], order_count=row["count"], quantity=row["qty"])
+        for row in OrderItem.objects.values("product_id").annotate(
+            count=Count("id"), qty=Sum("quantity")
+        )
+    ])
+
+    VendorSalesLedger.objects.all().delete()
+    VendorOrderLedger.objects.all().delete()
+    vendor_items = OrderItem.objects.filter(product__vendor__isnull=False).exclude(
+        order__status__in=VOID_STATUSES
+    ).annotate(day=TruncDate("order__created_at"))
+
+    VendorSalesLedger.objects.bulk_create([
+        VendorSalesLedger(
+            vendor_id=row["product__vendor_id"], product_id=row["product_id"], day=row["day"],
+            quantity=row["qty"], revenue=row["revenue"],
+        )
+        for row in vendor_items.values("product__vendor_id", "product_id", "day").annotate(
+            qty=Sum("quantity"), revenue=Sum(F("price") * F("quantity"))
+        )
+    ])
+    VendorOrderLedger.objects.bulk_create([
+        VendorOrderLedger(vendor_id=row["product__vendor_id"], day=row["day"], order_count=row["count"])
+        for row in vendor_items.values("product__vendor_id", "day").annotate(
+            count=Count("order_id", distinct=True)
+        )
+    ])
+
+
+def order_summary():
+    """Order count, sales total and per-status counts in a single aggregate."""
+    aggregates = {
+        status: Count("id", filter=Q(status=status))
+        for status, _ in Order.STATUS_CHOICES
+    }
+    aggregates["total_orders"] = Count("id")
+    aggregates["total_sales"] = Sum("total_amount")
+    return Order.objects.aggregate(**aggregates)
+
+
+def dashboard_metrics(days=DASHBOARD_DAYS):
+    summary = order_summary()
+    since = timezone.localdate() - timedelta(days=days - 1)
+
+    daily = DailySalesRollup.objects.filter(day__gte=since).order_by("day")
+    categories = Category.objects.select_related("sales_rollup").order_by("id")
+    top_products = [
+        rollup.product for rollup in
+        ProductSalesRollup.objects.select_related("product").order_by("-order_count")[:5]
+    ]
+    top_items = ProductSalesRollup.objects.select_related("product").order_by("-quantity")[:5]
+    low_stock_items = list(
+        Product.objects.annotate(
+            sales=Coalesce(F("sales_rollup__order_count"), Value(0))
+        ).order_by("sales")[:10]
+    )
+
+    return {
+        "total_orders": summary["total_orders"],
+        "total_sales": summary["total_sales"] or 0,
+        "delivery_status_counts": {
+            status: summary[status] for status, _ in Order.STATUS_CHOICES
+        },
+        "daily": [(d.day, d.total_sales) for d in daily],
+        "categories": [
+            (c.name, getattr(c, "sales_rollup", None) and c.sales_rollup.total_sales or 0)
+            for c in categories
+        ],
+        "top_products": top_products,
+        "top_items": [(r.product.title, r.quantity) for r in top_items],
+        "low_stock_items": low_stock_items,
+    }
+
+
+def vendor_sales(vendor, start=None, end=None):
+    """
+    Sales for ``vendor`` between the ``start`` and ``end`` dates inclusive
+    (either may be None for an open range), read from the vendor ledger.
+    """
+    ledger = VendorSalesLedger.objects.filter(vendor=vendor, quantity__gt=0)
+    orders = VendorOrderLedger.objects.filter(vendor=vendor)
+    if start is not None:
+        ledger = ledger.filter(day__gte=start)
+        orders = orders.filter(day__gte=start)
+    if end is not None:
+        ledger = ledger.filter(day__lte=end)
+        orders = orders.filter(day__lte=end)
+
+    sales_data = list(
+        ledger.values("product__title")
+        .annotate(total_sales=Sum("revenue"), total_quantity=Sum("quantity"))
+        .order_by("-total_sales")
+    )
+    return {
+        "total_revenue": sum((row["total_sales"] for row in sales_data), Decimal(0)),
+        "total_orders": orders.aggregate(total=Sum("order_count"))["total"] or 0,
+        "sales_data": sales_data,
+    }
@@ -0,0 +1,12 @@
+from .pricing import ensure_prices_fresh
+
+
+class PriceRefreshMiddleware:
+    """Re-materialize product prices when an offer window opens or closes."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        ensure_prices_fresh()
+        return self.get_response(request)
@@ -0,0 +1,46 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:06
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def populate_effective_price(apps, schema_editor):
+    Product = apps.get_model('core', 'Product')
+    now = timezone.now()
+    products = list(Product.objects.all())
+
+    for product in products:
+        active = product.is_offer and (
+            not (product.offer_start and product.offer_end)
+            or product.offer_start <= now <= product.offer_end
+        )
+        price = Decimal(product.base_price)
+        if active:
+            price = round(price - (price * product.discount_percent) / 100, 2)
+        product.offer_active = active
+        product.effective_price = price
+
+    Product.objects.bulk_update(products, ['offer_active', 'effective_price'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_alter_product_discount_percent_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='effective_price',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=8),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='offer_active',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(populate_effective_price, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_rollups(apps, schema_editor):
+    Order = apps.get_model('core', 'Order')
+    OrderItem = apps.get_model('core', 'OrderItem')
+    DailySalesRollup = apps.get_model('core', 'DailySalesRollup')
+    CategorySalesRollup = apps.get_model('core', 'CategorySalesRollup')
+    ProductSalesRollup = apps.get_model('core', 'ProductSalesRollup')
+
+    DailySalesRollup.objects.bulk_create([
+        DailySalesRollup(day=row['day'], order_count=row['count'], total_sales=row['total'] or 0)
+        for row in Order.objects.annotate(day=TruncDate('created_at'))
+        .values('day').annotate(count=Count('id'), total=Sum('total_amount'))
+    ])
+    CategorySalesRollup.objects.bulk_create([
+        CategorySalesRollup(category_id=row['product__category_id'], total_sales=row['total'])
+        for row in OrderItem.objects.values('product__category_id').annotate(total=Sum('price'))
+    ])
+    ProductSalesRollup.objects.bulk_create([
+        ProductSalesRollup(product_id=row['product_id'], order_count=row['count'], quantity=row['qty'])
+        for row in OrderItem.objects.values('product_id').annotate(count=Count('id'), qty=Sum('quantity'))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_outboundemail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(unique=True)),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CategorySalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_sales', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollup', to='core.category')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ProductSalesRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('order_count', models.PositiveIntegerField(db_index=True, default=0)),
+                ('quantity', models.PositiveIntegerField(db_index=True, default=0)),
+                ('product', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='sales_rollup', to='core.product')),
+            ],
+        ),
+        migrations.RunPython(backfill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:19
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+
+
+def backfill_ledger(apps, schema_editor):
+    OrderItem = apps.get_model('core', 'OrderItem')
+    VendorSalesLedger = apps.get_model('core', 'VendorSalesLedger')
+    VendorOrderLedger = apps.get_model('core', 'VendorOrderLedger')
+
+    items = OrderItem.objects.filter(product__vendor__isnull=False).exclude(
+        order__status__in=['cancelled', 'failed']
+    ).annotate(day=TruncDate('order__created_at'))
+
+    VendorSalesLedger.objects.bulk_create([
+        VendorSalesLedger(
+            vendor_id=row['product__vendor_id'], product_id=row['product_id'], day=row['day'],
+            quantity=row['qty'], revenue=row['revenue'],
+        )
+        for row in items.values('product__vendor_id', 'product_id', 'day').annotate(
+            qty=Sum('quantity'), revenue=Sum(F('price') * F('quantity'))
+        )
+    ])
+    VendorOrderLedger.objects.bulk_create([
+        VendorOrderLedger(vendor_id=row['product__vendor_id'], day=row['day'], order_count=row['count'])
+        for row in items.values('product__vendor_id', 'day').annotate(count=Count('order_id', distinct=True))
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_sales_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VendorOrderLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('order_count', models.PositiveIntegerField(default=0)),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'day'), name='unique_vendor_day')],
+            },
+        ),
+        migrations.CreateModel(
+            name='VendorSalesLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('revenue', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_ledger', to='core.product')),
+                ('vendor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sales_ledger', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['vendor', 'day'], name='core_vendor_vendor__baa248_idx')],
+                'constraints': [models.UniqueConstraint(fields=('vendor', 'product', 'day'), name='unique_vendor_product_day')],
+            },
+        ),
+        migrations.RunPython(backfill_ledger, migrations.RunPython.noop),
+    ]
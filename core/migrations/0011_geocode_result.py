@@ -0,0 +1,27 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:37
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_order_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GeocodeResult',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lat', models.DecimalField(decimal_places=5, max_digits=8)),
+                ('lon', models.DecimalField(decimal_places=5, max_digits=8)),
+                ('payload', models.JSONField()),
+                ('fetched_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('lat', 'lon'), name='unique_geocode_point')],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:40
+
+from django.db import migrations, models
+
+from core.geo import distances_from_store_km
+
+
+def backfill_distances(apps, schema_editor):
+    DeliveryZone = apps.get_model('core', 'DeliveryZone')
+    zones = list(DeliveryZone.objects.filter(latitude__isnull=False, longitude__isnull=False))
+    distances = distances_from_store_km((zone.latitude, zone.longitude) for zone in zones)
+    for zone, distance in zip(zones, distances):
+        # Same rounding and zero-as-missing rule as DeliveryZone.save().
+        zone.distance_km = round(distance, 2) if zone.latitude and zone.longitude else 0.0
+    DeliveryZone.objects.bulk_update(zones, ['distance_km'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_geocode_result'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='deliveryzone',
+            name='distance_km',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_distances, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.8 on 2026-10-18 13:48
+
+from django.db import migrations, models
+
+
+def normalize_accounts(apps, schema_editor):
+    # Lookups are now exact on the lowercased values CustomUser.save() writes;
+    # bring older rows in line. A username that would collide is left as is.
+    CustomUser = apps.get_model('core', 'CustomUser')
+    usernames = set(CustomUser.objects.values_list('username', flat=True))
+    for user in CustomUser.objects.only('id', 'username', 'email'):
+        username = user.username.strip().lower()
+        email = user.email.strip().lower()
+        if username != user.username and username in usernames:
+            username = user.username
+        if (username, email) != (user.username, user.email):
+            usernames.add(username)
+            CustomUser.objects.filter(pk=user.pk).update(username=username, email=email)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customuser',
+            name='email',
+            field=models.EmailField(blank=True, db_index=True, max_length=254, verbose_name='email address'),
+        ),
+        migrations.RunPython(normalize_accounts, migrations.RunPython.noop),
+    ]
@@ -13,8 +13,9 @@ from django.db import models
 from django.core.mail import send_mail
 from django.template.loader import render_to_string
 from datetime import datetime, timedelta
-from math import radians, sin, cos, sqrt, atan2
-from .utils import calculate_distance_km
+from .geo import haversine_km
+from .utils import calculate_distance_km, get_wishlist_ids
+from . import slots, units
  
 from django.contrib.auth.models import AbstractUser
 from django.db import models
@@ -28,6 +29,9 @@ class CustomUser(AbstractUser):
 
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='customer')
     phone = models.CharField(max_length=10, unique=True, null=True, blank=True)
+    # Indexed for the exact-match availability and login lookups; save()
+    # keeps it lowercased.
+    email = models.EmailField('email address', blank=True, db_index=True)
 
     def save(self, *args, **kwargs):
         if self.username:
@@ -42,6 +46,7 @@ class CustomUser(AbstractUser):
 class Category(models.Model):
     name = models.CharField(max_length=200, unique=True)
     image = models.ImageField(upload_to='categories/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     is_offer_category = models.BooleanField(
         default=False,
@@ -90,6 +95,7 @@ class Product(models.Model):
     base_price = models.DecimalField(max_digits=8, decimal_places=2)
 
     image = models.ImageField(upload_to='products/')
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
 
     unit = models.CharField(
         max_length=20,
@@ -132,43 +138,92 @@ class Product(models.Model):
         help_text="When the offer ends"
     )
 
+    # Materialized pricing, kept in sync by save() and core.pricing so that
+    # listings can filter and sort on the real selling price in SQL.
+    offer_active = models.BooleanField(default=False, editable=False)
+
+    effective_price = models.DecimalField(
+        max_digits=8,
+        decimal_places=2,
+        default=0,
+        editable=False,
+        db_index=True
+    )
+
+    class Meta:
+        indexes = [
+            # Partial: SQLite tests booleans as bare columns, which a
+            # composite (is_offer, ...) index cannot match.
+            models.Index(
+                fields=['offer_end'], condition=models.Q(is_offer=True), name='product_offer_end_idx'
+            ),
+            models.Index(fields=['category', 'offer_active'], name='product_category_offer_idx'),
+        ]
+
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        self.refresh_offer_state()
+        update_fields = kwargs.get("update_fields")
+        if update_fields is not None:
+            kwargs["update_fields"] = {*update_fields, "offer_active", "effective_price"}
+        super().save(*args, **kwargs)
+
     def get_absolute_url(self):
-        return reverse('product_detail', args=[self.category.id, self.id])
+        return reverse('product_detail', args=[self.category_id, self.id])
 
     def get_weight_options_list(self):
-        if not self.weight_options:
-            return []
-        return [w.strip() for w in self.weight_options.split(",")]
+        return units.split_options(self.weight_options)
+
+    @property
+    def default_weight(self):
+        options = self.get_weight_options_list()
+        return options[0] if options else ""
 
     def is_in_wishlist_for_user(self, user):
         return (
             user.is_authenticated and
-            self.wishlist_users.filter(id=user.id).exists()
+            self.id in get_wishlist_ids(user)
         )
 
 
-    @property
-    def discounted_price(self):
-        if self.is_offer_active:
-            discount = (self.base_price * self.discount_percent) / 100
-            return round(self.base_price - discount, 2)
-        return self.base_price
-
-    @property
-    def is_offer_active(self):
+    def offer_active_at(self, now):
         if not self.is_offer:
             return False
 
-        now = timezone.now()
-
         if self.offer_start and self.offer_end:
             return self.offer_start <= now <= self.offer_end
 
         return True
 
+    def refresh_offer_state(self, now=None):
+        """
+        Recompute the materialized offer flag and selling price.
+        Returns True when either value changed.
+        """
+        active = self.offer_active_at(now or timezone.now())
+        base_price = Decimal(str(self.base_price))
+
+        if active:
+            discount = (base_price * self.discount_percent) / 100
+            price = round(base_price - discount, 2)
+        else:
+            price = base_price
+
+        changed = active != self.offer_active or price != self.effective_price
+        self.offer_active = active
+        self.effective_price = price
+        return changed
+
+    @property
+    def discounted_price(self):
+        return self.effective_price
+
+    @property
+    def is_offer_active(self):
+        return self.offer_active
+
     @property
     def offer_remaining_time(self):
         if not self.offer_end:
@@ -192,8 +247,8 @@ class Product(models.Model):
 
     @property
     def savings_amount(self):
-        if self.is_offer_active and self.discount_percent > 0:
-            return round(self.base_price - self.discounted_price, 2)
+        if self.offer_active and self.discount_percent > 0:
+            return round(self.base_price - self.effective_price, 2)
         return 0
 
     # -------------------------------------------------------------
@@ -205,41 +260,7 @@ class Product(models.Model):
         Converts weight like '500G', '1KG', '750ML', '1L' into
         a multiplier for calculating final price.
         """
-        weight_str = weight_str.upper().strip()
-
-        # KG-based products (vegetables, fruits)
-        if self.unit == "kg":
-            if weight_str.endswith("KG"):
-                return float(weight_str.replace("KG", ""))
-            if weight_str.endswith("G"):
-                return float(weight_str.replace("G", "")) / 1000
-
-        # Gram-based products (cheese, butter)
-        if self.unit == "g":
-            if weight_str.endswith("G"):
-                return float(weight_str.replace("G", "")) / 1000
-            if weight_str.endswith("KG"):
-                return float(weight_str.replace("KG", ""))
-
-        # Litre-based products (milk, juices)
-        if self.unit == "litre":
-            if weight_str.endswith("L"):
-                return float(weight_str.replace("L", ""))
-            if weight_str.endswith("ML"):
-                return float(weight_str.replace("ML", "")) / 1000
-
-        # ML-based products (badam milk)
-        if self.unit == "ml":
-            if weight_str.endswith("ML"):
-                return float(weight_str.replace("ML", "")) / 1000
-            if weight_str.endswith("L"):
-                return float(weight_str.replace("L", ""))
-
-        # Piece, Pack, Dozen → Always 1 unit
-        if self.unit in ["piece", "pack", "dozen"]:
-            return 1
-
-        return 1
+        return float(units.multiplier(self.unit, weight_str))
 
 
 class CartItem(models.Model):
@@ -247,16 +268,16 @@ class CartItem(models.Model):
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     weight = models.CharField(max_length=50)
     quantity = models.PositiveIntegerField(default=1)
-    
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'product', 'weight'], name='cartitem_user_line_idx'),
+        ]
+
     @property
     def total_price(self):
-        weight_multiplier = self.product.convert_weight_value(self.weight)
-
-        unit_price = (
-        self.product.discounted_price
-        if self.product.is_offer_active
-        else self.product.base_price
-    )
+        weight_multiplier = units.multiplier(self.product.unit, self.weight)
+        unit_price = self.product.effective_price
 
         return round(unit_price * weight_multiplier * self.quantity, 2)
 
@@ -264,12 +285,7 @@ class CartItem(models.Model):
     @property
     def price(self):
         """Return total price using discounted price if offer is active."""
-        product_price = (
-            self.product.discounted_price
-            if self.product.is_offer_active
-            else self.product.base_price
-        )
-        return self.quantity * product_price
+        return self.quantity * self.product.effective_price
 
     def __str__(self):
         return f"{self.product.title} ({self.weight}) x {self.quantity}"
@@ -285,11 +301,13 @@ class DeliveryZone(models.Model):
     latitude = models.FloatField(null=True, blank=True)
     longitude = models.FloatField(null=True, blank=True)
     delivery_delay_hours = models.PositiveIntegerField(default=2)
+    distance_km = models.FloatField(null=True, blank=True, editable=False)
     is_active = models.BooleanField(default=True)
 
     def save(self, *args, **kwargs):
-        """Auto-calculate delivery delay based on distance."""
+        """Auto-calculate distance from the store and delivery delay."""
         try:
+            self.distance_km = None
             if self.latitude is not None and self.longitude is not None:
                 distance = calculate_distance_km(
                     float(settings.STORE_LATITUDE),
@@ -297,6 +315,7 @@ class DeliveryZone(models.Model):
                     float(self.latitude),
                     float(self.longitude),
                 )
+                self.distance_km = distance
 
                 if distance <= 3:
                     self.delivery_delay_hours = 1
@@ -369,34 +388,44 @@ class Order(models.Model):
     razorpay_payment_id = models.CharField(max_length=255, blank=True, null=True)
     razorpay_signature = models.CharField(max_length=255, blank=True, null=True)
     payment_status = models.CharField(max_length=20, default="Pending")
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'idempotency_key'], name='unique_order_idempotency_key'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='order_user_created_idx'),
+            models.Index(fields=['status'], name='order_status_idx'),
+        ]
 
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
     def send_status_email(self, subject, template_name, ctx):
+        from .outbox import enqueue_email
+
         if not self.email:
             return False
-        try:
-            html_message = render_to_string(template_name, ctx)
-            send_mail(subject, html_message,
-                      settings.EMAIL_HOST_USER, [self.email],
-                      html_message=html_message)
-            return True
-        except:
-            return False
+        html_message = render_to_string(template_name, ctx)
+        return enqueue_email(
+            self.email, subject, html_message,
+            html_body=html_message,
+            dedupe_key=f"order:{self.id}:{self.status}",
+        )
         
     def calculate_totals(self):
-        from decimal import Decimal
-        from django.utils import timezone
-        from datetime import timedelta
-        from .utils import calculate_distance_km
-
         subtotal = sum(item.price * item.quantity for item in self.items.all())
-        tax = subtotal * Decimal('0.05')
-        total = subtotal + tax
+        self.set_totals(subtotal)
+        self.apply_delivery_estimate()
+        self.save()
 
+    def set_totals(self, subtotal):
         self.subtotal = subtotal
-        self.tax = tax
-        self.total_amount = total
+        self.tax = subtotal * Decimal('0.05')
+        self.total_amount = self.subtotal + self.tax
+
+    def apply_delivery_estimate(self, now=None):
+        """Set distance and the slot ETA (see core.slots) without saving."""
         dist = None
         if self.latitude and self.longitude:
             dist = calculate_distance_km(
@@ -404,17 +433,16 @@ class Order(models.Model):
             self.latitude, self.longitude
         )
         elif self.delivery_zone:
-            dist = calculate_distance_km(
-            settings.STORE_LATITUDE, settings.STORE_LONGITUDE,
-            self.delivery_zone.latitude, self.delivery_zone.longitude
-        )
+            dist = slots.zone_distance_km(self.delivery_zone)
 
-        if dist:
+        if dist is not None:
             self.distance_km = dist
-            eta_minutes = max(10, (dist / 15) * 60)
-            self.expected_delivery_time = timezone.now() + timedelta(minutes=eta_minutes)
 
-            self.save()
+        try:
+            slot = slots.get_slot(self.delivery_slot)
+        except ValueError:
+            slot = slots.SLOTS[slots.DEFAULT_SLOT]
+        self.expected_delivery_time = slots.slot_eta(slot, dist, now).eta
 
     def get_distance_km(self):
         try:
@@ -423,24 +451,16 @@ class Order(models.Model):
             if not self.latitude or not self.longitude:
                 return None
 
-            lat1 = radians(self.current_latitude)
-            lon1 = radians(self.current_longitude)
-            lat2 = radians(self.latitude)
-            lon2 = radians(self.longitude)
-
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-
-            a = sin(dlat / 2) ** 2 + cos(lat1) * cos(lat2) * sin(dlon / 2) ** 2
-            c = 2 * atan2(sqrt(a), sqrt(1 - a))
-
-            return 6371 * c
+            return haversine_km(
+                self.current_latitude, self.current_longitude, self.latitude, self.longitude
+            )
         except:
             return None
 
-    def simulate_movement(self):
+    def move_courier(self):
+        """Step the simulated courier towards the customer without saving."""
         if self.status != "out_for_delivery":
-            return
+            return False
 
         if not self.current_latitude or not self.current_longitude:
             self.current_latitude = settings.WAREHOUSE_LAT
@@ -460,49 +480,27 @@ class Order(models.Model):
             else:
                 self.current_longitude = self.longitude
 
-        self.save(update_fields=['current_latitude', 'current_longitude'])
+        return True
+
+    def simulate_movement(self):
+        if self.move_courier():
+            self.save(update_fields=['current_latitude', 'current_longitude'])
         
     def calculate_expected_delivery(self):
-        from .utils import get_delivery_delay
-        delay_hours = 2
-
-        if self.delivery_zone:
-            delay_hours = get_delivery_delay(zone=self.delivery_zone)
-        elif self.latitude and self.longitude:
-            delay_hours = get_delivery_delay(lat=self.latitude, lon=self.longitude)
-        def convert_to_24h(time_str):
-            """Convert '8AM' or '12PM' to 24h integer."""
-            num = int(time_str[:-2])
-            mer = time_str[-2:] 
-
-            if mer == "AM":
-                return 0 if num == 12 else num
-            else:
-                return 12 if num == 12 else num + 12
+        self.apply_delivery_estimate()
+        self.save(update_fields=["distance_km", "expected_delivery_time"])
+        return self.expected_delivery_time
 
-        try:
-            start_raw, end_raw = self.delivery_slot.split(" - ")
-            start_hour = convert_to_24h(start_raw)
-            end_hour = convert_to_24h(end_raw)
-        except:
-   
-            start_hour, end_hour = 10, 12
-        today = timezone.localtime().date()
-        slot_start = timezone.make_aware(
-        datetime(today.year, today.month, today.day, start_hour, 0)
-    )
-
-        final_eta = slot_start + timedelta(hours=delay_hours)
-        self.expected_delivery_time = final_eta
-        self.save(update_fields=["expected_delivery_time"])
-
-        return final_eta
-    def update_status(self):
+    def advance_status(self, now=None):
+        """
+        Move the order one step through its lifecycle without saving.
+        Returns True when the status changed.
+        """
         prev = self.status
-        now = timezone.now()
+        now = now or timezone.now()
 
         if self.status in ["delivered", "failed", "cancelled"]:
-            return
+            return False
         if self.status == "pending":
             self.status = "confirmed"
 
@@ -523,42 +521,30 @@ class Order(models.Model):
 
         if distance is not None and distance < 0.05:
             self.status = "delivered"
-            self.delivered_at = timezone.now()
+            self.delivered_at = now
 
-        if prev != self.status:
-            self.save(update_fields=['status'])
+        return prev != self.status
+
+    def update_status(self):
+        if self.advance_status():
+            self.save(update_fields=['status', 'delivered_at'])
             self.send_status_notification()
 
-    def send_status_notification(self):
-        ctx = {"order": self, "tracking_url": f"{settings.SITE_URL}/track-order/?order_id={self.id}"}
+    STATUS_EMAILS = {
+        "processing": ("Your Order is Being Processed", "emails/order_processing.html"),
+        "out_for_delivery": ("Your Order is Out for Delivery 🚚", "emails/out_for_delivery.html"),
+        "delivered": ("Your Order Has Been Delivered 🎉", "emails/order_delivered.html"),
+        "cancelled": ("Your Order Was Cancelled", "emails/order_cancelled.html"),
+    }
 
-        if self.status == "processing":
-            self.send_status_email(
-                "Your Order is Being Processed",
-                "emails/order_processing.html",
-                ctx
-            )
+    def status_email_context(self):
+        return {"order": self, "tracking_url": f"{settings.SITE_URL}/track-order/?order_id={self.id}"}
 
-        elif self.status == "out_for_delivery":
-            self.send_status_email(
-                "Your Order is Out for Delivery 🚚",
-                "emails/out_for_delivery.html",
-                ctx
-            )
-
-        elif self.status == "delivered":
-            self.send_status_email(
-                "Your Order Has Been Delivered 🎉",
-                "emails/order_delivered.html",
-                ctx
-            )
+    def send_status_notification(self):
+        if self.status in self.STATUS_EMAILS:
+            subject, template_name = self.STATUS_EMAILS[self.status]
+            self.send_status_email(subject, template_name, self.status_email_context())
 
-        elif self.status == "cancelled":
-            self.send_status_email(
-                "Your Order Was Cancelled",
-                "emails/order_cancelled.html",
-                ctx
-            )
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='order_items')
@@ -568,6 +554,68 @@ class OrderItem(models.Model):
     def __str__(self):
         return f"{self.product.title} × {self.quantity}"
     
+class DailySalesRollup(models.Model):
+    """Per-day order totals, maintained incrementally by core.metrics."""
+    day = models.DateField(unique=True)
+    order_count = models.PositiveIntegerField(default=0)
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.day}: {self.order_count} orders"
+
+
+class CategorySalesRollup(models.Model):
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name='sales_rollup')
+    total_sales = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    def __str__(self):
+        return f"{self.category.name}: {self.total_sales}"
+
+
+class ProductSalesRollup(models.Model):
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, related_name='sales_rollup')
+    order_count = models.PositiveIntegerField(default=0, db_index=True)
+    quantity = models.PositiveIntegerField(default=0, db_index=True)
+
+    def __str__(self):
+        return f"{self.product.title}: {self.order_count} orders"
+
+class VendorSalesLedger(models.Model):
+    """
+    Per-vendor, per-product, per-day sales of non-void orders, maintained
+    incrementally by core.metrics.
+    """
+    vendor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sales_ledger')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='sales_ledger')
+    day = models.DateField()
+    quantity = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'product', 'day'], name='unique_vendor_product_day'),
+        ]
+        indexes = [models.Index(fields=['vendor', 'day'])]
+
+    def __str__(self):
+        return f"{self.vendor} / {self.product.title} on {self.day}"
+
+
+class VendorOrderLedger(models.Model):
+    """Distinct non-void orders per vendor and day."""
+    vendor = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='order_ledger')
+    day = models.DateField()
+    order_count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vendor', 'day'], name='unique_vendor_day'),
+        ]
+
+    def __str__(self):
+        return f"{self.vendor} on {self.day}: {self.order_count} orders"
+
+
 class ContactMessage(models.Model):
     name = models.CharField(max_length=100)
     email = models.EmailField()
@@ -587,3 +635,54 @@ class PasswordResetOTP(models.Model):
 
     def is_valid(self):
         return timezone.now() < self.created_at + timedelta(minutes=10) 
+
+
+class OutboundEmail(models.Model):
+    """Queued outgoing mail, delivered by the send_queued_email command."""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+
+    to_email = models.EmailField()
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True, null=True)
+    from_email = models.CharField(max_length=255, blank=True, null=True)
+
+    dedupe_key = models.CharField(max_length=100, unique=True, null=True, blank=True)
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, null=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.subject} -> {self.to_email} ({self.status})"
+
+
+class GeocodeResult(models.Model):
+    """Cached reverse-geocode response for a quantized coordinate (see core.geocoding)."""
+
+    lat = models.DecimalField(max_digits=8, decimal_places=5)
+    lon = models.DecimalField(max_digits=8, decimal_places=5)
+    payload = models.JSONField()
+    fetched_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['lat', 'lon'], name='unique_geocode_point'),
+        ]
+
+    def __str__(self):
+        return f"{self.lat}, {self.lon}"
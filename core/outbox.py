@@ -0,0 +1,124 @@
+"""
+Persistent outbox for outgoing mail.
+
+Views only enqueue; the send_queued_email command drains the queue over a
+single reused SMTP connection, retrying failures with exponential backoff.
+"""
+import logging
+import random
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .models import OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_SECONDS = 30
+BACKOFF_MAX_SECONDS = 60 * 60
+
+
+def enqueue_email(to_email, subject, body, html_body=None, from_email=None, dedupe_key=None):
+    """
+    Queue a message for delivery. Returns False if the address is empty or
+    a message with the same ``dedupe_key`` was already queued.
+    """
+    if not to_email:
+        return False
+
+    try:
+        with transaction.atomic():
+            OutboundEmail.objects.create(
+                to_email=to_email,
+                subject=subject,
+                body=body,
+                html_body=html_body,
+                from_email=from_email or settings.EMAIL_HOST_USER,
+                dedupe_key=dedupe_key,
+            )
+    except IntegrityError:
+        return False
+    return True
+
+
+def enqueue_many(emails):
+    """
+    Queue several ``OutboundEmail`` instances in one insert, skipping any
+    whose ``dedupe_key`` is already queued.
+    """
+    for email in emails:
+        email.from_email = email.from_email or settings.EMAIL_HOST_USER
+    OutboundEmail.objects.bulk_create(emails, ignore_conflicts=True)
+
+
+def backoff_delay(attempts):
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def build_message(email, connection):
+    message = EmailMultiAlternatives(
+        email.subject, email.body, email.from_email, [email.to_email],
+        connection=connection,
+    )
+    if email.html_body:
+        message.attach_alternative(email.html_body, "text/html")
+    return message
+
+
+def send_pending(batch_size=50, now=None):
+    """
+    Send up to ``batch_size`` due messages over one connection.
+    Returns a ``(sent, failed)`` tuple.
+    """
+    now = now or timezone.now()
+    batch = list(
+        OutboundEmail.objects.filter(status="pending", next_attempt_at__lte=now)
+        .order_by("next_attempt_at", "id")[:batch_size]
+    )
+    if not batch:
+        return 0, 0
+
+    sent = failed = 0
+    connection = get_connection(fail_silently=False)
+    try:
+        connection.open()
+    except Exception as e:
+        logger.warning("Could not connect to mail server: %s", e)
+        for email in batch:
+            _record_failure(email, e, now)
+        return 0, len(batch)
+
+    try:
+        for email in batch:
+            try:
+                connection.send_messages([build_message(email, connection)])
+            except Exception as e:
+                logger.warning("Failed to send email %s to %s: %s", email.id, email.to_email, e)
+                _record_failure(email, e, now)
+                failed += 1
+            else:
+                email.status = "sent"
+                email.attempts += 1
+                email.sent_at = timezone.now()
+                email.last_error = None
+                email.save(update_fields=["status", "attempts", "sent_at", "last_error"])
+                sent += 1
+    finally:
+        connection.close()
+
+    return sent, failed
+
+
+def _record_failure(email, error, now):
+    email.attempts += 1
+    email.last_error = str(error)
+    if email.attempts >= MAX_ATTEMPTS:
+        email.status = "failed"
+    else:
+        email.next_attempt_at = now + backoff_delay(email.attempts)
+    email.save(update_fields=["status", "attempts", "last_error", "next_attempt_at"])
@@ -0,0 +1,58 @@
+"""
+Whole-page caching for content pages.
+
+The only per-visitor part of these pages is the nav/footer, which depends on
+whether someone is signed in and on their role. Rendered pages are cached
+once per (deploy version, role, path) in the shared cache, so every worker
+serves the same copy and a deploy starts from a clean slate by bumping
+``settings.DEPLOY_VERSION``. Responses carry ``Vary: Cookie`` and are marked
+private so proxies never hand one visitor's nav to another.
+
+Only use this for pages without forms, messages or other per-user content.
+"""
+import functools
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control, patch_vary_headers
+
+PAGE_TIMEOUT = 60 * 60
+
+
+def role_of(user):
+    if not user.is_authenticated:
+        return "anonymous"
+    return getattr(user, "role", None) or "customer"
+
+
+def page_key(request):
+    version = getattr(settings, "DEPLOY_VERSION", "dev")
+    return f"page:{version}:{role_of(request.user)}:{request.get_full_path()}"
+
+
+def _finish(response, timeout):
+    patch_vary_headers(response, ["Cookie"])
+    patch_cache_control(response, private=True, max_age=timeout)
+    return response
+
+
+def cache_page_by_role(timeout=PAGE_TIMEOUT):
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(request, *args, **kwargs)
+
+            key = page_key(request)
+            cached = cache.get(key)
+            if cached is not None:
+                content, content_type = cached
+                return _finish(HttpResponse(content, content_type=content_type), timeout)
+
+            response = view(request, *args, **kwargs)
+            if response.status_code == 200 and not response.streaming and not response.cookies:
+                cache.set(key, (response.content, response["Content-Type"]), timeout)
+            return _finish(response, timeout)
+        return wrapper
+    return decorator
@@ -0,0 +1,183 @@
+"""
+Payment gateway access.
+
+One long-lived gateway per process wraps a single Razorpay client over a
+pooled HTTP session with strict connect/read timeouts. Connect timeouts
+are retried with jittered backoff; after repeated failures the gateway
+fails fast for a cool-down period so a slow Razorpay degrades checkout
+instead of tying up every worker. Each call's latency is logged and counted.
+
+``settings.PAYMENT_GATEWAY`` selects the implementation; point it at
+``core.payments.FakeGateway`` for load tests.
+"""
+import hashlib
+import hmac
+import logging
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+
+import razorpay
+import requests
+from django.conf import settings
+from django.utils.module_loading import import_string
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = getattr(settings, "RAZORPAY_CONNECT_TIMEOUT", 3.05)
+READ_TIMEOUT = getattr(settings, "RAZORPAY_READ_TIMEOUT", 10)
+MAX_ATTEMPTS = 3
+RETRY_BASE_SECONDS = 0.2
+POOL_SIZE = 10
+FAILURE_THRESHOLD = 5
+COOL_DOWN_SECONDS = 30
+
+
+class PaymentGatewayError(Exception):
+    pass
+
+
+class PaymentGatewayUnavailable(PaymentGatewayError):
+    """The gateway timed out, could not be reached, or is cooling down."""
+
+
+class CallStats:
+    """Per-call latency counters, kept in process for logs and debugging."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.calls = defaultdict(lambda: {"count": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0})
+
+    def observe(self, name, elapsed_ms, ok):
+        with self._lock:
+            entry = self.calls[name]
+            entry["count"] += 1
+            entry["errors"] += 0 if ok else 1
+            entry["total_ms"] += elapsed_ms
+            entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+
+    def snapshot(self):
+        with self._lock:
+            return {name: dict(entry) for name, entry in self.calls.items()}
+
+
+class BaseGateway:
+
+    def __init__(self):
+        self.stats = CallStats()
+
+    def _timed(self, name, func, *args, **kwargs):
+        started = time.monotonic()
+        ok = False
+        try:
+            result = func(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            elapsed_ms = (time.monotonic() - started) * 1000
+            self.stats.observe(name, elapsed_ms, ok)
+            logger.info("payment gateway %s %s in %.1fms", name, "ok" if ok else "failed", elapsed_ms)
+
+    def create_order(self, amount, receipt=None):
+        """Create a gateway order for ``amount`` paise; returns its id."""
+        return self._timed("create_order", self._create_order, amount, receipt)
+
+    def verify_signature(self, order_id, payment_id, signature):
+        return self._timed("verify_signature", self._verify_signature, order_id, payment_id, signature)
+
+    def _create_order(self, amount, receipt):
+        raise NotImplementedError
+
+    def _verify_signature(self, order_id, payment_id, signature):
+        expected = hmac.new(
+            settings.RAZORPAY_KEY_SECRET.encode(),
+            f"{order_id}|{payment_id}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+        # Compare bytes: compare_digest rejects non-ASCII str input.
+        return hmac.compare_digest(expected.encode(), (signature or "").encode())
+
+
+class RazorpayGateway(BaseGateway):
+
+    def __init__(self):
+        super().__init__()
+        session = requests.Session()
+        session.mount("https://", HTTPAdapter(pool_connections=1, pool_maxsize=POOL_SIZE))
+        self.client = razorpay.Client(
+            session=session, auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET)
+        )
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._open_until = 0.0
+
+    def _check_circuit(self):
+        if time.monotonic() < self._open_until:
+            raise PaymentGatewayUnavailable("Payment gateway is cooling down after repeated failures.")
+
+    def _record(self, ok):
+        with self._lock:
+            if ok:
+                self._failures = 0
+                return
+            self._failures += 1
+            if self._failures >= FAILURE_THRESHOLD:
+                self._open_until = time.monotonic() + COOL_DOWN_SECONDS
+                self._failures = 0
+
+    def _create_order(self, amount, receipt):
+        self._check_circuit()
+        data = {"amount": amount, "currency": "INR", "payment_capture": 1}
+        if receipt:
+            data["receipt"] = receipt
+
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            try:
+                order = self.client.order.create(data, timeout=(CONNECT_TIMEOUT, READ_TIMEOUT))
+            except requests.ConnectTimeout as e:
+                # Only retried when the request never left: a read timeout or
+                # a connection reset mid-request may already have created the
+                # order, and a second one would be orphaned.
+                if attempt == MAX_ATTEMPTS:
+                    self._record(False)
+                    raise PaymentGatewayUnavailable(str(e)) from e
+                time.sleep(RETRY_BASE_SECONDS * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+            except (
+                requests.RequestException, ValueError,
+                razorpay.errors.ServerError, razorpay.errors.GatewayError,
+            ) as e:
+                # ValueError: an error page that is not JSON, on older requests.
+                self._record(False)
+                raise PaymentGatewayUnavailable(str(e)) from e
+            except (razorpay.errors.BadRequestError, razorpay.errors.SignatureVerificationError) as e:
+                raise PaymentGatewayError(str(e)) from e
+            else:
+                self._record(True)
+                return order["id"]
+
+
+class FakeGateway(BaseGateway):
+    """Local stand-in for load tests; ``FAKE_GATEWAY_LATENCY`` seconds per call."""
+
+    def _create_order(self, amount, receipt):
+        time.sleep(getattr(settings, "FAKE_GATEWAY_LATENCY", 0))
+        return f"order_fake_{uuid.uuid4().hex[:14]}"
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_gateway():
+    global _gateway
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                gateway_class = import_string(
+                    getattr(settings, "PAYMENT_GATEWAY", "core.payments.RazorpayGateway")
+                )
+                _gateway = gateway_class()
+    return _gateway
@@ -0,0 +1,71 @@
+from django.core.cache import cache
+from django.db.models import F, Min, Q
+from django.utils import timezone
+
+from .models import Product
+
+NEXT_TRANSITION_CACHE_KEY = "pricing:next_transition"
+
+# Upper bound on how long a worker trusts its cached transition time, so that
+# offers edited through another worker are still picked up.
+PRICE_CHECK_INTERVAL = 300
+
+
+def next_price_transition(now=None):
+    """
+    Return the earliest moment after ``now`` at which an offer window
+    opens or closes, or None when no offer is scheduled.
+    """
+    now = now or timezone.now()
+    bounds = Product.objects.filter(is_offer=True).aggregate(
+        next_start=Min("offer_start", filter=Q(offer_start__gt=now)),
+        next_end=Min("offer_end", filter=Q(offer_end__gte=now)),
+    )
+    candidates = [t for t in bounds.values() if t is not None]
+    return min(candidates) if candidates else None
+
+
+def refresh_effective_prices(now=None):
+    """
+    Bring the materialized offer flag and price of every product in line
+    with the offer windows at ``now``. Returns the number of rows updated.
+    """
+    now = now or timezone.now()
+
+    # Only offer products, or products still carrying a stale offer price,
+    # can possibly change.
+    candidates = Product.objects.filter(
+        Q(is_offer=True) | Q(offer_active=True) | ~Q(effective_price=F("base_price"))
+    ).only(
+        "id", "base_price", "is_offer", "discount_percent",
+        "offer_start", "offer_end", "offer_active", "effective_price",
+    )
+
+    changed = [p for p in candidates if p.refresh_offer_state(now)]
+    if changed:
+        Product.objects.bulk_update(changed, ["offer_active", "effective_price"])
+
+    next_at = next_price_transition(now)
+    cache.set(
+        NEXT_TRANSITION_CACHE_KEY,
+        next_at.timestamp() if next_at else None,
+        PRICE_CHECK_INTERVAL,
+    )
+    return len(changed)
+
+
+def ensure_prices_fresh(now=None):
+    """
+    Refresh materialized prices only if an offer window has opened or closed
+    since the last refresh. Costs a single cache lookup otherwise.
+    """
+    now = now or timezone.now()
+    missing = object()
+    next_at = cache.get(NEXT_TRANSITION_CACHE_KEY, missing)
+
+    if next_at is missing or (next_at is not None and now.timestamp() >= next_at):
+        refresh_effective_prices(now)
+
+
+def invalidate_price_schedule():
+    cache.delete(NEXT_TRANSITION_CACHE_KEY)
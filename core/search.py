@@ -0,0 +1,126 @@
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = "core_product_fts"
+
+# bm25 column weights for (title, description, category).
+FTS_WEIGHTS = (10.0, 1.0, 5.0)
+
+SEARCH_RESULT_LIMIT = 200
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_available():
+    return connection.vendor == "sqlite"
+
+
+def create_index(cursor):
+    cursor.execute(
+        f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+        "title, description, category, "
+        "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+    )
+
+
+def rebuild_index(conn=None):
+    """Repopulate the search index from the product table."""
+    with (conn or connection).cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, category) "
+            "SELECT p.id, p.title, COALESCE(p.description, ''), c.name "
+            "FROM core_product p JOIN core_category c ON c.id = p.category_id"
+        )
+
+
+def index_product(product):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product.id])
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, description, category) "
+            "SELECT p.id, p.title, COALESCE(p.description, ''), c.name "
+            "FROM core_product p JOIN core_category c ON c.id = p.category_id "
+            "WHERE p.id = %s",
+            [product.id],
+        )
+
+
+def unindex_product(product_id):
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = %s", [product_id])
+
+
+def reindex_category(category):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {FTS_TABLE} SET category = %s "
+            "WHERE rowid IN (SELECT id FROM core_product WHERE category_id = %s)",
+            [category.name, category.id],
+        )
+
+
+def build_match_query(query):
+    """
+    Turn free text into an FTS5 MATCH expression where every word must
+    match as a prefix, e.g. 'fresh tom' -> '"fresh"* "tom"*'.
+    """
+    tokens = TOKEN_RE.findall(query.lower())
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def search_product_ids(query, limit=SEARCH_RESULT_LIMIT):
+    """Return product ids matching ``query``, best match first."""
+    match = build_match_query(query)
+    if not match:
+        return []
+
+    weights = ", ".join(str(w) for w in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s",
+            [match, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def substring_matches(queryset, query):
+    """
+    Products whose title, description or category contains ``query``
+    anywhere. Used where FTS is unavailable, and when it finds nothing,
+    since FTS only matches word prefixes ('mato' does not find 'Tomato').
+    """
+    return queryset.filter(
+        Q(title__icontains=query) |
+        Q(description__icontains=query) |
+        Q(category__name__icontains=query)
+    ).distinct()
+
+
+def filter_products(queryset, query):
+    """Restrict ``queryset`` to products matching ``query``."""
+    match = build_match_query(query) if fts_available() else ""
+    if match:
+        matched = queryset.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", [match])
+        )
+        if matched.exists():
+            return matched
+    return substring_matches(queryset, query)
+
+
+def ranked_products(queryset, query, limit=SEARCH_RESULT_LIMIT):
+    """
+    Return up to ``limit`` products matching ``query``, best match first.
+    Substring matches, when FTS has none, come back in table order.
+    """
+    ids = search_product_ids(query, limit) if fts_available() else []
+    if not ids:
+        return list(substring_matches(queryset, query)[:limit])
+
+    position = {pk: i for i, pk in enumerate(ids)}
+    return sorted(queryset.filter(id__in=ids), key=lambda p: position[p.id])
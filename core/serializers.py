@@ -10,20 +10,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = ['id', 'product', 'product_name', 'quantity', 'price']
-class OrderSerializer(serializers.ModelSerializer):
-    user_name = serializers.CharField(source='user.username', read_only=True)
-    items = OrderItemSerializer(many=True, read_only=True)
-    delivery_zone_name = serializers.CharField(source='delivery_zone.area_name', read_only=True)
-    status_message = serializers.SerializerMethodField()
-
-    class Meta:
-        model = Order
-        fields = [
-            'id', 'user', 'user_name', 'full_name', 'email', 'phone',
-            'street_address', 'city', 'delivery_zone', 'delivery_zone_name',
-            'delivery_slot', 'payment_method', 'subtotal', 'tax', 'total_amount',
-            'expected_delivery_time', 'status', 'status_message', 'created_at', 'items'
-        ]
+class OrderStatusMessageMixin:
     def get_status_message(self, obj):
         if obj.status == "failed":
             return "⚠️ Delivery failed. Order not delivered on time."
@@ -39,3 +26,29 @@ class OrderSerializer(serializers.ModelSerializer):
             return "🎉 Order successfully delivered!"
         else:
             return "Order pending or awaiting confirmation."
+class OrderListSerializer(OrderStatusMessageMixin, serializers.ModelSerializer):
+    """Compact order row for list endpoints; no nested items."""
+    user_name = serializers.CharField(source='user.username', read_only=True)
+    delivery_zone_name = serializers.CharField(source='delivery_zone.area_name', read_only=True)
+    status_message = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'user', 'user_name', 'full_name', 'city', 'delivery_zone_name',
+            'total_amount', 'payment_method', 'status', 'status_message', 'created_at',
+        ]
+class OrderSerializer(OrderStatusMessageMixin, serializers.ModelSerializer):
+    user_name = serializers.CharField(source='user.username', read_only=True)
+    items = OrderItemSerializer(many=True, read_only=True)
+    delivery_zone_name = serializers.CharField(source='delivery_zone.area_name', read_only=True)
+    status_message = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Order
+        fields = [
+            'id', 'user', 'user_name', 'full_name', 'email', 'phone',
+            'street_address', 'city', 'delivery_zone', 'delivery_zone_name',
+            'delivery_slot', 'payment_method', 'subtotal', 'tax', 'total_amount',
+            'expected_delivery_time', 'status', 'status_message', 'created_at', 'items'
+        ]
@@ -0,0 +1,111 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import images, metrics, search
+from .accounts import invalidate_usernames
+from .models import Category, CustomUser, DeliveryZone, Order, OrderItem, Product
+from .pricing import invalidate_price_schedule
+from .zone_index import invalidate_zones
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_offer_changed(sender, instance, **kwargs):
+    invalidate_price_schedule()
+
+
+@receiver(post_save, sender=CustomUser)
+@receiver(post_delete, sender=CustomUser)
+def user_changed(sender, instance, update_fields=None, **kwargs):
+    # Logins save last_login only; skip those so they don't rebuild the index.
+    if update_fields is not None and "username" not in update_fields:
+        return
+    invalidate_usernames()
+
+
+@receiver(post_save, sender=Product)
+def product_saved_index(sender, instance, raw=False, **kwargs):
+    if search.fts_available() and not raw:
+        search.index_product(instance)
+
+
+@receiver(post_delete, sender=Product)
+def product_deleted_index(sender, instance, **kwargs):
+    if search.fts_available():
+        search.unindex_product(instance.id)
+
+
+@receiver(post_save, sender=Category)
+def category_saved_index(sender, instance, created, raw=False, **kwargs):
+    if search.fts_available() and not created and not raw:
+        search.reindex_category(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Category)
+def image_saved_variants(sender, instance, raw=False, **kwargs):
+    if instance.image and not raw and not images.is_current(instance):
+        images.schedule_variants(instance)
+
+
+@receiver(post_save, sender=DeliveryZone)
+@receiver(post_delete, sender=DeliveryZone)
+def delivery_zone_changed(sender, instance, **kwargs):
+    invalidate_zones()
+
+
+def _touches(update_fields, *fields):
+    return update_fields is None or any(f in update_fields for f in fields)
+
+
+@receiver(pre_save, sender=Order)
+def order_capture_previous(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._rollup_previous = None
+    if instance.pk and not raw and _touches(update_fields, "total_amount", "status"):
+        instance._rollup_previous = (
+            Order.objects.filter(pk=instance.pk).values("total_amount", "status").first()
+        )
+
+
+@receiver(post_save, sender=Order)
+def order_saved_rollup(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_rollup_previous", None)
+    if created:
+        metrics.record_order_change(instance)
+    elif previous is not None:
+        if _touches(update_fields, "total_amount"):
+            metrics.record_order_change(instance, previous_total=previous["total_amount"])
+        if _touches(update_fields, "status"):
+            metrics.record_order_status_change(instance, previous["status"])
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted_rollup(sender, instance, **kwargs):
+    metrics.record_order_change(instance, sign=-1)
+
+
+@receiver(pre_save, sender=OrderItem)
+def order_item_capture(sender, instance, raw=False, update_fields=None, **kwargs):
+    instance._rollup_previous = None
+    if instance.pk and not raw and _touches(update_fields, "price", "quantity"):
+        instance._rollup_previous = (
+            OrderItem.objects.filter(pk=instance.pk).values_list("price", "quantity").first()
+        )
+
+
+@receiver(post_save, sender=OrderItem)
+def order_item_saved_rollup(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, "_rollup_previous", None)
+    if created:
+        metrics.record_item_change(instance)
+    elif previous is not None:
+        metrics.record_item_change(instance, previous=previous)
+
+
+@receiver(post_delete, sender=OrderItem)
+def order_item_deleted_rollup(sender, instance, **kwargs):
+    metrics.record_item_change(instance, sign=-1)
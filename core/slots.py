@@ -0,0 +1,98 @@
+"""
+Delivery slots and ETAs.
+
+The slot labels in core.choices are parsed once into ``SLOTS``. A slot is
+booked for today if it has not started yet, otherwise for tomorrow, and the
+order arrives ``travel_minutes`` after the slot opens. Zone distances from
+the store are stored on DeliveryZone when it is saved, so answering every
+slot for a zone needs no geometry at request time.
+"""
+import re
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from . import geo
+from .choices import SLOT_CHOICES
+
+TIME_PATTERN = re.compile(r"^(\d{1,2})(?::(\d{2}))?([AP]M)$")
+
+# Upper distance bound in km -> minutes from the slot opening to arrival.
+TRAVEL_BANDS = [(3, 20), (6, 30), (8, 40), (12, 50)]
+TRAVEL_BEYOND_MINUTES = 60
+_BAND_LIMITS = [limit for limit, _ in TRAVEL_BANDS]
+
+DEFAULT_SLOT = "10AM - 12PM"
+
+Slot = namedtuple("Slot", "label start end")
+SlotEta = namedtuple("SlotEta", "slot start end eta distance_km travel_minutes on_time day_label")
+
+
+def parse_time(text):
+    match = TIME_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Invalid slot time: {text!r}")
+    hour, minute, meridiem = match.groups()
+    hour = int(hour) % 12 + (12 if meridiem == "PM" else 0)
+    return time(hour, int(minute or 0))
+
+
+def parse_slot(label):
+    """Parse ``"8AM - 10AM"`` (spacing and case are ignored) into a Slot."""
+    start, sep, end = (label or "").replace(" ", "").upper().partition("-")
+    if not sep:
+        raise ValueError(f"Invalid slot: {label!r}")
+    return Slot(label, parse_time(start), parse_time(end))
+
+
+SLOTS = {label: parse_slot(label) for label, _ in SLOT_CHOICES}
+
+
+def get_slot(label):
+    """The Slot for ``label``; raises ValueError if it cannot be parsed."""
+    return SLOTS.get(label) or parse_slot(label)
+
+
+def travel_minutes(distance_km):
+    index = bisect_left(_BAND_LIMITS, distance_km)
+    return TRAVEL_BANDS[index][1] if index < len(TRAVEL_BANDS) else TRAVEL_BEYOND_MINUTES
+
+
+def zone_distance_km(zone):
+    if zone.distance_km is not None:
+        return zone.distance_km
+    if zone.latitude is None or zone.longitude is None:
+        return None
+    return geo.from_store_km(zone.latitude, zone.longitude)
+
+
+def slot_eta(slot, distance_km, now=None):
+    """ETA for delivering ``distance_km`` from the store in ``slot`` (label or Slot)."""
+    if not isinstance(slot, Slot):
+        slot = get_slot(slot)
+    now = timezone.localtime(now)
+    today = now.date()
+    day = today if now.time() < slot.start else today + timedelta(days=1)
+
+    start = timezone.make_aware(datetime.combine(day, slot.start))
+    end = timezone.make_aware(datetime.combine(day, slot.end))
+    minutes = travel_minutes(distance_km or 0)
+    eta = start + timedelta(minutes=minutes)
+    return SlotEta(
+        slot=slot,
+        start=start,
+        end=end,
+        eta=eta,
+        distance_km=distance_km,
+        travel_minutes=minutes,
+        on_time=eta <= end,
+        day_label="Today" if day == today else "Tomorrow",
+    )
+
+
+def day_etas(distance_km, now=None):
+    """ETAs for every slot, in slot order, for one distance from the store."""
+    now = timezone.localtime(now)
+    return [slot_eta(slot, distance_km, now) for slot in SLOTS.values()]
@@ -23,16 +23,17 @@ document.addEventListener("DOMContentLoaded", () => {
 
             updateTotals();
 
-            // -------------------------------------------
-            // UPDATE SERVER FOR LOGGED-IN USERS
-            // -------------------------------------------
-            if (!card.closest(".col-lg-8").classList.contains("guest-cart")) {
-                fetch(`/update-cart-qty/${rowId}/${qty}/`)
-                    .then(response => response.json())
-                    .then(data => {
-                        console.log("Updated cart", data);
-                    });
-            }
+            // Saved carts use the item id, guest carts the line index.
+            const body = new FormData();
+            body.append("item_id", rowId);
+            body.append("quantity", qty);
+            fetch("/cart/update/", {
+                method: "POST",
+                headers: {
+                    "X-CSRFToken": document.querySelector("[name=csrfmiddlewaretoken]").value,
+                },
+                body,
+            });
 
         });
     });
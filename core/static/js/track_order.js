@@ -91,8 +91,30 @@ if (distanceKm < 0.15) {
         .then(data => updateTracking(data));
     }
 
-    fetchLocation();
-    setInterval(fetchLocation, 5000);
+    function startPolling() {
+        fetchLocation();
+        setInterval(fetchLocation, 5000);
+    }
+
+    if (window.EventSource) {
+        const stream = new EventSource(`/track-stream/${orderId}/`);
+        let received = false;
+
+        stream.onmessage = e => {
+            received = true;
+            updateTracking(JSON.parse(e.data));
+        };
+        stream.addEventListener("end", () => stream.close());
+        stream.onerror = () => {
+            // Fall back to polling if the server cannot stream (WSGI answers 204).
+            if (!received) {
+                stream.close();
+                startPolling();
+            }
+        };
+    } else {
+        startPolling();
+    }
 
     document.getElementById("deliveryTime").addEventListener("click", function () {
 
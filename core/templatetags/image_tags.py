@@ -0,0 +1,38 @@
+from django import template
+from django.core.files.storage import default_storage
+from django.utils.html import format_html
+
+from core.images import FALLBACK_WIDTH, is_current
+
+register = template.Library()
+
+DEFAULT_SIZES = "(max-width: 576px) 50vw, 320px"
+
+
+def _srcset(entries):
+    return ", ".join(f"{default_storage.url(name)} {width}w" for width, name in entries)
+
+
+@register.simple_tag
+def responsive_image(obj, css_class="", alt="", sizes=DEFAULT_SIZES):
+    """
+    ``<picture>`` for ``obj.image`` with WebP and JPEG ``srcset`` from its
+    ``image_variants``, or a plain ``<img>`` of the original until those exist.
+    """
+    if not obj.image:
+        return ""
+    if not is_current(obj):
+        return format_html(
+            '<img src="{}" class="{}" alt="{}" loading="lazy">', obj.image.url, css_class, alt
+        )
+
+    variants = obj.image_variants
+    jpeg = variants["jpeg"]
+    fallback = next((name for width, name in jpeg if width >= FALLBACK_WIDTH), jpeg[-1][1])
+    return format_html(
+        '<picture><source type="image/webp" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" class="{}" alt="{}" loading="lazy" decoding="async">'
+        '</picture>',
+        _srcset(variants["webp"]), sizes,
+        default_storage.url(fallback), _srcset(jpeg), sizes, css_class, alt,
+    )
@@ -1,9 +1,11 @@
 from django import template
 
+from core.utils import get_wishlist_ids
+
 register = template.Library()
 
 @register.filter
 def in_user_wishlist(product, user):
     if not user.is_authenticated:
         return False
-    return product.wishlist_users.filter(id=user.id).exists()
+    return product.id in get_wishlist_ids(user)
@@ -0,0 +1,23 @@
+"""
+Test runner that keeps the suite off the shared on-disk cache.
+
+Tests clear the cache and fill it with pages, prices and zone versions a
+running server on the same host would otherwise pick up, so every run gets
+a private in-memory cache instead.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+
+
+class LocalCacheRunner(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES=TEST_CACHES)
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -1,3 +1,1442 @@
-from django.test import TestCase
+import asyncio
+import hashlib
+import hmac
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+from importlib import import_module
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps as django_apps
+from django.core import mail
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import OperationalError, connection, transaction
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+import requests
+
+from . import accounts, database, geo, geocoding, images, outbox, payments, search, slots, units
+from .choices import SLOT_CHOICES
+from .context_processors import guest_wishlist
+from .forms import CustomUserCreationForm
+from .lifecycle import advance_orders
+from .metrics import dashboard_metrics, rebuild_rollups, vendor_sales
+from .models import (
+    CartItem, Category, CategorySalesRollup, CustomUser, DailySalesRollup, DeliveryZone,
+    GeocodeResult, Order, OrderItem, OutboundEmail, Product, ProductSalesRollup,
+    VendorOrderLedger, VendorSalesLedger,
+)
+from .pricing import ensure_prices_fresh, refresh_effective_prices
+from .test_runner import TEST_CACHES
+from .tracking import LocalBroker, TrackingPublisher
+from .utils import calculate_distance_km
+from .zone_index import get_zone_index
+
+
+class ProductGridWishlistQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username="shopper", email="shopper@example.com", password="Secret123"
+        )
+        cls.category = Category.objects.create(name="Fruits", image="categories/f1.avif")
+
+    def setUp(self):
+        refresh_effective_prices()
+
+    def add_products(self, count):
+        products = Product.objects.bulk_create([
+            Product(
+                category=self.category,
+                title=f"Product {Product.objects.count() + i}",
+                base_price="10.00",
+                image="products/orange.jpg",
+            )
+            for i in range(count)
+        ])
+        self.user.wishlist.add(*products[::2])
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_listing_query_count_is_independent_of_product_count(self):
+        self.client.force_login(self.user)
+        urls = [
+            reverse("category_products", args=[self.category.id]),
+            reverse("our_products"),
+            reverse("offers_page"),
+        ]
+
+        self.add_products(2)
+        small = [self.count_queries(url) for url in urls]
+
+        self.add_products(30)
+        large = [self.count_queries(url) for url in urls]
+
+        self.assertEqual(small, large)
+
+    def test_wishlist_is_loaded_once_per_listing(self):
+        self.client.force_login(self.user)
+        self.add_products(10)
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("our_products"))
+
+        wishlist_queries = [
+            q for q in ctx.captured_queries if "core_product_wishlist_users" in q["sql"]
+        ]
+        self.assertEqual(len(wishlist_queries), 1)
+        self.assertContains(response, "❤️", count=5)
+
+
+class EffectivePriceTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Dairy", image="categories/d1.jpg")
+
+    def make_product(self, title, base_price, **offer):
+        return Product.objects.create(
+            category=self.category,
+            title=title,
+            base_price=Decimal(base_price),
+            image="products/cheese.webp",
+            **offer,
+        )
+
+    def test_save_materializes_offer_price(self):
+        now = timezone.now()
+        product = self.make_product(
+            "Paneer", "200.00", is_offer=True, discount_percent=25,
+            offer_start=now - timedelta(hours=1), offer_end=now + timedelta(hours=1),
+        )
+        product.refresh_from_db()
+
+        self.assertTrue(product.offer_active)
+        self.assertEqual(product.effective_price, Decimal("150.00"))
+        self.assertEqual(product.savings_amount, Decimal("50.00"))
+
+    def test_refresh_closes_expired_offer_windows(self):
+        now = timezone.now()
+        product = self.make_product(
+            "Butter", "100.00", is_offer=True, discount_percent=10,
+            offer_start=now - timedelta(hours=2), offer_end=now + timedelta(minutes=5),
+        )
+        refresh_effective_prices(now)
+
+        ensure_prices_fresh(now + timedelta(minutes=10))
+        product.refresh_from_db()
+
+        self.assertFalse(product.offer_active)
+        self.assertEqual(product.effective_price, Decimal("100.00"))
+
+    def test_listing_sorts_by_effective_price(self):
+        now = timezone.now()
+        self.make_product("Cheese", "120.00")
+        self.make_product(
+            "Ghee", "300.00", is_offer=True, discount_percent=70,
+            offer_start=now - timedelta(days=1), offer_end=now + timedelta(days=1),
+        )
+
+        response = self.client.get(
+            reverse("category_products", args=[self.category.id]), {"sort": "price_low"}
+        )
+
+        titles = [p.title for p in response.context["products"]]
+        self.assertEqual(titles, ["Ghee", "Cheese"])
+
+
+class ProductSearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vegetables = Category.objects.create(name="Vegetables", image="categories/Tomato.jpg")
+        cls.snacks = Category.objects.create(name="Snacks", image="categories/snacksimg.png")
+        for title, category, description in [
+            ("Tomato", cls.vegetables, "Farm fresh red tomatoes"),
+            ("Tomato Ketchup", cls.snacks, "Sweet and tangy"),
+            ("Potato Chips", cls.snacks, "Crispy chips made with tomato seasoning"),
+            ("Carrot", cls.vegetables, "Crunchy orange carrots"),
+        ]:
+            Product.objects.create(
+                category=category, title=title, description=description,
+                base_price=Decimal("40.00"), image="products/carrot.webp",
+            )
+
+    def test_ranked_search_prefers_title_matches(self):
+        response = self.client.get(reverse("search_products"), {"q": "tomato"})
+
+        titles = [p.title for p in response.context["products"]]
+        self.assertEqual(titles[-1], "Potato Chips")
+        self.assertCountEqual(titles, ["Tomato", "Tomato Ketchup", "Potato Chips"])
+
+    def test_prefix_and_category_matching(self):
+        response = self.client.get(reverse("search_products"), {"q": "veg carr"})
+
+        self.assertEqual([p.title for p in response.context["products"]], ["Carrot"])
+
+    def test_substring_queries_fall_back_to_contains(self):
+        response = self.client.get(reverse("search_products"), {"q": "mato"})
+        self.assertCountEqual(
+            [p.title for p in response.context["products"]],
+            ["Tomato", "Tomato Ketchup", "Potato Chips"],
+        )
+
+        response = self.client.get(reverse("our_products"), {"q": "arro"})
+        self.assertEqual([p.title for p in response.context["products"]], ["Carrot"])
+
+    def test_index_follows_product_and_category_changes(self):
+        carrot = Product.objects.get(title="Carrot")
+        carrot.title = "Baby Carrot"
+        carrot.save()
+        self.vegetables.name = "Greens"
+        self.vegetables.save()
+        Product.objects.get(title="Tomato Ketchup").delete()
+
+        self.assertEqual(search.search_product_ids("baby greens"), [carrot.id])
+        self.assertEqual(search.search_product_ids("ketchup"), [])
+
+
+class ZoneIndexTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.zones = [
+            DeliveryZone.objects.create(
+                area_name=f"Area {i}", pincode=f"6430{i:02d}", city="Ooty",
+                latitude=11.30 + (i % 7) * 0.031, longitude=76.60 + (i // 7) * 0.027,
+            )
+            for i in range(40)
+        ]
+
+    def brute_force(self, lat, lon):
+        return sorted(
+            self.zones,
+            key=lambda z: calculate_distance_km(lat, lon, z.latitude, z.longitude),
+        )
+
+    def test_nearest_matches_linear_scan(self):
+        index = get_zone_index()
+        for lat, lon in [(11.4064, 76.6932), (11.31, 76.61), (11.5, 76.8), (11.2, 76.5)]:
+            expected = [z.id for z in self.brute_force(lat, lon)[:3]]
+            self.assertEqual([z.id for z, _ in index.nearest(lat, lon, k=3)], expected)
+
+    def test_within_radius_and_batch(self):
+        index = get_zone_index()
+        found = index.within(11.4064, 76.6932, 5)
+        expected = [
+            z.id for z in self.brute_force(11.4064, 76.6932)
+            if calculate_distance_km(11.4064, 76.6932, z.latitude, z.longitude) <= 5
+        ]
+        self.assertEqual([z.id for z, _ in found], expected)
+        self.assertTrue(all(d <= 5 for _, d in found))
+
+        batch = index.nearest_many([(11.31, 76.61), (11.5, 76.8)])
+        self.assertEqual([r[0][0].id for r in batch], [
+            self.brute_force(11.31, 76.61)[0].id, self.brute_force(11.5, 76.8)[0].id,
+        ])
+
+    def test_index_rebuilds_when_zones_change(self):
+        before = get_zone_index()
+        far = DeliveryZone.objects.create(
+            area_name="Far", pincode="600001", city="Chennai", latitude=13.08, longitude=80.27,
+        )
+
+        after = get_zone_index()
+        self.assertIsNot(before, after)
+        self.assertEqual(after.nearest(13.0, 80.2)[0][0].id, far.id)
+
+        response = self.client.post(
+            reverse("get_nearest_zone"), {"latitude": 13.0, "longitude": 80.2}
+        )
+        self.assertEqual(response.json()["zone_id"], far.id)
+
+
+class ZoneCatalogueTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        DeliveryZone.objects.create(area_name="Lovedale", pincode="643003", city="Ooty")
+        DeliveryZone.objects.create(area_name="Fernhill", pincode="643004", city="Ooty")
+
+    def test_zone_list_supports_conditional_requests(self):
+        url = reverse("home_get_zones")
+        first = self.client.get(url)
+        self.assertEqual(
+            [z["area_name"] for z in first.json()["zones"]], ["Fernhill", "Lovedale"]
+        )
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(cached.status_code, 304)
+
+        DeliveryZone.objects.create(area_name="Coonoor", pincode="643101", city="Coonoor")
+        changed = self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed["ETag"], first["ETag"])
+        self.assertEqual(len(changed.json()["zones"]), 3)
+
+    def test_check_delivery_uses_catalogue(self):
+        url = reverse("home_check_delivery")
+        self.client.get(url)
+
+        with self.assertNumQueries(0):
+            data = self.client.get(url, {"query": "fern"}).json()
+
+        self.assertTrue(data["success"])
+        self.assertEqual(len(data["available_zones"]), 2)
+        self.assertFalse(self.client.get(url, {"query": "999999"}).json()["success"])
+
+
+class OutboxTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username="buyer", email="buyer@example.com", password="Secret123"
+        )
+        cls.order = Order.objects.create(
+            user=cls.user, full_name="Buyer", email="buyer@example.com", phone="9876543210",
+            street_address="1 Main Road", city="Ooty", delivery_slot="8AM - 10AM",
+            payment_method="RAZORPAY", status="out_for_delivery",
+        )
+
+    def test_status_emails_are_queued_once_per_status(self):
+        self.order.send_status_notification()
+        self.order.send_status_notification()
+
+        self.assertEqual(len(mail.outbox), 0)
+        self.assertEqual(OutboundEmail.objects.filter(status="pending").count(), 1)
+
+        self.assertEqual(outbox.send_pending(), (1, 0))
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["buyer@example.com"])
+        self.assertEqual(OutboundEmail.objects.get().status, "sent")
+
+    def test_failed_sends_back_off_then_give_up(self):
+        outbox.enqueue_email("buyer@example.com", "Hello", "Body")
+        now = timezone.now()
+
+        with mock.patch("django.core.mail.backends.locmem.EmailBackend.send_messages",
+                        side_effect=OSError("smtp down")):
+            self.assertEqual(outbox.send_pending(now=now), (0, 1))
+            email = OutboundEmail.objects.get()
+            self.assertEqual(email.attempts, 1)
+            self.assertGreater(email.next_attempt_at, now)
+            self.assertEqual(outbox.send_pending(now=now), (0, 0))
+
+            for day in range(1, outbox.MAX_ATTEMPTS):
+                outbox.send_pending(now=now + timedelta(days=day))
+
+        email.refresh_from_db()
+        self.assertEqual(email.status, "failed")
+        self.assertEqual(email.attempts, outbox.MAX_ATTEMPTS)
+
+
+class OrderLifecycleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username="tracker", email="tracker@example.com", password="Secret123"
+        )
+
+    def make_order(self, status, **fields):
+        return Order.objects.create(
+            user=self.user, full_name="Tracker", email="tracker@example.com",
+            phone="9876543210", street_address="2 Hill Road", city="Ooty",
+            delivery_slot="8AM - 10AM", payment_method="RAZORPAY", status=status,
+            latitude=11.4100, longitude=76.7000, **fields,
+        )
+
+    def test_tick_advances_each_order_one_step(self):
+        pending = self.make_order("pending")
+        confirmed = self.make_order("confirmed")
+        processing = self.make_order("processing")
+        moving = self.make_order(
+            "out_for_delivery", current_latitude=11.4099, current_longitude=76.6999,
+        )
+        delivered = self.make_order("delivered")
+
+        # Batch read, empty follow-up read, one bulk update and one outbox
+        # insert inside a transaction (a savepoint and its release here).
+        with self.assertNumQueries(6):
+            transitions = advance_orders()
+
+        self.assertEqual(transitions, {"confirmed": 1, "processing": 1, "out_for_delivery": 1, "delivered": 1})
+        statuses = dict(Order.objects.values_list("id", "status"))
+        self.assertEqual(statuses[pending.id], "confirmed")
+        self.assertEqual(statuses[confirmed.id], "processing")
+        self.assertEqual(statuses[processing.id], "out_for_delivery")
+        self.assertEqual(statuses[moving.id], "delivered")
+        self.assertEqual(statuses[delivered.id], "delivered")
+
+        moving.refresh_from_db()
+        self.assertIsNotNone(moving.delivered_at)
+        self.assertEqual(
+            set(OutboundEmail.objects.values_list("dedupe_key", flat=True)),
+            {f"order:{confirmed.id}:processing", f"order:{processing.id}:out_for_delivery",
+             f"order:{moving.id}:delivered"},
+        )
+
+    def test_orders_and_emails_are_saved_together(self):
+        confirmed = self.make_order("confirmed")
+
+        with mock.patch("core.lifecycle.enqueue_many", side_effect=OperationalError("disk I/O error")):
+            with self.assertRaises(OperationalError):
+                advance_orders()
+
+        confirmed.refresh_from_db()
+        self.assertEqual((confirmed.status, confirmed.last_notified_status), ("confirmed", None))
+
+    def test_tracking_page_is_read_only(self):
+        order = self.make_order("out_for_delivery", current_latitude=11.40, current_longitude=76.69)
+        self.client.force_login(self.user)
+
+        response = self.client.get(reverse("track_order"), {"order_id": order.id})
+
+        self.assertEqual(response.status_code, 200)
+        order.refresh_from_db()
+        self.assertEqual((order.status, order.current_latitude), ("out_for_delivery", 11.40))
+
+
+class DashboardMetricsTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = CustomUser.objects.create_user(
+            username="boss", email="boss@example.com", password="Secret123", role="admin"
+        )
+        cls.category = Category.objects.create(name="Greens", image="categories/g.avif")
+        cls.product = Product.objects.create(
+            category=cls.category, title="Spinach", base_price="20.00", image="products/s.jpg"
+        )
+
+    def add_orders(self, count, total="50.00", quantity=2):
+        for _ in range(count):
+            order = Order.objects.create(
+                user=self.admin, full_name="Boss", email="boss@example.com",
+                phone="9876543210", street_address="1 Lake Road", city="Ooty",
+                delivery_slot="8AM - 10AM", payment_method="COD", total_amount=total,
+            )
+            OrderItem.objects.create(order=order, product=self.product, quantity=quantity, price="20.00")
+
+    def rollup_state(self):
+        return (
+            list(DailySalesRollup.objects.values_list("day", "order_count", "total_sales")),
+            list(CategorySalesRollup.objects.values_list("category_id", "total_sales")),
+            list(ProductSalesRollup.objects.values_list("product_id", "order_count", "quantity")),
+        )
+
+    def test_rollups_track_order_writes(self):
+        self.add_orders(3)
+        order = Order.objects.first()
+        order.total_amount = Decimal("80.00")
+        order.save()
+        order.items.first().delete()
+        Order.objects.last().delete()
+
+        metrics = dashboard_metrics()
+        self.assertEqual(metrics["total_orders"], 2)
+        self.assertEqual(metrics["total_sales"], Decimal("130.00"))
+        self.assertEqual(metrics["delivery_status_counts"]["pending"], 2)
+        self.assertEqual(metrics["daily"], [(timezone.localdate(), Decimal("130.00"))])
+        self.assertEqual(metrics["categories"], [("Greens", Decimal("20.00"))])
+        self.assertEqual(metrics["top_items"], [("Spinach", 2)])
+
+        incremental = self.rollup_state()
+        rebuild_rollups()
+        self.assertEqual(self.rollup_state(), incremental)
+
+    def test_dashboard_query_count_is_independent_of_order_count(self):
+        self.client.force_login(self.admin)
+        url = reverse("admin_dashboard")
+
+        self.add_orders(2)
+        self.client.get(url)  # warm the price schedule cache
+        with CaptureQueriesContext(connection) as small:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_orders(20)
+        with CaptureQueriesContext(connection) as large:
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+
+
+class VendorLedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.vendor = CustomUser.objects.create_user(
+            username="farmer", email="farmer@example.com", password="Secret123", role="vendor"
+        )
+        category = Category.objects.create(name="Roots", image="categories/r.avif")
+        cls.carrot, cls.beet = [
+            Product.objects.create(
+                category=category, vendor=cls.vendor, title=title,
+                base_price="10.00", image="products/r.jpg",
+            )
+            for title in ("Carrot", "Beet")
+        ]
+
+    def place_order(self, *lines, user=None):
+        order = Order.objects.create(
+            user=user or self.vendor, full_name="Farmer", email="farmer@example.com",
+            phone="9876543210", street_address="3 Farm Road", city="Ooty",
+            delivery_slot="8AM - 10AM", payment_method="COD",
+        )
+        for product, quantity in lines:
+            OrderItem.objects.create(order=order, product=product, quantity=quantity, price="10.00")
+        return order
+
+    def ledger_state(self):
+        return (
+            sorted(VendorSalesLedger.objects.filter(quantity__gt=0)
+                   .values_list("product_id", "day", "quantity", "revenue")),
+            sorted(VendorOrderLedger.objects.filter(order_count__gt=0).values_list("day", "order_count")),
+        )
+
+    def test_ledger_follows_items_and_status(self):
+        first = self.place_order((self.carrot, 2), (self.beet, 1))
+        second = self.place_order((self.carrot, 3))
+        third = self.place_order((self.beet, 4))
+
+        sales = vendor_sales(self.vendor)
+        self.assertEqual((sales["total_revenue"], sales["total_orders"]), (Decimal("100.00"), 3))
+
+        second.status = "cancelled"
+        second.save()
+        first.items.get(product=self.beet).delete()
+        third.delete()
+
+        sales = vendor_sales(self.vendor)
+        self.assertEqual((sales["total_revenue"], sales["total_orders"]), (Decimal("20.00"), 1))
+        self.assertEqual(
+            sales["sales_data"],
+            [{"product__title": "Carrot", "total_sales": Decimal("20.00"), "total_quantity": 2}],
+        )
+
+        second.status = "pending"
+        second.save()
+        incremental = self.ledger_state()
+        rebuild_rollups()
+        self.assertEqual(self.ledger_state(), incremental)
+
+    def test_cascading_deletes_leave_the_ledger_consistent(self):
+        buyer = CustomUser.objects.create_user(username="buyer", password="Secret123")
+        self.place_order((self.carrot, 1), (self.carrot, 2), (self.beet, 1), user=buyer)
+        self.place_order((self.carrot, 1), (self.carrot, 1))
+        self.place_order((self.carrot, 2), (self.beet, 3))
+
+        buyer.delete()
+        self.carrot.delete()
+
+        sales = vendor_sales(self.vendor)
+        self.assertEqual((sales["total_revenue"], sales["total_orders"]), (Decimal("30.00"), 1))
+        incremental = self.ledger_state()
+        rebuild_rollups()
+        self.assertEqual(self.ledger_state(), incremental)
+
+    def test_rolled_back_delete_leaves_no_trace(self):
+        buyer = CustomUser.objects.create_user(username="buyer", password="Secret123")
+        order = self.place_order((self.carrot, 1), (self.beet, 2), user=buyer)
+
+        with transaction.atomic():
+            buyer.delete()
+            transaction.set_rollback(True)
+        order.items.get(product=self.beet).delete()
+
+        sales = vendor_sales(self.vendor)
+        self.assertEqual((sales["total_revenue"], sales["total_orders"]), (Decimal("10.00"), 1))
+        incremental = self.ledger_state()
+        rebuild_rollups()
+        self.assertEqual(self.ledger_state(), incremental)
+
+    def test_date_range(self):
+        self.place_order((self.carrot, 1))
+        today = timezone.localdate()
+
+        self.assertEqual(vendor_sales(self.vendor, start=today, end=today)["total_orders"], 1)
+        self.assertEqual(vendor_sales(self.vendor, end=today - timedelta(days=1))["total_orders"], 0)
+
+        self.client.force_login(self.vendor)
+        response = self.client.get(reverse("vendor_dashboard"), {"start": today.isoformat(), "end": "2024-13-40"})
+        self.assertEqual(response.context["total_orders"], 1)
+
+
+class OrderApiTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        user = CustomUser.objects.create_user(
+            username="api", email="api@example.com", password="Secret123"
+        )
+        zone = DeliveryZone.objects.create(
+            area_name="Lovedale", pincode="643003", city="Ooty", latitude=11.38, longitude=76.72,
+        )
+        product = Product.objects.create(
+            category=Category.objects.create(name="Dairy", image="categories/d.avif"),
+            title="Milk", base_price="30.00", image="products/m.jpg",
+        )
+        # bulk_create skips the rollup signals, which these tests do not need.
+        orders = Order.objects.bulk_create([
+            Order(
+                user=user, delivery_zone=zone, full_name="Api", email="api@example.com",
+                phone="9876543210", street_address="4 Dam Road", city="Ooty",
+                delivery_slot="8AM - 10AM", payment_method="COD",
+            )
+            for _ in range(1000)
+        ])
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, product=product, quantity=1, price="30.00")
+            for order in orders for _ in range(2)
+        ])
+        cls.order = orders[0]
+
+    def test_list_is_paginated_with_constant_queries(self):
+        url = "/api/orders/"
+        self.client.get(url)  # warm the price schedule cache
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, {"page_size": 200})
+
+        data = response.json()
+        self.assertEqual(len(data["results"]), 200)
+        self.assertNotIn("items", data["results"][0])
+        self.assertEqual(data["results"][0]["delivery_zone_name"], "Lovedale")
+
+        seen = set()
+        next_url = f"{url}?page_size=200"
+        while next_url:
+            data = self.client.get(next_url).json()
+            seen.update(row["id"] for row in data["results"])
+            next_url = data["next"]
+        self.assertEqual(len(seen), 1000)
+
+    def test_detail_prefetches_items(self):
+        self.client.get(f"/api/orders/{self.order.id}/")  # warm the price schedule cache
+        with self.assertNumQueries(2):
+            response = self.client.get(f"/api/orders/{self.order.id}/")
+
+        self.assertEqual(
+            [item["product_name"] for item in response.json()["items"]], ["Milk", "Milk"]
+        )
+
+
+class OrderExportTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.staff = CustomUser.objects.create_user(
+            username="ops", email="ops@example.com", password="Secret123", is_staff=True
+        )
+        product = Product.objects.create(
+            category=Category.objects.create(name="Bakery", image="categories/b.avif"),
+            title="Bread", base_price="40.00", image="products/b.jpg",
+        )
+        for status, city in [("pending", "Ooty"), ("delivered", "Ooty"), ("delivered", "Coonoor")]:
+            order = Order.objects.create(
+                user=cls.staff, full_name="Ops", email="ops@example.com", phone="9876543210",
+                street_address="5 Mall Road", city=city, delivery_slot="8AM - 10AM",
+                payment_method="COD", status=status,
+            )
+            OrderItem.objects.create(order=order, product=product, quantity=2, price="40.00")
+            OrderItem.objects.create(order=order, product=product, quantity=1, price="40.00")
+
+    def export(self, **params):
+        self.client.force_login(self.staff)
+        response = self.client.get("/api/orders/export/", params)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode()
+
+    def test_csv_has_one_row_per_item_and_honours_filters(self):
+        lines = self.export(status="delivered", city="Ooty").splitlines()
+
+        self.assertTrue(lines[0].startswith("id,created_at,status"))
+        self.assertEqual(len(lines), 3)
+        self.assertTrue(all(",Bread," in line for line in lines[1:]))
+
+    def test_ndjson_nests_items(self):
+        today = timezone.localdate().isoformat()
+        rows = [json.loads(line) for line in self.export(fmt="ndjson", created_after=today).splitlines()]
+
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([item["quantity"] for item in rows[0]["items"]], [2, 1])
+
+    def test_export_requires_staff(self):
+        self.assertEqual(self.client.get("/api/orders/export/").status_code, 403)
+
+
+class GuestCartTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = Category.objects.create(name="Veg", image="categories/v.avif")
+        cls.products = [
+            Product.objects.create(
+                category=cls.category, title=f"Veg {i}", base_price="40.00",
+                image="products/v.jpg", unit="kg", weight_options="500G, 1KG",
+            )
+            for i in range(4)
+        ]
+
+    def test_lines_are_merged_and_stored_compactly(self):
+        tomato = self.products[0]
+        self.client.post(reverse("add_to_cart", args=[tomato.id]), {"weight": "500g", "quantity": 1})
+        self.client.post(
+            reverse("product_detail", args=[self.category.id, tomato.id]),
+            {"weight": "500G ", "quantity": 2},
+        )
+
+        self.assertEqual(self.client.session["cart"], [[tomato.id, "500G", 3]])
+        response = self.client.get(reverse("cart"))
+        self.assertEqual(response.context["subtotal"], Decimal("60.00"))
+
+    def test_render_loads_products_once_and_skips_session_write(self):
+        for product in self.products:
+            self.client.post(reverse("add_to_cart", args=[product.id]), {"weight": "1KG"})
+        self.client.get(reverse("cart"))
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("cart"))
+
+        self.assertEqual(len(response.context["cart_items"]), 4)
+        product_reads = [q for q in ctx.captured_queries if 'FROM "core_product"' in q["sql"]]
+        session_writes = [q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")]
+        self.assertEqual((len(product_reads), session_writes), (1, []))
+
+    def test_legacy_session_lines_are_converted(self):
+        session = self.client.session
+        session["cart"] = [
+            {"product_id": self.products[1].id, "weight": "1kg", "quantity": 1, "unit_price": "40.0"},
+            {"product_id": self.products[1].id, "weight": "1KG", "quantity": 2, "final_price": 40.0},
+        ]
+        session.save()
+
+        self.client.get(reverse("cart"))
+
+        self.assertEqual(self.client.session["cart"], [[self.products[1].id, "1KG", 3]])
+
+    def test_guest_quantity_updates_are_saved_only_when_changed(self):
+        veg = self.products[2]
+        self.client.post(reverse("add_to_cart", args=[veg.id]), {"weight": "500G"})
+
+        response = self.client.post(reverse("update_cart_item"), {"item_id": 0, "quantity": 4})
+        self.assertEqual(response.json(), {"success": True, "total_price": "80.00"})
+        self.assertEqual(self.client.session["cart"], [[veg.id, "500G", 4]])
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(reverse("update_cart_item"), {"item_id": 0, "quantity": 4})
+        self.assertFalse([q for q in ctx.captured_queries if q["sql"].startswith("UPDATE")])
+
+        response = self.client.post(reverse("update_cart_item"), {"item_id": 5, "quantity": 1})
+        self.assertFalse(response.json()["success"])
+
+
+class CartPricingTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username="cook", email="cook@example.com", password="Secret123"
+        )
+        cls.category = Category.objects.create(name="Pantry", image="categories/p.avif")
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def add_items(self, count, weight="500G"):
+        for i in range(count):
+            product = Product.objects.create(
+                category=self.category, title=f"Rice {i}", base_price="80.00",
+                image="products/r.jpg", unit="kg", weight_options="500G, 1KG",
+            )
+            CartItem.objects.create(user=self.user, product=product, weight=weight, quantity=2)
+
+    def cart_queries(self):
+        self.client.get(reverse("cart"))  # warm the price schedule cache
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("cart"))
+        return len(ctx.captured_queries), response
+
+    def test_cart_query_count_is_independent_of_line_count(self):
+        self.add_items(1)
+        small, _ = self.cart_queries()
+        self.add_items(5)
+        large, response = self.cart_queries()
+
+        self.assertEqual(small, large)
+        self.assertEqual(response.context["subtotal"], Decimal("480.00"))
+
+    def test_payment_page_uses_weight_and_offer_prices(self):
+        self.add_items(1, weight="1KG")
+        Product.objects.update(is_offer=True, discount_percent=25)
+        refresh_effective_prices()
+
+        response = self.client.get(reverse("payment_page"))
+
+        self.assertEqual(response.context["subtotal"], Decimal("120.00"))
+        self.assertEqual(response.context["total"], Decimal("126.00"))
+
+
+class UnitConversionTests(SimpleTestCase):
+
+    def test_multipliers(self):
+        cases = [
+            ("kg", "500G", "0.5"), ("kg", "1.5 kg", "1.5"), ("g", "250G", "0.25"),
+            ("litre", "750ML", "0.75"), ("ml", "2L", "2"), ("kg", "100ML", "0.1"),
+            ("piece", "6PCS", "6"), ("dozen", "6PCS", "0.5"), ("pack", "2", "2"),
+            ("piece", "1KG", "1"), ("kg", "a lot", "1"), ("kg", "", "1"),
+        ]
+        self.assertEqual(
+            units.multipliers((unit, option) for unit, option, _ in cases),
+            [Decimal(expected) for _, _, expected in cases],
+        )
+
+    def test_every_product_unit_is_known(self):
+        self.assertEqual({unit for unit, _ in Product.UNIT_CHOICES}, set(units.UNITS))
+
+
+class CheckoutTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(
+            username="payer", email="payer@example.com", password="Secret123"
+        )
+        category = Category.objects.create(name="Oils", image="categories/o.avif")
+        for i in range(3):
+            product = Product.objects.create(
+                category=category, title=f"Oil {i}", base_price="100.00",
+                image="products/o.jpg", unit="litre", weight_options="500ML, 1L",
+            )
+            CartItem.objects.create(user=cls.user, product=product, weight="500ML", quantity=2)
+
+    def checkout(self, key):
+        return self.client.post(
+            reverse("payment_page"),
+            {
+                "full_name": "Pay Er", "email": "payer@example.com", "phone": "9876543210",
+                "street_address": "6 Lake View", "city": "Ooty", "delivery_slot": "8AM - 10AM",
+                "latitude": 11.41, "longitude": 76.70, "idempotency_key": key,
+            },
+            headers={"X-Requested-With": "XMLHttpRequest"},
+        )
+
+    @mock.patch("core.views.get_gateway")
+    def test_double_submit_returns_the_same_order(self, get_gateway):
+        get_gateway.return_value.create_order.return_value = "order_rzp_1"
+        self.client.force_login(self.user)
+
+        first = self.checkout("key-1").json()
+        second = self.checkout("key-1").json()
+
+        self.assertEqual(first, second)
+        get_gateway.return_value.create_order.assert_called_once_with(31500, receipt=mock.ANY)
+        order = Order.objects.get()
+        self.assertEqual(order.items.count(), 3)
+        self.assertEqual((order.subtotal, order.total_amount), (Decimal("300.00"), Decimal("315.00")))
+        self.assertEqual(first["amount"], 31500)
+        self.assertEqual(
+            list(ProductSalesRollup.objects.values_list("quantity", flat=True)), [2, 2, 2]
+        )
+
+    @mock.patch("core.views.get_gateway")
+    def test_failed_insert_leaves_nothing_behind(self, get_gateway):
+        self.client.force_login(self.user)
+
+        with mock.patch("core.checkout.OrderItem.objects.bulk_create", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.checkout("key-2")
+
+        self.assertFalse(Order.objects.exists())
+        self.assertFalse(DailySalesRollup.objects.exists())
+
+    @mock.patch("core.views.get_gateway")
+    def test_unavailable_gateway_degrades_to_retryable_error(self, get_gateway):
+        create_order = get_gateway.return_value.create_order
+        create_order.side_effect = payments.PaymentGatewayUnavailable("timed out")
+        self.client.force_login(self.user)
+
+        response = self.checkout("key-3")
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(Order.objects.get().razorpay_order_id, None)
+
+        create_order.side_effect = None
+        create_order.return_value = "order_rzp_3"
+        self.assertEqual(self.checkout("key-3").json()["razorpay_order_id"], "order_rzp_3")
+        self.assertEqual(Order.objects.count(), 1)
+
+
+@override_settings(RAZORPAY_KEY_ID="rzp_test", RAZORPAY_KEY_SECRET="secret")
+class PaymentGatewayTests(SimpleTestCase):
+
+    def test_connect_timeouts_are_retried_then_open_the_circuit(self):
+        gateway = payments.RazorpayGateway()
+        create = mock.patch.object(
+            gateway.client.order, "create", side_effect=requests.ConnectTimeout
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+        mock.patch("core.payments.time.sleep").start()
+
+        for _ in range(payments.FAILURE_THRESHOLD):
+            with self.assertRaises(payments.PaymentGatewayUnavailable):
+                gateway.create_order(100)
+        self.assertEqual(create.call_count, payments.FAILURE_THRESHOLD * payments.MAX_ATTEMPTS)
+
+        with self.assertRaises(payments.PaymentGatewayUnavailable):
+            gateway.create_order(100)
+        self.assertEqual(create.call_count, payments.FAILURE_THRESHOLD * payments.MAX_ATTEMPTS)
+        self.assertEqual(gateway.stats.snapshot()["create_order"]["errors"], payments.FAILURE_THRESHOLD + 1)
+
+    def test_errors_after_sending_are_not_retried(self):
+        failures = [
+            requests.ReadTimeout,
+            requests.ConnectionError("Connection aborted"),
+            requests.JSONDecodeError("Expecting value", "<html>", 0),
+        ]
+        for failure in failures:
+            gateway = payments.RazorpayGateway()
+            with mock.patch.object(gateway.client.order, "create", side_effect=failure) as create:
+                with self.assertRaises(payments.PaymentGatewayUnavailable):
+                    gateway.create_order(100)
+            self.assertEqual(create.call_count, 1)
+
+    def test_non_ascii_signatures_are_rejected(self):
+        self.assertFalse(payments.FakeGateway().verify_signature("order_1", "pay_1", "sïg"))
+
+    def test_fake_gateway_creates_orders_and_checks_signatures(self):
+        gateway = payments.FakeGateway()
+        order_id = gateway.create_order(100)
+        signature = hmac.new(b"secret", f"{order_id}|pay_1".encode(), hashlib.sha256).hexdigest()
+
+        self.assertTrue(gateway.verify_signature(order_id, "pay_1", signature))
+        self.assertFalse(gateway.verify_signature(order_id, "pay_2", signature))
+        self.assertEqual(gateway.stats.snapshot()["create_order"]["count"], 1)
+
+
+class StubNominatim:
+    """Stands in for requests.Session; counts calls and can hold them open."""
+
+    def __init__(self, gate=None):
+        self.headers = {}
+        self.calls = []
+        self.gate = gate
+
+    def get(self, url, params=None, timeout=None):
+        self.calls.append(params)
+        if self.gate is not None:
+            self.gate.wait(5)
+        response = mock.Mock()
+        response.json.return_value = {"address": {"road": "Lake Road", "city": "Ooty"}}
+        return response
+
+
+class GeocodingTests(TestCase):
+
+    def test_nearby_points_share_one_upstream_lookup(self):
+        stub = StubNominatim()
+        geocoder = geocoding.Geocoder(session=stub)
+
+        first = geocoder.reverse("11.412341", "76.695001")
+        again = geocoder.reverse(11.4123412, 76.6950013)
+
+        self.assertEqual(first, again)
+        self.assertEqual(len(stub.calls), 1)
+        self.assertEqual(stub.calls[0]["lat"], "11.41234")
+
+        # A fresh process reads the stored result instead of calling out.
+        fresh = StubNominatim()
+        self.assertEqual(geocoding.Geocoder(session=fresh).reverse("11.41234", "76.69500"), first)
+        self.assertEqual(fresh.calls, [])
+
+    def test_stale_results_are_fetched_again(self):
+        stub = StubNominatim()
+        geocoding.Geocoder(session=stub).reverse("11.4", "76.7")
+        GeocodeResult.objects.update(fetched_at=timezone.now() - geocoding.CACHE_TTL - timedelta(days=1))
+
+        geocoding.Geocoder(session=stub).reverse("11.4", "76.7")
+
+        self.assertEqual(len(stub.calls), 2)
+        self.assertEqual(GeocodeResult.objects.count(), 1)
+
+    def test_view_rejects_bad_coordinates_and_degrades_when_upstream_fails(self):
+        self.assertEqual(self.client.get(reverse("reverse_geocode"), {"lat": "x"}).status_code, 400)
+        for lat in ("nan", "inf"):
+            response = self.client.get(reverse("reverse_geocode"), {"lat": lat, "lon": "1"})
+            self.assertEqual(response.status_code, 400)
+
+        stub = StubNominatim()
+        stub.get = mock.Mock(side_effect=requests.ConnectTimeout)
+        with mock.patch("core.views.get_geocoder", return_value=geocoding.Geocoder(session=stub)):
+            response = self.client.get(reverse("reverse_geocode"), {"lat": "11.4", "lon": "76.7"})
+        self.assertEqual(response.status_code, 503)
+
+
+class GeocoderConcurrencyTests(SimpleTestCase):
+
+    def test_concurrent_identical_lookups_are_coalesced(self):
+        gate = threading.Event()
+        stub = StubNominatim(gate)
+        geocoder = geocoding.Geocoder(session=stub)
+        results = []
+
+        with mock.patch.object(geocoder, "_stored", return_value=None), \
+                mock.patch.object(geocoder, "_store"):
+            threads = [
+                threading.Thread(target=lambda: results.append(geocoder.reverse("11.4", "76.7")))
+                for _ in range(5)
+            ]
+            for thread in threads:
+                thread.start()
+            while not stub.calls:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            gate.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(stub.calls), 1)
+        self.assertEqual(len(results), 5)
+
+    def test_waiting_lookups_see_the_leaders_failure(self):
+        gate = threading.Event()
+        geocoder = geocoding.Geocoder(session=StubNominatim(gate))
+        outcomes = []
+
+        def lookup():
+            try:
+                outcomes.append(geocoder.reverse("11.4", "76.7"))
+            except RuntimeError as e:
+                outcomes.append(e)
+
+        with mock.patch.object(geocoder, "_stored", return_value=None), \
+                mock.patch.object(geocoder, "_store", side_effect=RuntimeError("db down")):
+            threads = [threading.Thread(target=lookup) for _ in range(3)]
+            for thread in threads:
+                thread.start()
+            while not geocoder.session.calls:
+                time.sleep(0.01)
+            time.sleep(0.05)
+            gate.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(outcomes), 3)
+        self.assertTrue(all(isinstance(o, RuntimeError) for o in outcomes))
+
+    def test_token_bucket_allows_one_request_per_second(self):
+        bucket = geocoding.TokenBucket(rate=1)
+        self.assertTrue(bucket.acquire(timeout=0))
+        self.assertFalse(bucket.acquire(timeout=0))
+
+
+class GeoDistanceTests(SimpleTestCase):
+
+    POINTS = [(11.4064, 76.6932), (11.31, 76.61), (12.9716, 77.5946), (-33.86, 151.21)]
+
+    def test_known_distance(self):
+        # Ooty to Bengaluru, about 200 km as the crow flies.
+        self.assertAlmostEqual(geo.haversine_km(11.4064, 76.6932, 12.9716, 77.5946), 199.7, delta=0.1)
+        self.assertEqual(geo.haversine_km(11.4, 76.7, 11.4, 76.7), 0)
+
+    def test_batched_matches_scalar_with_and_without_numpy(self):
+        expected = [geo.haversine_km(11.4064, 76.6932, lat, lon) for lat, lon in self.POINTS]
+        for np in (geo.np, None):
+            with mock.patch.object(geo, "np", np):
+                batched = geo.distances_km(11.4064, 76.6932, self.POINTS)
+            for got, want in zip(batched, expected):
+                self.assertAlmostEqual(got, want, places=6)
+        self.assertEqual(geo.distances_km(11.4, 76.7, []), [])
+
+    def test_calculate_distance_km_keeps_its_contract(self):
+        self.assertEqual(calculate_distance_km(11.4064, 76.6932, 0.0, 76.6), 0.0)
+        self.assertEqual(
+            calculate_distance_km(11.4064, 76.6932, 11.31, 76.61),
+            round(geo.haversine_km(11.4064, 76.6932, 11.31, 76.61), 2),
+        )
+
+
+class DeliverySlotTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.zone = DeliveryZone.objects.create(
+            area_name="Lovedale", pincode="643003", city="Ooty", latitude=11.37, longitude=76.70
+        )
+
+    def at(self, hour, minute=0):
+        return timezone.make_aware(datetime(2026, 3, 10, hour, minute))
+
+    def test_distance_backfill_matches_save(self):
+        far = DeliveryZone.objects.create(
+            area_name="Coonoor", pincode="643101", city="Coonoor", latitude=11.35, longitude=76.79
+        )
+        saved = dict(DeliveryZone.objects.values_list("id", "distance_km"))
+        DeliveryZone.objects.update(distance_km=None)
+
+        migration = import_module("core.migrations.0012_delivery_zone_distance")
+        migration.backfill_distances(django_apps, None)
+
+        self.assertEqual(dict(DeliveryZone.objects.values_list("id", "distance_km")), saved)
+        self.assertGreater(saved[far.id], 0)
+
+    def test_every_slot_choice_is_parsed_once(self):
+        self.assertEqual(len(slots.SLOTS), len(SLOT_CHOICES))
+        slot = slots.get_slot("12PM - 2PM")
+        self.assertEqual((slot.start.hour, slot.end.hour), (12, 14))
+        self.assertEqual(slots.parse_slot("8:30am-10am").start.minute, 30)
+        with self.assertRaises(ValueError):
+            slots.get_slot("soon")
+
+    def test_eta_rolls_to_tomorrow_once_the_slot_has_started(self):
+        today = slots.slot_eta("10AM - 12PM", 5, now=self.at(9))
+        self.assertEqual((today.day_label, today.travel_minutes), ("Today", 30))
+        self.assertEqual(timezone.localtime(today.eta).strftime("%H:%M"), "10:30")
+        self.assertTrue(today.on_time)
+
+        tomorrow = slots.slot_eta("10AM - 12PM", 20, now=self.at(10, 5))
+        self.assertEqual((tomorrow.day_label, tomorrow.travel_minutes), ("Tomorrow", 60))
+
+    def test_zone_distance_is_stored_and_answers_a_whole_day(self):
+        self.assertAlmostEqual(self.zone.distance_km, 4.1, delta=0.1)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("delivery_slots"), {"zone_id": self.zone.id})
+        data = response.json()
+        self.assertEqual([row["slot"] for row in data["slots"]], list(slots.SLOTS))
+        self.assertTrue(all(row["on_time"] for row in data["slots"]))
+
+    def test_both_endpoints_agree(self):
+        params = {"zone_id": self.zone.id, "slot": "4PM - 6PM", "latitude": 11.37, "longitude": 76.70}
+        feasibility = self.client.post(reverse("check_delivery_feasibility"), params).json()
+        with_slot = self.client.post(reverse("check_delivery_with_slot"), params).json()
+
+        self.assertEqual(feasibility["eta"], with_slot["eta"])
+        self.assertEqual(feasibility["status"], "on_time")
+        self.assertTrue(with_slot["success"])
+
+    def test_order_expected_delivery_uses_the_slot(self):
+        user = CustomUser.objects.create_user(username="slotter", password="Secret123")
+        order = Order.objects.create(
+            user=user, full_name="Slot Ter", email="s@example.com", phone="9876543210",
+            street_address="1 Hill Road", city="Ooty", delivery_slot="6PM - 8PM",
+            delivery_zone=self.zone, payment_method="COD",
+        )
+        eta = order.calculate_expected_delivery()
+
+        self.assertEqual(eta, slots.slot_eta("6PM - 8PM", self.zone.distance_km).eta)
+        self.assertEqual(order.distance_km, self.zone.distance_km)
+
+
+def png_upload(name="photo.png", size=(1200, 800)):
+    buffer = io.BytesIO()
+    Image.new("RGBA", size, (200, 40, 40, 255)).save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+
+class ImageVariantTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.media_root = media_root
+        self.category = Category.objects.create(name="Greens", image="categories/missing.jpg")
+
+    def create_product(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Product.objects.create(
+                category=self.category, title="Kale", base_price="80.00", image=png_upload(),
+            )
+
+    def test_upload_builds_webp_and_jpeg_variants(self):
+        product = self.create_product()
+        product.refresh_from_db()
+
+        variants = product.image_variants
+        self.assertEqual(variants["source"], product.image.name)
+        self.assertEqual([w for w, _ in variants["webp"]], list(images.WIDTHS))
+        for width, name in variants["webp"] + variants["jpeg"]:
+            with Image.open(os.path.join(self.media_root, name)) as derived:
+                self.assertEqual(derived.size, (width, round(800 * width / 1200)))
+
+    def test_small_images_are_not_upscaled(self):
+        name = Product.image.field.upload_to + "tiny.png"
+        os.makedirs(os.path.join(self.media_root, "products"))
+        Image.new("RGB", (200, 100)).save(os.path.join(self.media_root, name))
+
+        variants = images.render_variants(name, self.media_root)
+        self.assertEqual([w for w, _ in variants["jpeg"]], [160, 200])
+
+    def test_sources_sharing_a_stem_keep_separate_variants(self):
+        os.makedirs(os.path.join(self.media_root, "products"))
+        Image.new("RGB", (400, 200)).save(os.path.join(self.media_root, "products/mango.jpg"))
+        Image.new("RGB", (400, 400)).save(os.path.join(self.media_root, "products/mango.png"))
+
+        jpg = images.render_variants("products/mango.jpg", self.media_root)
+        png = images.render_variants("products/mango.png", self.media_root)
+
+        self.assertFalse({n for _, n in jpg["webp"]} & {n for _, n in png["webp"]})
+        with Image.open(os.path.join(self.media_root, jpg["webp"][0][1])) as derived:
+            self.assertEqual(derived.size, (160, 80))
+
+    def test_tag_emits_srcset_once_variants_are_current(self):
+        product = self.create_product()
+        product.refresh_from_db()
+        tag = Template("{% load image_tags %}{% responsive_image p css_class='pro-img' alt=p.title %}")
+
+        html = tag.render(Context({"p": product}))
+        self.assertIn('<source type="image/webp" srcset="/media/derivatives/products/', html)
+        self.assertIn("-640.webp 640w", html)
+        self.assertIn('src="/media/derivatives/products/', html)
+
+        product.image = "products/replaced.jpg"
+        html = tag.render(Context({"p": product}))
+        self.assertEqual(html, '<img src="/media/products/replaced.jpg" class="pro-img" alt="Kale" loading="lazy">')
+
+    def test_backfill_command_builds_missing_variants(self):
+        os.makedirs(os.path.join(self.media_root, "categories"))
+        Image.new("RGB", (400, 400)).save(os.path.join(self.media_root, "categories/missing.jpg"))
+
+        call_command("build_image_variants", workers=1, stdout=io.StringIO())
+
+        self.category.refresh_from_db()
+        self.assertTrue(images.is_current(self.category))
+
+
+class DatabaseTuningTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create_user(username="indexed", password="Secret123")
+        cls.category = Category.objects.create(name="Snacks", image="categories/s.jpg")
+        cls.product = Product.objects.create(
+            category=cls.category, title="Chips", base_price="20.00", image="products/c.jpg",
+        )
+
+    def assertUsesIndex(self, queryset, index):
+        plan = queryset.explain()
+        self.assertIn(f"INDEX {index}", plan)
+
+    def test_hot_queries_use_their_indexes(self):
+        self.assertUsesIndex(
+            Order.objects.filter(user=self.user).order_by("-created_at"), "order_user_created_idx"
+        )
+        self.assertUsesIndex(
+            Order.objects.filter(status__in=["pending", "confirmed"]), "order_status_idx"
+        )
+        self.assertUsesIndex(
+            CartItem.objects.filter(user=self.user, product=self.product, weight="1KG"),
+            "cartitem_user_line_idx",
+        )
+        self.assertUsesIndex(
+            Product.objects.filter(is_offer=True, offer_end__gte=timezone.now()),
+            "product_offer_end_idx",
+        )
+        self.assertUsesIndex(
+            self.category.products.filter(offer_active=True), "product_category_offer_idx"
+        )
+
+    def test_connections_are_tuned(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_retry_on_busy(self):
+        calls = []
+
+        @database.retry_on_busy
+        def write():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError("database is locked")
+            return "done"
+
+        with mock.patch("core.database.time.sleep"), \
+                mock.patch.object(connection, "in_atomic_block", False):
+            self.assertEqual(write(), "done")
+        self.assertEqual(len(calls), 3)
+
+        # Inside a transaction the caller has to retry the whole thing.
+        calls.clear()
+        with self.assertRaises(OperationalError):
+            write()
+        self.assertEqual(len(calls), 1)
+
+
+# cache.clear() below must never reach a shared cache, whatever the runner.
+@override_settings(CACHES=TEST_CACHES)
+class PageCacheTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_pages_render_once_per_role(self):
+        url = reverse("features_page")
+        first = self.client.get(url)
+
+        with mock.patch("core.views.render") as render:
+            again = self.client.get(url)
+        render.assert_not_called()
+        self.assertEqual(again.content, first.content)
+        self.assertIn("Cookie", again["Vary"])
+        self.assertIn("private", again["Cache-Control"])
+
+        user = CustomUser.objects.create_user(username="reader", password="Secret123")
+        self.client.force_login(user)
+        signed_in = self.client.get(url)
+        self.assertContains(signed_in, reverse("logout"))
+        self.assertNotEqual(signed_in.content, first.content)
+
+    def test_a_new_deploy_version_misses(self):
+        url = reverse("support")
+        self.client.get(url)
+        with override_settings(DEPLOY_VERSION="next"), \
+                mock.patch("core.views.render", return_value=HttpResponse("fresh")) as render:
+            self.assertEqual(self.client.get(url).content, b"fresh")
+        render.assert_called_once()
+
+
+class GuestSessionTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.zone = DeliveryZone.objects.create(
+            area_name="Fernhill", pincode="643004", city="Ooty", latitude=11.40, longitude=76.69
+        )
+
+    def test_session_reads_are_served_from_the_cache(self):
+        self.client.get(reverse("home_set_location"), {"zone_id": self.zone.id})
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(reverse("home_set_location"), {"zone_id": self.zone.id})
+
+        session_queries = [q for q in ctx.captured_queries if "django_session" in q["sql"]]
+        self.assertEqual(session_queries, [])
+        self.assertEqual(self.client.session["selected_zone"], self.zone.id)
+
+    def test_wishlist_context_does_not_touch_the_session_unless_used(self):
+        request = mock.Mock()
+        context = guest_wishlist(request)
+        request.session.get.assert_not_called()
+
+        request.session.get.return_value = [4, 7]
+        self.assertIn(7, context["guest_wishlist_ids"])
+        request.session.get.assert_called_once_with("wishlist", [])
+
+
+class AccountAvailabilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        CustomUser.objects.create_user(
+            username="meena", email="meena@example.com", phone="9876543210", password="x"
+        )
+
+    def setUp(self):
+        accounts.invalidate_usernames()
+
+    def test_combined_check_is_one_exact_query(self):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse("check_availability"), {
+                "username": " Meena ", "email": "MEENA@example.com", "phone": "9123456780",
+            })
+
+        self.assertEqual(response.json(), {"username": False, "email": False, "phone": True})
+        user_queries = [q["sql"] for q in ctx.captured_queries if "core_customuser" in q["sql"]]
+        self.assertEqual(len(user_queries), 1)
+        self.assertNotIn("LIKE", user_queries[0].upper())
+
+    def test_suggestions_follow_new_users(self):
+        self.assertEqual(accounts.suggest_usernames("Me"), ["meena"])
+        CustomUser.objects.create_user(username="meenakshi", password="x")
+
+        response = self.client.get(reverse("username_suggestions"), {"q": "mee"})
+        self.assertEqual(response.json()["suggestions"], ["meena", "meenakshi"])
+        self.assertEqual(accounts.suggest_usernames("ravi"), [])
+
+    def test_registration_checks_all_three_fields_at_once(self):
+        form = CustomUserCreationForm(data={
+            "username": "Meena", "email": "meena@example.com", "phone": "9876543210",
+            "role": "customer", "password1": "Harvest2026x", "password2": "Harvest2026x",
+        })
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertFalse(form.is_valid())
+
+        self.assertEqual(set(form.errors), {"username", "email", "phone"})
+        self.assertEqual(len(ctx.captured_queries), 1)
+
+
+class TrackingPublisherTests(SimpleTestCase):
+
+    async def test_one_poller_fans_out_to_every_subscriber(self):
+        publisher = TrackingPublisher(LocalBroker(), poll_interval=0.01)
+        snapshots = [
+            {"driver_lat": 11.40, "driver_lon": 76.69, "status": "out_for_delivery"},
+            {"driver_lat": 11.41, "driver_lon": 76.70, "status": "delivered"},
+        ]
+        fetch = mock.AsyncMock(side_effect=snapshots)
+
+        with mock.patch.object(publisher, "fetch_snapshot", fetch):
+            streams = [publisher.stream(7), publisher.stream(7)]
+            frames = await asyncio.gather(*[self.collect(s) for s in streams])
+
+        self.assertEqual(fetch.await_count, 2)
+        for received in frames:
+            data = [json.loads(f[len("data: "):]) for f in received if f.startswith("data: {\"")]
+            self.assertEqual(data, snapshots)
+            self.assertTrue(received[-1].startswith("event: end"))
+        self.assertEqual(publisher.broker.subscriber_count(7), 0)
+
+    async def test_stream_ends_when_the_order_disappears(self):
+        publisher = TrackingPublisher(LocalBroker(), poll_interval=0.01)
+
+        with mock.patch.object(publisher, "fetch_snapshot", mock.AsyncMock(return_value=None)):
+            frames = await asyncio.wait_for(self.collect(publisher.stream(7)), timeout=1)
+
+        self.assertFalse([f for f in frames if f.startswith("data: {\"")])
+        self.assertTrue(frames[-1].startswith("event: end"))
+        self.assertEqual(publisher.broker.subscriber_count(7), 0)
+
+    async def collect(self, stream):
+        return [frame async for frame in stream]
+
+
+class TrackStreamTests(TestCase):
+
+    def test_wsgi_requests_are_sent_to_the_polling_fallback(self):
+        user = CustomUser.objects.create_user(username="buyer", password="Secret123")
+        order = Order.objects.create(
+            user=user, full_name="Buyer", email="buyer@example.com", phone="9876543210",
+            street_address="1 Hill Road", city="Ooty", delivery_slot="8AM - 10AM",
+            payment_method="COD",
+        )
+        self.client.force_login(user)
+
+        response = self.client.get(reverse("track_stream", args=[order.id]))
+
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(response.streaming)
@@ -0,0 +1,143 @@
+"""
+Live order tracking over Server-Sent Events.
+
+Each tracked order gets one polling task per process, no matter how many
+tabs are watching it. The task reads the order's position and hands every
+change to a broker, which fans it out to all subscribers. The default
+LocalBroker keeps everything in memory so no Redis is needed; a different
+broker can be plugged in through ``settings.TRACKING_BROKER``.
+"""
+import asyncio
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .models import Order
+
+POLL_INTERVAL = getattr(settings, "TRACKING_POLL_INTERVAL", 3.0)
+KEEPALIVE_INTERVAL = 15.0
+SUBSCRIBER_QUEUE_SIZE = 10
+
+FINAL_STATUSES = {"delivered", "failed", "cancelled"}
+
+# Published when the order row is gone, so streams end instead of idling.
+ORDER_REMOVED = {"status": "removed"}
+
+SNAPSHOT_FIELDS = {
+    "current_latitude": "driver_lat",
+    "current_longitude": "driver_lon",
+    "latitude": "customer_lat",
+    "longitude": "customer_lon",
+    "status": "status",
+}
+
+
+class LocalBroker:
+    """In-process pub/sub with one bounded queue per subscriber."""
+
+    def __init__(self):
+        self._channels = defaultdict(set)
+
+    def subscribe(self, channel):
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        self._channels[channel].add(queue)
+        return queue
+
+    def unsubscribe(self, channel, queue):
+        subscribers = self._channels.get(channel)
+        if subscribers is None:
+            return
+        subscribers.discard(queue)
+        if not subscribers:
+            del self._channels[channel]
+
+    def subscriber_count(self, channel):
+        return len(self._channels.get(channel, ()))
+
+    def publish(self, channel, message):
+        for queue in list(self._channels.get(channel, ())):
+            if queue.full():
+                # A slow client only needs the latest position.
+                queue.get_nowait()
+            queue.put_nowait(message)
+
+
+class TrackingPublisher:
+
+    def __init__(self, broker, poll_interval=POLL_INTERVAL):
+        self.broker = broker
+        self.poll_interval = poll_interval
+        self._tasks = {}
+        self._latest = {}
+
+    async def fetch_snapshot(self, order_id):
+        row = await Order.objects.filter(id=order_id).values(*SNAPSHOT_FIELDS).afirst()
+        if row is None:
+            return None
+        return {key: row[field] for field, key in SNAPSHOT_FIELDS.items()}
+
+    async def _poll(self, order_id):
+        try:
+            while self.broker.subscriber_count(order_id):
+                snapshot = await self.fetch_snapshot(order_id)
+                if snapshot is None:
+                    self.broker.publish(order_id, ORDER_REMOVED)
+                    break
+                if snapshot != self._latest.get(order_id):
+                    self._latest[order_id] = snapshot
+                    self.broker.publish(order_id, snapshot)
+                if snapshot["status"] in FINAL_STATUSES:
+                    break
+                await asyncio.sleep(self.poll_interval)
+        finally:
+            self._tasks.pop(order_id, None)
+            self._latest.pop(order_id, None)
+
+    def subscribe(self, order_id):
+        queue = self.broker.subscribe(order_id)
+        latest = self._latest.get(order_id)
+        if latest is not None:
+            queue.put_nowait(latest)
+        if order_id not in self._tasks:
+            self._tasks[order_id] = asyncio.create_task(self._poll(order_id))
+        return queue
+
+    def unsubscribe(self, order_id, queue):
+        self.broker.unsubscribe(order_id, queue)
+
+    async def stream(self, order_id):
+        """Yield SSE frames for ``order_id`` until the order is finished."""
+        queue = self.subscribe(order_id)
+        try:
+            yield f"retry: {int(self.poll_interval * 1000)}\n\n"
+            while True:
+                try:
+                    snapshot = await asyncio.wait_for(queue.get(), KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+
+                if snapshot == ORDER_REMOVED:
+                    yield "event: end\ndata: {}\n\n"
+                    break
+                yield f"data: {json.dumps(snapshot)}\n\n"
+                if snapshot["status"] in FINAL_STATUSES:
+                    yield "event: end\ndata: {}\n\n"
+                    break
+        finally:
+            self.unsubscribe(order_id, queue)
+
+
+_publisher = None
+
+
+def get_publisher():
+    global _publisher
+    if _publisher is None:
+        broker_class = import_string(
+            getattr(settings, "TRACKING_BROKER", "core.tracking.LocalBroker")
+        )
+        _publisher = TrackingPublisher(broker_class())
+    return _publisher
@@ -0,0 +1,110 @@
+"""
+Weight and unit conversion for product options.
+
+A weight option such as ``"500G"``, ``"1.5 KG"``, ``"250ML"`` or ``"6PCS"``
+becomes the multiplier applied to a product's price for its ``unit``. Mass
+prices are per kilogram and volume prices per litre, including for ``g`` and
+``ml`` products; counts are per piece or pack, or per dozen for ``dozen``.
+
+Each (unit, option) pair is parsed once with a precompiled pattern and kept
+in a table, so pricing a cart is a dictionary lookup per line. Options come
+from request data, so the table stops growing at ``MAX_TABLE_SIZE``.
+"""
+import re
+from decimal import Decimal
+
+OPTION_PATTERN = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*([A-Z]*)\s*$")
+
+MASS, VOLUME, COUNT = "mass", "volume", "count"
+
+# Option suffix -> (dimension, size in base units: kg, litre or piece).
+SUFFIXES = {
+    "KG": (MASS, Decimal("1")),
+    "KGS": (MASS, Decimal("1")),
+    "G": (MASS, Decimal("0.001")),
+    "GM": (MASS, Decimal("0.001")),
+    "GMS": (MASS, Decimal("0.001")),
+    "L": (VOLUME, Decimal("1")),
+    "LTR": (VOLUME, Decimal("1")),
+    "ML": (VOLUME, Decimal("0.001")),
+    "PC": (COUNT, Decimal("1")),
+    "PCS": (COUNT, Decimal("1")),
+    "PACK": (COUNT, Decimal("1")),
+    "PACKS": (COUNT, Decimal("1")),
+    "DOZEN": (COUNT, Decimal("12")),
+    "DOZ": (COUNT, Decimal("12")),
+}
+
+# Product.UNIT_CHOICES value -> (dimension, size of one priced unit).
+UNITS = {
+    "kg": (MASS, Decimal("1")),
+    "g": (MASS, Decimal("1")),
+    "litre": (VOLUME, Decimal("1")),
+    "ml": (VOLUME, Decimal("1")),
+    "piece": (COUNT, Decimal("1")),
+    "pack": (COUNT, Decimal("1")),
+    "dozen": (COUNT, Decimal("12")),
+}
+
+# Mass and volume options are interchangeable at the density of water.
+CONVERTIBLE = {frozenset((MASS, VOLUME))}
+
+ONE = Decimal("1")
+
+MAX_TABLE_SIZE = 4096
+
+_table = {}
+
+
+def parse_option(option):
+    """Return ``(dimension, amount in base units)`` or None if unparseable."""
+    match = OPTION_PATTERN.match((option or "").upper())
+    if not match:
+        return None
+    number, suffix = match.groups()
+    if not suffix:
+        return None, Decimal(number)
+    if suffix not in SUFFIXES:
+        return None
+    dimension, size = SUFFIXES[suffix]
+    return dimension, Decimal(number) * size
+
+
+def _compute(unit, option):
+    parsed = parse_option(option)
+    if parsed is None or unit not in UNITS:
+        return ONE
+    dimension, amount = parsed
+    unit_dimension, unit_size = UNITS[unit]
+    if dimension is None:
+        # A bare number counts priced units.
+        return _tidy(amount)
+    if dimension != unit_dimension and frozenset((dimension, unit_dimension)) not in CONVERTIBLE:
+        return ONE
+    return _tidy(amount / unit_size)
+
+
+def _tidy(value):
+    # 0.500 -> 0.5 and 1.000 -> 1, without normalize()'s 1E+1 for 10.
+    return value.quantize(ONE) if value == value.to_integral() else value.normalize()
+
+
+def multiplier(unit, option):
+    """Price multiplier for ``option`` of a product sold by ``unit``."""
+    key = (unit, (option or "").upper())
+    value = _table.get(key)
+    if value is None:
+        value = _compute(*key)
+        if len(_table) < MAX_TABLE_SIZE:
+            _table[key] = value
+    return value
+
+
+def multipliers(pairs):
+    """Vectorized :func:`multiplier` for an iterable of ``(unit, option)``."""
+    return [multiplier(unit, option) for unit, option in pairs]
+
+
+def split_options(weight_options):
+    """Split a ``weight_options`` CSV into its stripped, non-empty options."""
+    return [option.strip() for option in (weight_options or "").split(",") if option.strip()]
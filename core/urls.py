@@ -22,6 +22,7 @@ urlpatterns = [
     path('our-products/', views.our_products, name='our_products'),
     path('track-order/', views.track_order, name='track_order'),
     path("track-location/<int:order_id>/", views.track_location, name="track_location"),
+    path("track-stream/<int:order_id>/", views.track_stream, name="track_stream"),
     path('vendor-dashboard/', views.vendor_dashboard, name='vendor_dashboard'),
     path('contact/', views.contact_page, name='contact_page'),
     path('vendor/edit/<int:product_id>/', views.edit_product, name='edit_product'),
@@ -41,6 +42,7 @@ urlpatterns = [
     path("order/<int:order_id>/cancel/", views.cancel_order, name="cancel_order"),
     path("order/<int:order_id>/start-dispatch/", views.start_dispatch, name="start_dispatch"),
     path('check-delivery-feasibility/', views.check_delivery_feasibility, name='check_delivery_feasibility'),
+    path('delivery-slots/', views.delivery_slots, name='delivery_slots'),
     path('order-confirmation/<int:order_id>/', views.order_confirmation, name='order_confirmation'),
     path("my-orders/", views.my_orders, name="my_orders"),
     path('cart/update/', views.update_cart_item, name='update_cart_item'),
@@ -65,6 +67,7 @@ urlpatterns = [
     path('ajax/check-email/', views.check_email_exists, name='check_email'),
     path('ajax/username-suggestions/', views.username_suggestions, name='username_suggestions'),
     path('ajax/check-phone/', views.check_phone_exists, name='check_phone'),
+    path('ajax/check-availability/', views.check_availability, name='check_availability'),
     path("reverse-geocode/", views.reverse_geocode, name="reverse_geocode"),
     path('delivery-info/', views.delivery_info, name='delivery_info'),
     path('fresh-organic/', views.fresh_organic, name='fresh_organic'),
@@ -1,8 +1,8 @@
-import math
 from django.conf import settings
-from django.core.mail import send_mail
 from django.template.loader import render_to_string
 
+from .geo import haversine_km
+
 def calculate_distance_km(lat1, lon1, lat2, lon2):
     """
     Calculate the approximate distance (in kilometers) between two GPS coordinates
@@ -12,22 +12,30 @@ def calculate_distance_km(lat1, lon1, lat2, lon2):
         if not all([lat1, lon1, lat2, lon2]):
             return 0.0  
 
-        R = 6371 
-        dlat = math.radians(lat2 - lat1)
-        dlon = math.radians(lon2 - lon1)
-        a = (
-            math.sin(dlat / 2) ** 2
-            + math.cos(math.radians(lat1))
-            * math.cos(math.radians(lat2))
-            * math.sin(dlon / 2) ** 2
-        )
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        distance = R * c
+        distance = haversine_km(float(lat1), float(lon1), float(lat2), float(lon2))
         return round(distance, 2)
     except Exception:
         return 0.0
 
 
+def get_wishlist_ids(user):
+    """
+    Return the set of product ids in the user's wishlist.
+
+    The set is loaded with a single query and kept on the user object, which
+    lives for one request, so every product grid and template tag rendered
+    during that request shares it.
+    """
+    if not user.is_authenticated:
+        return set()
+
+    wishlist_ids = getattr(user, "_wishlist_ids", None)
+    if wishlist_ids is None:
+        wishlist_ids = set(user.wishlist.values_list("id", flat=True))
+        user._wishlist_ids = wishlist_ids
+    return wishlist_ids
+
+
 def get_delivery_delay(zone=None, lat=None, lon=None):
     """
     Return delivery delay (in hours) dynamically based on either:
@@ -69,19 +77,18 @@ def get_delivery_delay(zone=None, lat=None, lon=None):
 
 
 
-def send_order_email(to_email, subject, template, context):
+def send_order_email(to_email, subject, template, context, dedupe_key=None):
+    from .outbox import enqueue_email
+
     if not to_email:
         return False
 
     html_message = render_to_string(template, context)
-    
-    send_mail(
+
+    return enqueue_email(
+        to_email,
         subject,
         html_message,
-        settings.EMAIL_HOST_USER,
-        [to_email],
-        html_message=html_message,
-        fail_silently=False
+        html_body=html_message,
+        dedupe_key=dedupe_key,
     )
-    return True
-
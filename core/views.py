@@ -1,17 +1,18 @@
 from datetime import datetime, timedelta
 from decimal import Decimal
 import json
-import math
-from math import radians, sin, cos, sqrt, atan2
-import razorpay
+import uuid
 
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib import messages
 from django.contrib.auth import login, logout, get_user_model
 from django.contrib.auth.decorators import login_required, user_passes_test
+from django.core.handlers.asgi import ASGIRequest
 from django.core.mail import send_mail
-from django.http import JsonResponse
-from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import patch_cache_control
+from django.utils.dateparse import parse_date
+from django.views.decorators.http import condition, require_POST
 from django.views.decorators.csrf import csrf_exempt
 from django.utils import timezone
 from django.conf import settings
@@ -33,10 +34,21 @@ from .models import (
     OrderItem, PasswordResetOTP, get_delivery_delay
 )
 
-from .serializers import DeliveryZoneSerializer, OrderSerializer
+from .serializers import DeliveryZoneSerializer
+from . import accounts, api_views, geo, search, slots
+from .cart import GuestCart, buy_now_cart, price_line, user_cart
+from .checkout import existing_order, place_order
+from .metrics import dashboard_metrics, vendor_sales
+from .geocoding import GeocodingError, get_geocoder
+from .outbox import enqueue_email
+from .page_cache import cache_page_by_role
+from .payments import PaymentGatewayError, get_gateway
+from .tracking import get_publisher
+from .zone_index import get_zone_index
+from .zone_catalogue import catalogue_etag, get_zone_catalogue, zones_response
 
 from .utils import (
-    calculate_distance_km, send_order_email
+    calculate_distance_km, send_order_email, get_wishlist_ids
 )
 
 from core.models import CustomUser, Product, Category, Order, OrderItem
@@ -103,22 +115,17 @@ def register(request):
 
             auth_login(request, user)
 
-            try:
-                send_mail(
-                    subject="Welcome to VetriMart!",
-                    message=(
-                        f"Hi {user.username},\n\n"
-                        "Your account has been created successfully.\n"
-                        "You can now order groceries and track delivery live.\n\n"
-                        "Thank you for joining VetriMart!"
-                    ),
-                    from_email=settings.EMAIL_HOST_USER,
-                    recipient_list=[user.email],
-                    fail_silently=False,  
-                )
-            except Exception as e:
-                logger.exception("Failed to send welcome email to %s: %s", user.email, e)
-                messages.warning(request, "Account created but welcome email could not be delivered. Please check your email settings.")
+            enqueue_email(
+                user.email,
+                "Welcome to VetriMart!",
+                (
+                    f"Hi {user.username},\n\n"
+                    "Your account has been created successfully.\n"
+                    "You can now order groceries and track delivery live.\n\n"
+                    "Thank you for joining VetriMart!"
+                ),
+                dedupe_key=f"welcome:{user.id}",
+            )
 
             messages.success(request, "Account created! You are now logged in.")
             return redirect('home')
@@ -136,30 +143,21 @@ def logout_view(request):
 def category_products(request, category_id):
     category = get_object_or_404(Category, id=category_id)
     products = category.products.all()
-    now = timezone.now()
     show_offers = request.GET.get('offers') == 'true'
     if show_offers:
-        products = products.filter(
-            is_offer=True,
-            offer_start__lte=now,
-            offer_end__gte=now
-        )
+        products = products.filter(offer_active=True)
     sort = request.GET.get('sort')
     if sort == 'price_low':
-        products = products.order_by('base_price')
+        products = products.order_by('effective_price')
     elif sort == 'price_high':
-        products = products.order_by('-base_price')
+        products = products.order_by('-effective_price')
     elif sort == 'name_asc':
         products = products.order_by('title')
     elif sort == 'name_desc':
         products = products.order_by('-title')
-    if request.user.is_authenticated:
-        user_wishlist_ids = request.user.wishlist.values_list('id', flat=True)
-        for product in products:
-            product.in_wishlist = product.id in user_wishlist_ids
-    else:
-        for product in products:
-            product.in_wishlist = False
+    user_wishlist_ids = get_wishlist_ids(request.user)
+    for product in products:
+        product.in_wishlist = product.id in user_wishlist_ids
 
     return render(request, 'core/category_products.html', {
         'category': category,
@@ -187,44 +185,15 @@ def product_detail(request, category_id, product_id):
         selected_weight = request.POST.get("weight")
         quantity = int(request.POST.get("quantity", 1))
 
-        weight_multiplier = product.convert_weight_value(selected_weight)
-
-        unit_price = (
-            product.discounted_price
-            if product.is_offer_active
-            else product.base_price
-        )
-
-        final_price = float(unit_price) * float(weight_multiplier)
-        
         if not request.user.is_authenticated:
-
-            cart = request.session.get("cart", [])
-
-            cart.append({
-                "product_id": product.id,
-                "title": product.title,
-                "weight": selected_weight,
-                "quantity": quantity,
-                "unit_price": float(unit_price),
-                "weight_multiplier": float(weight_multiplier),
-                "final_price": float(final_price), 
-                "image": product.image.url if product.image else "",
-            })
-
-            request.session["cart"] = cart
-            request.session.modified = True
+            cart = GuestCart(request.session)
+            cart.add(product.id, selected_weight, quantity)
+            cart.save()
 
             if "buy_now" in request.POST:
                 return redirect("login")
 
             return redirect("cart")
-        unit_price = (
-            product.discounted_price
-            if product.is_offer_active
-            else product.base_price
-        )
-        final_price = float(unit_price) * weight_multiplier
 
         cart_item = CartItem.objects.filter(
             user=request.user,
@@ -250,10 +219,7 @@ def product_detail(request, category_id, product_id):
 
     related_products = Product.objects.filter(category=product.category).exclude(id=product.id)[:4]
 
-    in_wishlist = (
-        product.wishlist_users.filter(id=request.user.id).exists()
-        if request.user.is_authenticated else False
-    )
+    in_wishlist = product.is_in_wishlist_for_user(request.user)
 
     return render(request, "core/product_detail.html", {
         "product": product,
@@ -269,43 +235,16 @@ def cart_view(request):
     # LOGGED-IN USER CART
     # ------------------------------------------------------------
     if request.user.is_authenticated:
-        cart_items = CartItem.objects.filter(user=request.user)
-
-        subtotal = Decimal("0.00")
-
-        for item in cart_items:
-
-            # Convert weight
-            weight_multiplier = item.product.convert_weight_value(item.weight)
-            item.converted_weight = weight_multiplier
-
-            # Offer price or base price
-            unit_price = (
-                item.product.discounted_price
-                if item.product.is_offer_active
-                else item.product.base_price
-            )
-
-            # Final price
-            item.final_price = (
-                Decimal(unit_price) *
-                Decimal(weight_multiplier) *
-                Decimal(item.quantity)
-            )
-
-            subtotal += item.final_price
-
-        tax = subtotal * Decimal("0.05")
-        total = subtotal + tax
+        cart = user_cart(request.user)
 
         return render(
             request,
             "core/cart.html",
             {
-                "cart_items": cart_items,
-                "subtotal": subtotal,
-                "tax": tax,
-                "total": total,
+                "cart_items": cart.items,
+                "subtotal": cart.subtotal,
+                "tax": cart.tax,
+                "total": cart.total,
                 "is_guest": False,
             }
         )
@@ -313,39 +252,18 @@ def cart_view(request):
     # ------------------------------------------------------------
     # GUEST CART (SESSION)
     # ------------------------------------------------------------
-    cart = request.session.get("cart", [])
-
-    subtotal = Decimal("0.00")
-
-    for item in cart:
-        product = Product.objects.get(id=item["product_id"])
-
-        # Convert weight (ex: "1KG" → 1.0)
-        weight_multiplier = Decimal(str(product.convert_weight_value(item["weight"])))
-        item["converted_weight"] = weight_multiplier
-
-        # Correct unit price
-        unit_price = Decimal(str(item["unit_price"]))
-
-        # Quantity
-        quantity = Decimal(str(item["quantity"]))
-
-        # Final price
-        item["final_price"] = unit_price * weight_multiplier * quantity
-
-        subtotal += item["final_price"]
-
-    tax = subtotal * Decimal("0.05")
-    total = subtotal + tax
+    guest_cart = GuestCart(request.session)
+    cart = guest_cart.priced()
+    guest_cart.save()
 
     return render(
         request,
         "core/cart.html",
         {
-            "cart_items": cart,
-            "subtotal": subtotal,
-            "tax": tax,
-            "total": total,
+            "cart_items": cart.items,
+            "subtotal": cart.subtotal,
+            "tax": cart.tax,
+            "total": cart.total,
             "is_guest": True,
         }
     )
@@ -381,35 +299,9 @@ def add_to_cart(request, product_id):
 
         item.save()
         return redirect("cart")
-    cart = request.session.get("cart", [])
-
-    for entry in cart:
-        if entry["product_id"] == product.id and entry["weight"] == weight:
-            entry["quantity"] += quantity
-            request.session["cart"] = cart
-            request.session.modified = True
-            return redirect("cart")
-        
-    unit_price = (
-    product.discounted_price
-    if product.is_offer_active
-    else product.base_price
-)
-
-    cart.append({
-    "product_id": product.id,
-    "weight": weight,
-    "quantity": quantity,
-
-    "image": product.image.url,
-    "title": product.title,
-
-    "unit": product.unit,                   
-    "unit_price": str(unit_price),  
-    })
-
-    request.session["cart"] = cart
-    request.session.modified = True
+    cart = GuestCart(request.session)
+    cart.add(product.id, weight, quantity)
+    cart.save()
     return redirect("cart")
 
 
@@ -420,23 +312,32 @@ def remove_from_cart(request, item_id):
     return redirect("cart")
 
 def remove_from_cart_guest(request, index):
-    cart = request.session.get("cart", [])
-    if 0 <= index < len(cart):
-        cart.pop(index)
-        request.session["cart"] = cart
+    cart = GuestCart(request.session)
+    cart.remove(index)
+    cart.save()
     return redirect("cart")
 
-@login_required
 @require_POST
 def update_cart_item(request):
     item_id = request.POST.get('item_id')
     quantity = int(request.POST.get('quantity', 1))
 
+    if not request.user.is_authenticated:
+        # Guests address lines by their index in the session cart.
+        cart = GuestCart(request.session)
+        index = int(item_id) if (item_id or '').isdigit() else -1
+        cart.set_quantity(index, max(1, quantity))
+        lines = cart.priced().items
+        cart.save()
+        if not 0 <= index < len(lines):
+            return JsonResponse({'success': False, 'error': 'Item not found'})
+        return JsonResponse({'success': True, 'total_price': f'{lines[index].final_price:.2f}'})
+
     try:
-        cart_item = CartItem.objects.get(id=item_id, user=request.user)
+        cart_item = CartItem.objects.select_related('product').get(id=item_id, user=request.user)
         cart_item.quantity = quantity
-        cart_item.save()
-        total_price = cart_item.quantity * cart_item.product.base_price
+        cart_item.save(update_fields=['quantity'])
+        total_price = price_line(cart_item).final_price
         return JsonResponse({'success': True, 'total_price': f'{total_price:.2f}'})
     except CartItem.DoesNotExist:
         return JsonResponse({'success': False, 'error': 'Item not found'})
@@ -459,12 +360,9 @@ def toggle_wishlist(request, product_id):
     wishlist = request.session.get("wishlist", [])
 
     if product.id in wishlist:
-        wishlist.remove(product.id)
+        request.session["wishlist"] = [pid for pid in wishlist if pid != product.id]
     else:
-        wishlist.append(product.id)
-
-    request.session["wishlist"] = wishlist
-    request.session.modified = True
+        request.session["wishlist"] = wishlist + [product.id]
 
     return redirect(request.META.get("HTTP_REFERER", "wishlist_page"))
 
@@ -509,10 +407,7 @@ def add_to_wishlist(request, product_id):
     wishlist = request.session.get("wishlist", [])
 
     if product.id not in wishlist:
-        wishlist.append(product.id)
-
-    request.session["wishlist"] = wishlist
-    request.session.modified = True
+        request.session["wishlist"] = wishlist + [product.id]
 
     return redirect("wishlist_page")
 
@@ -525,10 +420,7 @@ def remove_from_wishlist(request, product_id):
 
     wishlist = request.session.get("wishlist", [])
     if product_id in wishlist:
-        wishlist.remove(product_id)
-
-    request.session["wishlist"] = wishlist
-    request.session.modified = True
+        request.session["wishlist"] = [pid for pid in wishlist if pid != product_id]
 
     return redirect("wishlist_page")
 
@@ -538,19 +430,11 @@ def search_products(request):
     products = []
 
     if query:
-        products = Product.objects.filter(
-            Q(title__icontains=query) |
-            Q(description__icontains=query) |
-            Q(category__name__icontains=query)
-        ).distinct()
-
-        if request.user.is_authenticated:
-            user_wishlist_ids = request.user.wishlist.values_list('id', flat=True)
-            for product in products:
-                product.in_wishlist = product.id in user_wishlist_ids
-        else:
-            for product in products:
-                product.in_wishlist = False
+        products = search.ranked_products(Product.objects.all(), query)
+
+        user_wishlist_ids = get_wishlist_ids(request.user)
+        for product in products:
+            product.in_wishlist = product.id in user_wishlist_ids
 
     return render(request, 'core/search.html', {
         'query': query,
@@ -577,35 +461,27 @@ def our_products(request):
             products = products.filter(category=selected_category)
 
     if keyword:
-        products = products.filter(
-            Q(title__icontains=keyword) |
-            Q(description__icontains=keyword) |
-            Q(category__name__icontains=keyword)
-        )
+        products = search.filter_products(products, keyword)
     if min_price:
-        products = products.filter(base_price__gte=min_price)
+        products = products.filter(effective_price__gte=min_price)
     if max_price:
-        products = products.filter(base_price__lte=max_price)
+        products = products.filter(effective_price__lte=max_price)
 
     if weight_filter:
         products = products.filter(weight_options__icontains=weight_filter)
 
     if sort == "price_asc":
-        products = products.order_by("base_price")
+        products = products.order_by("effective_price")
     elif sort == "price_desc":
-        products = products.order_by("-base_price")
+        products = products.order_by("-effective_price")
     elif sort == "name_asc":
         products = products.order_by("title")
     elif sort == "name_desc":
         products = products.order_by("-title")
 
-    if request.user.is_authenticated:
-        wishlist_ids = request.user.wishlist.values_list('id', flat=True)
-        for product in products:
-            product.in_wishlist = product.id in wishlist_ids
-    else:
-        for product in products:
-            product.in_wishlist = False
+    wishlist_ids = get_wishlist_ids(request.user)
+    for product in products:
+        product.in_wishlist = product.id in wishlist_ids
 
     return render(request, 'core/our_products.html', {
         'products': products,
@@ -629,68 +505,34 @@ def is_admin(user):
 def admin_dashboard(request):
     total_users = CustomUser.objects.filter(role="customer").count()
     total_products = Product.objects.count()
-    total_orders = Order.objects.count()
-    total_sales = Order.objects.aggregate(total=Sum("total_amount"))["total"] or 0
+    metrics = dashboard_metrics()
 
     recent_orders = Order.objects.select_related("user").order_by("-created_at")[:10]
 
-    top_products = (
-        Product.objects.annotate(order_count=Count("order_items"))
-        .order_by("-order_count")[:5]
-    )
-    low_stock_items = Product.objects.annotate(
-        sales=Count("order_items")
-    ).order_by("sales")[:10]
-    low_stock_count = low_stock_items.count()
-    delivery_status_counts = {
-        "pending": Order.objects.filter(status="pending").count(),
-        "confirmed": Order.objects.filter(status="confirmed").count(),
-        "processing": Order.objects.filter(status="processing").count(),
-        "out_for_delivery": Order.objects.filter(status="out_for_delivery").count(),
-        "delivered": Order.objects.filter(status="delivered").count(),
-        "delayed": Order.objects.filter(status="delayed").count(),
-        "failed": Order.objects.filter(status="failed").count(),
-        "cancelled": Order.objects.filter(status="cancelled").count(),
-    }
-    category_data = Category.objects.annotate(
-        total_sales=Sum("products__order_items__price")
-    )
-
-    category_labels = [c.name for c in category_data]
-    category_values = [float(c.total_sales or 0) for c in category_data]
-    daily_qs = (
-        Order.objects
-        .annotate(day=TruncDate("created_at"))
-        .values("day")
-        .annotate(total=Sum("total_amount"))
-        .order_by("day")
-    )
+    low_stock_items = metrics["low_stock_items"]
+    low_stock_count = len(low_stock_items)
 
-    daily_labels = [d["day"].strftime("%b %d") for d in daily_qs]
-    daily_values = [float(d["total"] or 0) for d in daily_qs]
+    daily_labels = [day.strftime("%b %d") for day, _ in metrics["daily"]]
+    daily_values = [float(total) for _, total in metrics["daily"]]
 
-    top_items = (
-        OrderItem.objects
-        .values("product__title")
-        .annotate(total_qty=Sum("quantity"))
-        .order_by("-total_qty")[:5]
-    )
+    category_labels = [name for name, _ in metrics["categories"]]
+    category_values = [float(total) for _, total in metrics["categories"]]
 
-    top_labels = [p["product__title"] for p in top_items]
-    top_values = [p["total_qty"] for p in top_items]
+    top_labels = [title for title, _ in metrics["top_items"]]
+    top_values = [qty for _, qty in metrics["top_items"]]
     context = {
         "total_users": total_users,
         "total_products": total_products,
-        "total_orders": total_orders,
-        "total_sales": total_sales,
+        "total_orders": metrics["total_orders"],
+        "total_sales": metrics["total_sales"],
 
         "recent_orders": recent_orders,
-        "top_products": top_products,
+        "top_products": metrics["top_products"],
 
         "low_stock_items": low_stock_items,
         "low_stock_count": low_stock_count,
 
-        "delivery_status_counts": delivery_status_counts,
+        "delivery_status_counts": metrics["delivery_status_counts"],
 
         "daily_sales": {
             "labels": json.dumps(daily_labels),
@@ -716,6 +558,12 @@ from .forms import VendorProductForm
 def is_vendor(user):
     return user.is_authenticated and getattr(user, "role", None) == "vendor"
 
+def _query_date(request, name):
+    try:
+        return parse_date(request.GET.get(name, ''))
+    except ValueError:
+        return None
+
 @login_required
 @user_passes_test(is_vendor)
 def vendor_dashboard(request):
@@ -738,34 +586,19 @@ def vendor_dashboard(request):
     # 📌 VENDOR STATISTICS
     # -------------------------
 
-    # Total Revenue
-    total_revenue = (
-        OrderItem.objects.filter(product__vendor=request.user)
-        .aggregate(total=Sum(F("price") * F("quantity")))["total"]
-        or 0
-    )
-
-    # Total Orders (unique)
-    total_orders = (
-        Order.objects.filter(items__product__vendor=request.user)
-        .distinct()
-        .count()
+    # Read from the pre-aggregated ledger, optionally for ?start=&end= dates
+    sales = vendor_sales(
+        request.user,
+        start=_query_date(request, 'start'),
+        end=_query_date(request, 'end'),
     )
+    total_revenue = sales['total_revenue']
+    total_orders = sales['total_orders']
+    sales_data = sales['sales_data']
 
     # Total Products
     total_products = products.count()
 
-    # Sales breakdown per product
-    sales_data = (
-        OrderItem.objects.filter(product__vendor=request.user)
-        .values('product__title')
-        .annotate(
-            total_sales=Sum(F('price') * F('quantity')),
-            total_quantity=Sum('quantity')
-        )
-        .order_by('-total_sales')
-    )
-
     context = {
         'form': form,
         'products': products,
@@ -810,9 +643,9 @@ def offers_page(request):
         products = products.filter(category__name__icontains=category_filter)
 
     if sort == 'price_low':
-        products = products.order_by('discount_percent')     
+        products = products.order_by('effective_price')
     elif sort == 'price_high':
-        products = products.order_by('-discount_percent')    
+        products = products.order_by('-effective_price')
     elif sort == 'name_asc':
         products = products.order_by('title')
     elif sort == 'name_desc':
@@ -884,7 +717,8 @@ def set_delivery_location(request):
     try:
         zone = DeliveryZone.objects.get(id=zone_id, is_active=True)
         old_zone_id = request.session.get('selected_zone')
-        request.session['selected_zone'] = zone.id
+        if old_zone_id != zone.id:
+            request.session['selected_zone'] = zone.id
         if old_zone_id and old_zone_id != zone.id:
             msg = f'✅ Delivery area updated to {zone.area_name} ({zone.pincode}).'
         else:
@@ -895,19 +729,11 @@ def set_delivery_location(request):
     except DeliveryZone.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Invalid delivery area.'})
 
+@condition(etag_func=catalogue_etag)
 def get_delivery_zones(request):
-    zones = DeliveryZone.objects.filter(is_active=True).order_by('area_name')
-    data = [
-        {
-            'id': z.id,
-            'area_name': z.area_name,
-            'pincode': z.pincode,
-            'city': z.city,
-            'delay_hours': z.delivery_delay_hours
-        }
-        for z in zones
-    ]
-    return JsonResponse({'zones': data})
+    response = HttpResponse(get_zone_catalogue().body, content_type='application/json')
+    patch_cache_control(response, no_cache=True)
+    return response
 
 
 def check_delivery(request):
@@ -936,60 +762,35 @@ def check_delivery(request):
 def home_check_delivery(request):
     """Check if entered pincode or area is deliverable."""
     query = request.GET.get('query', '').strip()
-
-    zones = DeliveryZone.objects.filter(is_active=True).order_by('area_name')
-    available_zones = [
-        {
-            'id': z.id,
-            'area_name': z.area_name,
-            'pincode': z.pincode,
-            'city': z.city,
-            'delay_hours': z.delivery_delay_hours,
-        }
-        for z in zones
-    ]
+    catalogue = get_zone_catalogue()
 
     if not query:
-        return JsonResponse({
+        return zones_response({
             'success': False,
             'message': 'Please enter a valid pincode or area name.',
-            'available_zones': available_zones
-        })
+        }, catalogue)
 
-    zone = (
-        DeliveryZone.objects.filter(pincode__iexact=query, is_active=True).first() or
-        DeliveryZone.objects.filter(area_name__icontains=query, is_active=True).first()
-    )
+    zone = catalogue.find(query)
 
     if zone:
-        return JsonResponse({
+        return zones_response({
             'success': True,
-            'message': f'✅ Delivery available in {zone.area_name} ({zone.city}) within {zone.delivery_delay_hours} hours.',
-            'zone_id': zone.id,
-            'available_zones': available_zones
-        })
+            'message': f'✅ Delivery available in {zone["area_name"]} ({zone["city"]}) within {zone["delay_hours"]} hours.',
+            'zone_id': zone['id'],
+        }, catalogue)
 
-    return JsonResponse({
+    return zones_response({
         'success': False,
         'message': '❌ Sorry, we don’t deliver to this location yet.',
-        'available_zones': available_zones
-    })
+    }, catalogue)
 
 
+@condition(etag_func=catalogue_etag)
 def home_get_zones(request):
     """Return all active delivery zones."""
-    zones = DeliveryZone.objects.filter(is_active=True).order_by('area_name')
-    data = [
-        {
-            'id': z.id,
-            'area_name': z.area_name,
-            'pincode': z.pincode,
-            'city': z.city,
-            'delay_hours': z.delivery_delay_hours
-        }
-        for z in zones
-    ]
-    return JsonResponse({'zones': data})
+    response = HttpResponse(get_zone_catalogue().body, content_type='application/json')
+    patch_cache_control(response, no_cache=True)
+    return response
 
 
 def home_set_location(request):
@@ -997,7 +798,8 @@ def home_set_location(request):
     zone_id = request.GET.get('zone_id')
     try:
         zone = DeliveryZone.objects.get(id=zone_id, is_active=True)
-        request.session['selected_zone'] = zone.id
+        if request.session.get('selected_zone') != zone.id:
+            request.session['selected_zone'] = zone.id
         return JsonResponse({
             'success': True,
             'message': f'Delivering to {zone.area_name} ({zone.pincode})'
@@ -1025,33 +827,16 @@ def payment_page(request):
     buy_now = request.session.get("buy_now_item")
 
     if buy_now:
-        product = Product.objects.get(id=buy_now["product_id"])
-        quantity = Decimal(str(buy_now["quantity"]))
-
-        class TempItem:
-            pass
-
-        temp = TempItem()
-        temp.product = product
-        temp.quantity = quantity
-        
-        temp.price = product.base_price         
-        temp.final_price = product.base_price * quantity  
-        temp.subtotal = temp.final_price                 
-
-        cart_items = [temp]
-
+        cart = buy_now_cart(user, buy_now)
     else:
-        cart_items = CartItem.objects.filter(user=user)
+        cart = user_cart(user)
 
-        if not cart_items.exists():
+        if not cart:
             messages.error(request, "Your cart is empty.")
             return redirect("cart")
 
-
-    subtotal = sum(item.product.base_price * item.quantity for item in cart_items)
-    tax = subtotal * Decimal('0.05')
-    total = subtotal + tax
+    cart_items = cart.items
+    subtotal, tax, total = cart.subtotal, cart.tax, cart.total
 
     zones = DeliveryZone.objects.filter(is_active=True)
 
@@ -1061,58 +846,47 @@ def payment_page(request):
         if not form.is_valid():
             return JsonResponse({"status": "error", "message": form.errors}, status=400)
 
-        order = form.save(commit=False)
-        order.user = user
-        order.payment_method = "RAZORPAY"
-        order.payment_status = "Pending"
-        order.status = "pending"
-
-        order.subtotal = subtotal
-        order.tax = tax
-        order.total_amount = total
-
-        eta_time = request.POST.get("final_eta_time")
-        eta_day = request.POST.get("final_eta_day")  
+        idempotency_key = (
+            request.POST.get("idempotency_key") or request.headers.get("Idempotency-Key") or ""
+        )[:64]
+        order = existing_order(user, idempotency_key)
+        if order is None:
+            order = form.save(commit=False)
+            order.payment_method = "RAZORPAY"
+            order.payment_status = "Pending"
+            order.status = "pending"
 
-        if eta_time and eta_day:
-            today = timezone.localdate()
-            delivery_date = today if eta_day == "Today" else today + timedelta(days=1)
+            order, _ = place_order(user, order, cart, idempotency_key)
 
-            eta_datetime = datetime.strptime(eta_time, "%I:%M %p").time()
+        if order.razorpay_order_id:
+            return JsonResponse({
+                "status": "created",
+                "order_id": order.id,
+                "razorpay_order_id": order.razorpay_order_id,
+                "amount": int(order.total_amount * 100),
+                "key": settings.RAZORPAY_KEY_ID,
+            })
 
-            order.expected_delivery_time = timezone.make_aware(
-                datetime.combine(delivery_date, eta_datetime)
+        try:
+            razorpay_order_id = get_gateway().create_order(
+                int(order.total_amount * 100), receipt=f"order_{order.id}"
             )
-
-        order.save()
-
-        for item in cart_items:
-            OrderItem.objects.create(
-                order=order,
-                product=item.product,
-                quantity=item.quantity,
-                price=item.product.base_price
+        except PaymentGatewayError:
+            # The order stays pending; retrying with the same key picks it up.
+            return JsonResponse(
+                {"status": "error", "message": "Payment service is busy, please try again."},
+                status=503,
             )
 
-        order.calculate_totals()
-        order.update_status()
-
-        client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-        rzp_order = client.order.create({
-            "amount": int(order.total_amount * 100),
-            "currency": "INR",
-            "payment_capture": 1,
-        })
-
-        order.razorpay_order_id = rzp_order["id"]
-        order.save()
+        order.razorpay_order_id = razorpay_order_id
+        order.save(update_fields=["razorpay_order_id"])
 
         request.session.pop("buy_now", None)
 
         return JsonResponse({
             "status": "created",
             "order_id": order.id,
-            "razorpay_order_id": rzp_order["id"],
+            "razorpay_order_id": razorpay_order_id,
             "amount": int(order.total_amount * 100),
             "key": settings.RAZORPAY_KEY_ID,
         })
@@ -1125,6 +899,7 @@ def payment_page(request):
 
     return render(request, "core/payment.html", {
         "form": form,
+        "idempotency_key": uuid.uuid4().hex,
         "zones": zones,
         "cart_items": cart_items,
         "subtotal": subtotal,
@@ -1149,15 +924,7 @@ def verify_payment(request):
     razorpay_signature = data.get("razorpay_signature")
     order_id = data.get("order_id")
 
-    client = razorpay.Client(auth=(settings.RAZORPAY_KEY_ID, settings.RAZORPAY_KEY_SECRET))
-
-    try:
-        client.utility.verify_payment_signature({
-            "razorpay_order_id": razorpay_order_id,
-            "razorpay_payment_id": razorpay_payment_id,
-            "razorpay_signature": razorpay_signature
-        })
-    except:
+    if not get_gateway().verify_signature(razorpay_order_id, razorpay_payment_id, razorpay_signature):
         return JsonResponse({"status": "error", "message": "Signature verification failed"}, status=400)
     order = Order.objects.filter(id=order_id, razorpay_order_id=razorpay_order_id).first()
     if not order:
@@ -1180,34 +947,6 @@ def order_failed(request):
 WAREHOUSE_LAT = 12.9716
 WAREHOUSE_LON = 77.5946
 
-def calculate_distance(lat1, lon1, lat2, lon2):
-    R = 6371  # Earth radius (km)
-
-    lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-    dlat = lat2 - lat1
-    dlon = lon2 - lon1
-
-    a = sin(dlat / 2)**2 + cos(lat1) * cos(lat2) * sin(dlon / 2)**2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
-
-    return R * c
-
-def parse_slot(slot_raw):
-    slot_raw = slot_raw.replace(" ", "").upper()
-
-    start_raw, end_raw = slot_raw.split("-")
-
-    if len(start_raw) <= 4:
-        start_raw = start_raw[:-2].zfill(2) + ":00" + start_raw[-2:]
-
-    if len(end_raw) <= 4:
-        end_raw = end_raw[:-2].zfill(2) + ":00" + end_raw[-2:]
-
-    start_time = datetime.strptime(start_raw, "%I:%M%p").time()
-    end_time = datetime.strptime(end_raw, "%I:%M%p").time()
-
-    return start_time, end_time
-
 @csrf_exempt
 def check_delivery_feasibility(request):
 
@@ -1233,57 +972,47 @@ def check_delivery_feasibility(request):
     except:
         return JsonResponse({"status": "error", "message": "Invalid coordinates"})
 
-    distance_km = calculate_distance(
-        settings.STORE_LATITUDE,
-        settings.STORE_LONGITUDE,
-        user_lat,
-        user_lon
-    )
-
-    s = slot.upper().replace(" ", "")
-    start_raw, end_raw = s.split("-")
-
-    def normalize(t):
-        if len(t) <= 4:
-            return t[:-2].zfill(2) + ":00" + t[-2:]
-        return t
-
-    start_norm = normalize(start_raw)
-    end_norm = normalize(end_raw)
-
-    slot_start = datetime.strptime(start_norm, "%I:%M%p").time()
-    slot_end = datetime.strptime(end_norm, "%I:%M%p").time()
-
-    today = timezone.localdate()
-    now = timezone.localtime()
-
-    start_dt = timezone.make_aware(datetime.combine(today, slot_start))
-    end_dt = timezone.make_aware(datetime.combine(today, slot_end))
-
-    if now.time() > slot_start:
-        start_dt += timedelta(days=1)
-        end_dt += timedelta(days=1)
+    distance_km = geo.from_store_km(user_lat, user_lon)
 
-    if distance_km <= 3: add_minutes = 20
-    elif distance_km <= 6: add_minutes = 30
-    elif distance_km <= 8: add_minutes = 40
-    elif distance_km <= 12: add_minutes = 50
-    else: add_minutes = 60
-
-    eta_dt = start_dt + timedelta(minutes=add_minutes)
+    try:
+        eta = slots.slot_eta(slot, distance_km)
+    except ValueError:
+        return JsonResponse({"status": "error", "message": "Invalid slot"})
 
-    formatted_eta = eta_dt.strftime("%I:%M %p")
-    day_label = "Today" if eta_dt.date() == today else "Tomorrow"
+    formatted_eta = eta.eta.strftime("%I:%M %p")
 
     return JsonResponse({
-        "status": "on_time",
+        "status": "on_time" if eta.on_time else "delayed",
         "eta": formatted_eta,
         "distance_km": round(distance_km, 1),
-        "slot_window": f"{start_dt.strftime('%I:%M %p')} - {end_dt.strftime('%I:%M %p')}",
-        "day_label": day_label,
+        "slot_window": f"{eta.start.strftime('%I:%M %p')} - {eta.end.strftime('%I:%M %p')}",
+        "day_label": eta.day_label,
         "message": f"ETA {formatted_eta} (Distance {distance_km:.1f} km)",
     })
 
+
+def delivery_slots(request):
+    """Every delivery slot's window and ETA for one zone."""
+    try:
+        zone = DeliveryZone.objects.get(id=request.GET.get("zone_id"), is_active=True)
+    except (DeliveryZone.DoesNotExist, ValueError):
+        return JsonResponse({"status": "error", "message": "Invalid zone"}, status=404)
+
+    distance_km = slots.zone_distance_km(zone)
+    return JsonResponse({
+        "zone_id": zone.id,
+        "distance_km": None if distance_km is None else round(distance_km, 1),
+        "slots": [
+            {
+                "slot": eta.slot.label,
+                "day_label": eta.day_label,
+                "eta": eta.eta.strftime("%I:%M %p"),
+                "on_time": eta.on_time,
+            }
+            for eta in slots.day_etas(distance_km)
+        ],
+    })
+
 @login_required
 def order_confirmation(request, order_id):
     order = get_object_or_404(Order, id=order_id, user=request.user)
@@ -1291,8 +1020,6 @@ def order_confirmation(request, order_id):
     if order.subtotal == 0 or order.total_amount == 0:
         order.calculate_totals()
 
-    order.update_status()
-
     return render(request, 'core/order_confirmation.html', {'order': order})
 
 
@@ -1307,21 +1034,6 @@ def track_order(request):
             order = Order.objects.get(id=order_id, user=request.user)
         except Order.DoesNotExist:
             not_found = True
-        else:
-            if order.status == "processing" and (order.current_latitude is None or order.current_longitude is None):
-                order.current_latitude = settings.WAREHOUSE_LAT
-                order.current_longitude = settings.WAREHOUSE_LON
-                order.save(update_fields=["current_latitude", "current_longitude"])
-                order.update_status()
-
-            order.simulate_movement()
-
-            prev_status = order.status
-            order.update_status()
-            if order.status != prev_status:
-                order.send_status_notification()
-                order.last_notified_status = order.status
-                order.save(update_fields=['last_notified_status'])
 
     return render(request, 'core/track_order.html', {
         'order': order,
@@ -1346,6 +1058,28 @@ def track_location(request, order_id):
         "status": order.status,
     })
 
+async def track_stream(request, order_id):
+    """Server-Sent Events stream of driver and customer positions for an order."""
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"error": "Authentication required"}, status=401)
+
+    if not await Order.objects.filter(id=order_id, user=user).aexists():
+        return JsonResponse({"error": "Order not found"}, status=404)
+
+    # A WSGI server would drain the whole stream before sending anything.
+    # 204 tells EventSource not to reconnect, so the page falls back to
+    # polling track_location.
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+
+    response = StreamingHttpResponse(
+        get_publisher().stream(order_id), content_type="text/event-stream"
+    )
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return response
+
 @login_required
 def confirm_delivery(request, order_id):
     """Admin or staff can manually mark a delayed/failed order as confirmed."""
@@ -1369,14 +1103,12 @@ class DeliveryZoneViewSet(viewsets.ModelViewSet):
     filterset_fields = ['city', 'pincode', 'is_active']
     search_fields = ['area_name', 'city']
 
-class OrderViewSet(viewsets.ModelViewSet):
-    queryset = Order.objects.all().order_by('-created_at')
-    serializer_class = OrderSerializer
+class OrderViewSet(api_views.OrderViewSet):
     permission_classes = [permissions.AllowAny]
 
     # ✅ Enable filtering, searching, and sorting
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
-    filterset_fields = ['user', 'status', 'city', 'delivery_zone']  # exact match filters
+    # exact match filters and created_after / created_before come from OrderFilter
     search_fields = ['full_name', 'email', 'phone', 'city']         # text search
     ordering_fields = ['created_at', 'total_amount'] 
 
@@ -1416,19 +1148,13 @@ def get_nearest_zone(request):
     except (TypeError, ValueError):
         return JsonResponse({'error': 'Invalid coordinates'}, status=400)
 
-    nearest_zone = None
-    nearest_distance = float('inf')
-
-    for zone in DeliveryZone.objects.filter(is_active=True):
-        if zone.latitude and zone.longitude:
-            dist = calculate_distance_km(lat, lon, zone.latitude, zone.longitude)
-            if dist < nearest_distance:
-                nearest_distance = dist
-                nearest_zone = zone
+    nearest = get_zone_index().nearest(lat, lon)
 
-    if not nearest_zone:
+    if not nearest:
         return JsonResponse({'error': 'No delivery zones found'}, status=404)
 
+    nearest_zone, nearest_distance = nearest[0]
+
     return JsonResponse({
         'zone_id': nearest_zone.id,
         'zone_name': nearest_zone.area_name,
@@ -1436,17 +1162,6 @@ def get_nearest_zone(request):
         'distance_km': round(nearest_distance, 2)
     })
 
-def haversine_distance_km(lat1, lon1, lat2, lon2):
-    R = 6371.0
-    phi1 = math.radians(lat1)
-    phi2 = math.radians(lat2)
-    dphi = math.radians(lat2 - lat1)
-    dlmbda = math.radians(lon2 - lon1)
-    a = math.sin(dphi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(dlmbda / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
-
-
 def check_delivery_with_slot(request):
     """
     AJAX endpoint:
@@ -1466,87 +1181,68 @@ def check_delivery_with_slot(request):
     except DeliveryZone.DoesNotExist:
         return JsonResponse({'success': False, 'message': 'Invalid delivery zone selected.'})
 
-    distance_km = haversine_distance_km(
-        float(settings.STORE_LATITUDE),
-        float(settings.STORE_LONGITUDE),
-        lat,
-        lon,
-    )
-
-    speed_kmph = 15.0
-    estimated_hours = distance_km / speed_kmph
-    estimated_minutes = estimated_hours * 60  
+    distance_km = geo.from_store_km(lat, lon)
 
     try:
-        slot_parts = slot_str.upper().split('-')
-        slot_start = datetime.strptime(slot_parts[0].strip(), "%I%p").time()
-        slot_end = datetime.strptime(slot_parts[1].strip(), "%I%p").time()
-
-        today = timezone.localdate()
-        slot_start_dt = timezone.make_aware(datetime.combine(today, slot_start))
-        slot_end_dt = timezone.make_aware(datetime.combine(today, slot_end))
-
-        if timezone.now() > slot_end_dt:
-            slot_start_dt += timedelta(days=1)
-            slot_end_dt += timedelta(days=1)
-    except Exception:
+        eta = slots.slot_eta(slot_str, distance_km)
+    except ValueError:
         return JsonResponse({'success': False, 'message': f'Invalid slot format: {slot_str}'})
 
-    eta_dt = timezone.now() + timedelta(minutes=estimated_minutes)
+    estimated_minutes = eta.travel_minutes
+    eta_text = f"{estimated_minutes} minutes"
+    eta_time = eta.eta.strftime('%I:%M %p')
 
-    if estimated_minutes < 60:
-        eta_text = f"{int(round(estimated_minutes))} minutes"
-    else:
-        hours = int(estimated_minutes // 60)
-        mins = int(estimated_minutes % 60)
-        eta_text = f"{hours} hr {mins} min" if mins > 0 else f"{hours} hr"
-
-    if eta_dt <= slot_end_dt:
+    if eta.on_time:
         return JsonResponse({
             'success': True,
             'message': (
                 f"✅ Delivery expected within chosen slot ({slot_str}). "
-                f"ETA: {eta_dt.strftime('%I:%M %p')}, "
+                f"ETA: {eta.day_label} {eta_time}, "
                 f"Distance: {distance_km:.1f} km, "
                 f"Estimated time: {eta_text}."
             ),
             'distance_km': round(distance_km, 2),
-            'estimated_minutes': round(estimated_minutes, 1),
-            'eta': eta_dt.strftime('%I:%M %p'),
+            'estimated_minutes': estimated_minutes,
+            'eta': eta_time,
         })
     else:
         return JsonResponse({
             'success': False,
             'message': (
                 f"⚠️ Delivery might not reach within the selected slot ({slot_str}). "
-                f"ETA: {eta_dt.strftime('%I:%M %p')} (Distance: {distance_km:.1f} km, "
+                f"ETA: {eta.day_label} {eta_time} (Distance: {distance_km:.1f} km, "
                 f"Estimated time: {eta_text})."
             ),
             'distance_km': round(distance_km, 2),
-            'estimated_minutes': round(estimated_minutes, 1),
-            'eta': eta_dt.strftime('%I:%M %p'),
+            'estimated_minutes': estimated_minutes,
+            'eta': eta_time,
         })
 
 User = get_user_model()
 
 def check_email_exists(request):
-    email = request.GET.get('email', '').strip()
-    exists = User.objects.filter(email__iexact=email).exists()
+    exists = 'email' in accounts.taken(email=request.GET.get('email'))
     return JsonResponse({'exists': exists})
 
 def username_suggestions(request):
-    q = request.GET.get('q', '').strip()
-    suggestions = []
-    if q:
-        users = User.objects.filter(username__istartswith=q).values_list('username', flat=True)[:5]
-        suggestions = list(users)
+    suggestions = accounts.suggest_usernames(request.GET.get('q', ''))
     return JsonResponse({'suggestions': suggestions})
 
 def check_phone_exists(request):
-    phone = request.GET.get('phone', '').strip()
-    exists = User.objects.filter(phone__iexact=phone).exists()
+    exists = 'phone' in accounts.taken(phone=request.GET.get('phone'))
     return JsonResponse({'exists': exists})
 
+def check_availability(request):
+    """
+    Availability of any of ``username``, ``email`` and ``phone`` in one
+    round trip: ``{"username": true, ...}`` where true means still free.
+    Only the fields present in the query string are answered.
+    """
+    values = {field: request.GET.get(field, '') for field in ('username', 'email', 'phone')}
+    values = {field: value for field, value in values.items() if value.strip()}
+    taken = accounts.taken(**values)
+    return JsonResponse({field: field not in taken for field in values})
+
 def order_confirmation_no_id(request):
     return render(request, 'order_failed.html', {
         'message': 'No order ID received. Payment may have been canceled.'
@@ -1625,7 +1321,8 @@ def cancel_order(request, order_id):
                 order.email,
                 "Your Order Has Been Cancelled",
                 "emails/order_cancelled.html",
-                {"order": order, "reason": final_reason}
+                {"order": order, "reason": final_reason},
+                dedupe_key=f"order:{order.id}:cancelled",
             )
 
             return redirect(f"/order-confirmation/{order.id}/?msg=cancelled")
@@ -1653,35 +1350,29 @@ def my_orders(request):
     orders = Order.objects.filter(user=request.user).order_by('-created_at')
     return render(request, "core/my_orders.html", {"orders": orders})
 
+@cache_page_by_role()
 def features_page(request):
     return render(request, "core/features.html")
 
+@cache_page_by_role()
 def payment_info(request):
     return render(request, "core/payment_info.html")
 
+@cache_page_by_role()
 def quality_info(request):
     return render(request, "core/quality_info.html")
 
-import requests
-from django.http import JsonResponse
-
 def reverse_geocode(request):
-    lat = request.GET.get("lat")
-    lon = request.GET.get("lon")
-
-    url = "https://nominatim.openstreetmap.org/reverse"
-    params = {
-        "lat": lat,
-        "lon": lon,
-        "format": "json",
-        "addressdetails": 1
-    }
-    headers = {
-        "User-Agent": "VetriMartDeliveryTracker/1.0"
-    }
+    try:
+        payload = get_geocoder().reverse(request.GET.get("lat"), request.GET.get("lon"))
+    except ValueError:
+        return JsonResponse({"error": "Invalid coordinates"}, status=400)
+    except GeocodingError:
+        return JsonResponse({"error": "Address lookup is busy, please try again."}, status=503)
 
-    response = requests.get(url, params=params, headers=headers)
-    return JsonResponse(response.json(), safe=False)
+    response = JsonResponse(payload, safe=False)
+    patch_cache_control(response, public=True, max_age=24 * 60 * 60)
+    return response
 
 
 from django.views.decorators.csrf import csrf_exempt
@@ -1700,18 +1391,16 @@ def mark_order_delivered(request, order_id):
         return JsonResponse({"success": False}, status=500)
 
 
+@cache_page_by_role()
 def delivery_info(request):
     return render(request, 'core/delivery-info.html')
 
+@cache_page_by_role()
 def fresh_organic(request):
     return render(request, 'core/fresh-organic.html')
+@cache_page_by_role()
 def support(request):
     return render(request, 'core/support.html')
-def payment_info(request):
-    return render(request, 'core/payment_info.html')
-
-def quality_info(request):
-    return render(request, 'core/quality_info.html')
 
 
 User = get_user_model()
@@ -1730,22 +1419,14 @@ def forgot_password(request):
                 return redirect("forgot_password")
 
             otp = str(random.randint(100000, 999999))
-            PasswordResetOTP.objects.create(user=user, otp=otp)
-            try:
-                send_mail(
-                    "Your Password Reset OTP",
-                    f"Your OTP is {otp}",
-                    "noreply@yourapp.com",
-                    [email],
-                    fail_silently=False,
-                )
-            except Exception:
-                messages.error(
-                    request,
-                    "We could not deliver OTP to this email address. "
-                    "Please enter a real, working email."
-                )
-                return redirect("forgot_password")
+            reset_otp = PasswordResetOTP.objects.create(user=user, otp=otp)
+            enqueue_email(
+                email,
+                "Your Password Reset OTP",
+                f"Your OTP is {otp}",
+                from_email="noreply@yourapp.com",
+                dedupe_key=f"otp:{reset_otp.id}",
+            )
             request.session["reset_user_id"] = user.id
             messages.success(request, "OTP sent to your email")
             return redirect("verify_otp")
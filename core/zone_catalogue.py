@@ -0,0 +1,78 @@
+"""
+Cached catalogue of active delivery zones for the zone JSON endpoints.
+
+The zone list changes rarely, so it is serialized once per zone version
+(see core.zone_index) and served as ready-made JSON bytes with an ETag.
+"""
+import hashlib
+import json
+import threading
+
+from django.http import HttpResponse
+
+from .zone_index import zone_version
+
+_lock = threading.Lock()
+_catalogue = None
+
+
+class ZoneCatalogue:
+
+    def __init__(self, zones, version):
+        self.version = version
+        self.zones = [
+            {
+                'id': z.id,
+                'area_name': z.area_name,
+                'pincode': z.pincode,
+                'city': z.city,
+                'delay_hours': z.delivery_delay_hours,
+            }
+            for z in zones
+        ]
+        self.zones_json = json.dumps(self.zones).encode()
+        self.body = b'{"zones": ' + self.zones_json + b'}'
+        self.etag = '"zones-%s"' % hashlib.sha1(self.body).hexdigest()[:16]
+
+    def find(self, query):
+        """Match a pincode exactly, else the first area name containing ``query``."""
+        query = query.lower()
+        for zone in self.zones:
+            if zone['pincode'].lower() == query:
+                return zone
+        for zone in self.zones:
+            if query in zone['area_name'].lower():
+                return zone
+        return None
+
+
+def get_zone_catalogue():
+    global _catalogue
+    from .models import DeliveryZone
+
+    version = zone_version()
+    catalogue = _catalogue
+    if catalogue is not None and catalogue.version == version:
+        return catalogue
+
+    with _lock:
+        if _catalogue is None or _catalogue.version != version:
+            zones = DeliveryZone.objects.filter(is_active=True).order_by('area_name')
+            _catalogue = ZoneCatalogue(list(zones), version)
+        return _catalogue
+
+
+def catalogue_etag(request, *args, **kwargs):
+    return get_zone_catalogue().etag
+
+
+def zones_response(payload, catalogue):
+    """
+    JSON response for ``payload`` with the pre-serialized zone list spliced
+    in as ``available_zones``.
+    """
+    head = json.dumps(payload).encode()[:-1]
+    return HttpResponse(
+        head + b', "available_zones": ' + catalogue.zones_json + b'}',
+        content_type='application/json',
+    )
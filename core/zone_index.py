@@ -0,0 +1,162 @@
+"""
+In-process spatial index over active delivery zones.
+
+Zones are placed on the unit sphere as 3D points so that straight-line
+(chord) distance orders them exactly like great-circle distance, which lets
+a plain k-d tree answer nearest and radius queries. The tree is rebuilt
+lazily whenever a DeliveryZone is saved or deleted.
+"""
+import heapq
+import math
+import threading
+import time
+
+from django.core.cache import cache
+
+from .geo import EARTH_RADIUS_KM
+
+ZONE_VERSION_CACHE_KEY = "zones:version"
+
+_lock = threading.Lock()
+_index = None
+
+
+def to_unit_vector(lat, lon):
+    phi = math.radians(lat)
+    lam = math.radians(lon)
+    cos_phi = math.cos(phi)
+    return (cos_phi * math.cos(lam), cos_phi * math.sin(lam), math.sin(phi))
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, chord / 2))
+
+
+def km_to_chord(km):
+    return 2 * math.sin(min(math.pi / 2, km / (2 * EARTH_RADIUS_KM)))
+
+
+class _Node:
+    __slots__ = ("point", "zone", "axis", "left", "right")
+
+    def __init__(self, point, zone, axis, left, right):
+        self.point = point
+        self.zone = zone
+        self.axis = axis
+        self.left = left
+        self.right = right
+
+
+class ZoneIndex:
+    """k-d tree of zones keyed by their position on the unit sphere."""
+
+    def __init__(self, zones, version=None):
+        self.version = version
+        entries = [
+            (to_unit_vector(z.latitude, z.longitude), z)
+            for z in zones
+            if z.latitude is not None and z.longitude is not None
+        ]
+        self.size = len(entries)
+        self.root = self._build(entries, 0)
+
+    def _build(self, entries, depth):
+        if not entries:
+            return None
+        axis = depth % 3
+        entries.sort(key=lambda e: e[0][axis])
+        mid = len(entries) // 2
+        point, zone = entries[mid]
+        return _Node(
+            point, zone, axis,
+            self._build(entries[:mid], depth + 1),
+            self._build(entries[mid + 1:], depth + 1),
+        )
+
+    def _search(self, target, k, radius_sq=None):
+        # Max-heap of (-dist_sq, tiebreak, zone) holding the best candidates.
+        best = []
+        counter = 0
+        stack = [self.root]
+
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+
+            dist_sq = sum((a - b) ** 2 for a, b in zip(node.point, target))
+            if radius_sq is None or dist_sq <= radius_sq:
+                counter += 1
+                if k is None or len(best) < k:
+                    heapq.heappush(best, (-dist_sq, counter, node.zone))
+                elif dist_sq < -best[0][0]:
+                    heapq.heapreplace(best, (-dist_sq, counter, node.zone))
+
+            diff = target[node.axis] - node.point[node.axis]
+            near, far = (node.left, node.right) if diff < 0 else (node.right, node.left)
+
+            bound = radius_sq
+            if k is not None and len(best) == k:
+                bound = -best[0][0] if bound is None else min(bound, -best[0][0])
+            if bound is None or diff * diff <= bound:
+                stack.append(far)
+            stack.append(near)
+
+        return [
+            (zone, chord_to_km(math.sqrt(-neg)))
+            for neg, _, zone in sorted(best, key=lambda b: -b[0])
+        ]
+
+    def nearest(self, lat, lon, k=1):
+        """Return up to ``k`` ``(zone, distance_km)`` pairs, closest first."""
+        if self.root is None or k < 1:
+            return []
+        return self._search(to_unit_vector(lat, lon), k)
+
+    def within(self, lat, lon, radius_km):
+        """Return every ``(zone, distance_km)`` within ``radius_km``, closest first."""
+        if self.root is None:
+            return []
+        chord = km_to_chord(radius_km)
+        return self._search(to_unit_vector(lat, lon), None, chord * chord)
+
+    def nearest_many(self, points, k=1):
+        """Batch form of :meth:`nearest` for an iterable of ``(lat, lon)``."""
+        return [self.nearest(lat, lon, k) for lat, lon in points]
+
+    def within_many(self, points, radius_km):
+        """Batch form of :meth:`within` for an iterable of ``(lat, lon)``."""
+        return [self.within(lat, lon, radius_km) for lat, lon in points]
+
+
+def zone_version():
+    # Seeded from the clock so a version lost to cache eviction can never
+    # collide with one a worker has already built against.
+    return cache.get_or_set(ZONE_VERSION_CACHE_KEY, time.time_ns, None)
+
+
+def invalidate_zones():
+    """Bump the zone version so every worker rebuilds on its next lookup."""
+    try:
+        cache.incr(ZONE_VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(ZONE_VERSION_CACHE_KEY, time.time_ns(), None)
+
+
+def get_zone_index():
+    """Return the index for the current zone version, rebuilding if stale."""
+    global _index
+    from .models import DeliveryZone
+
+    version = zone_version()
+    index = _index
+    if index is not None and index.version == version:
+        return index
+
+    with _lock:
+        if _index is None or _index.version != version:
+            zones = DeliveryZone.objects.filter(
+                is_active=True, latitude__isnull=False, longitude__isnull=False
+            ).only("id", "area_name", "pincode", "city", "latitude", "longitude")
+            _index = ZoneIndex(list(zones), version)
+        return _index
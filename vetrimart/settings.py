@@ -59,6 +59,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.PriceRefreshMiddleware',
 
 ]
 
@@ -89,6 +90,10 @@ OPENROUTESERVICE_API_KEY = "eyJvcmciOiI1YjNjZTM1OTc4NTExMTAwMDFjZjYyNDgiLCJpZCI6
 
 RAZORPAY_KEY_ID = "rzp_test_Rejxfjl1Q83T9z"
 RAZORPAY_KEY_SECRET = "IFvzJumSUQ0uB5Qog6fkm6mX"
+RAZORPAY_CONNECT_TIMEOUT = 3.05
+RAZORPAY_READ_TIMEOUT = 10
+# Set to "core.payments.FakeGateway" for load tests.
+PAYMENT_GATEWAY = "core.payments.RazorpayGateway"
 
 # Email Configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
@@ -105,9 +110,39 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock when a transaction starts, so concurrent
+            # writers wait on busy_timeout instead of failing on upgrade.
+            'transaction_mode': 'IMMEDIATE',
+        },
+    }
+}
+# PRAGMAs applied to each SQLite connection; see core.database.
+SQLITE_PRAGMAS = {}
+
+# Shared by all gunicorn workers on the host: zone versions, the price
+# schedule, cached pages and sessions must agree between processes. Entries
+# are unpickled on read, so the directory must only be writable by the app
+# user; keep it inside the project unless DJANGO_CACHE_DIR says otherwise.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('DJANGO_CACHE_DIR', BASE_DIR / '.django-cache'),
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
     }
 }
 
+# Runs the suite against an in-memory cache (see core.test_runner).
+TEST_RUNNER = 'core.test_runner.LocalCacheRunner'
+
+# Sessions are read from the shared cache and written through to the
+# database only when they change.
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
+# Set per release; cached pages from other releases are ignored (see core.page_cache).
+DEPLOY_VERSION = os.environ.get('DEPLOY_VERSION', 'dev')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -149,6 +184,8 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Processes that build image size variants after upload; 0 builds in-process.
+IMAGE_VARIANT_WORKERS = 2
 
 LOGIN_URL = '/login/'
 